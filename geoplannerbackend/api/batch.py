@@ -0,0 +1,225 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import unquote_to_bytes, urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections, transaction
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .idempotencia import IdempotenciaMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Cabeceras de la petición original que se comparten con cada sub-petición
+CABECERAS_COMPARTIDAS = (
+    "HTTP_AUTHORIZATION",
+    "HTTP_COOKIE",
+    "HTTP_X_CSRFTOKEN",
+    "HTTP_ACCEPT_LANGUAGE",
+    "HTTP_ORIGIN",
+    "HTTP_REFERER",
+    "HTTP_USER_AGENT",
+    "REMOTE_ADDR",
+    "SERVER_NAME",
+    "SERVER_PORT",
+    "HTTP_HOST",
+)
+
+METODOS_LECTURA = ("GET", "HEAD", "OPTIONS")
+
+# Cabeceras de la respuesta de cada sub-petición que se devuelven
+CABECERAS_DEVUELTAS = ("ETag", "Last-Modified", "Location", "Idempotent-Replayed")
+
+# Las sub-peticiones no pasan por settings.MIDDLEWARE: métricas, presupuesto
+# de consultas, réplica de lectura, compresión, CORS y CSRF se aplican una
+# vez al POST /batch/ (que escribe, así que el lote lee de "default"). Dentro
+# de cada sub-petición sí se aplican:
+# - El límite de peticiones, que es un throttle de DRF: cada sub-petición
+#   gasta los tokens de su vista.
+# - Idempotency-Key, si la sub-petición la trae en sus "headers".
+
+
+class ErrorBatch(Exception):
+    pass
+
+
+def _construir_peticion(request, sub):
+    metodo = str(sub.get("method", "GET")).upper()
+    ruta = sub.get("path")
+    if not isinstance(ruta, str) or not ruta.startswith("/"):
+        raise ErrorBatch("Cada sub-petición necesita un 'path' absoluto.")
+    cabeceras = sub.get("headers") or {}
+    if not isinstance(cabeceras, dict):
+        raise ErrorBatch("'headers' debe ser un objeto.")
+
+    partes = urlsplit(ruta)
+    environ = {k: v for k, v in request.META.items() if k in CABECERAS_COMPARTIDAS}
+    for nombre, valor in cabeceras.items():
+        environ["HTTP_" + str(nombre).upper().replace("-", "_")] = str(valor)
+
+    cuerpo = b""
+    if metodo not in METODOS_LECTURA:
+        datos = sub.get("body")
+        cuerpo = json.dumps(datos if datos is not None else {}).encode()
+        environ["CONTENT_TYPE"] = "application/json"
+    environ.update(
+        {
+            "REQUEST_METHOD": metodo,
+            "SCRIPT_NAME": "",
+            # WSGI entrega la ruta sin escapar, decodificada como latin-1
+            "PATH_INFO": unquote_to_bytes(partes.path).decode("iso-8859-1"),
+            "QUERY_STRING": partes.query,
+            "CONTENT_LENGTH": str(len(cuerpo)),
+            "SERVER_PROTOCOL": request.META.get("SERVER_PROTOCOL", "HTTP/1.1"),
+            "wsgi.url_scheme": request.scheme,
+            "wsgi.input": BytesIO(cuerpo),
+        }
+    )
+    return WSGIRequest(environ)
+
+
+def ejecutar_subpeticion(request, sub):
+    """
+    Resuelve la sub-petición contra el URLconf y ejecuta su vista, con su
+    Idempotency-Key si la trae (ver arriba).
+    """
+    try:
+        sub_request = _construir_peticion(request, sub)
+        match = resolve(urlsplit(sub_request.path).path)
+    except ErrorBatch as e:
+        return {"status": status.HTTP_400_BAD_REQUEST, "body": {"error": str(e)}}
+    except Resolver404:
+        return {
+            "status": status.HTTP_404_NOT_FOUND,
+            "body": {"error": "Ruta no encontrada."},
+        }
+
+    if getattr(match.func, "cls", None) is BatchView:
+        return {
+            "status": status.HTTP_400_BAD_REQUEST,
+            "body": {"error": "No se permiten lotes anidados."},
+        }
+
+    def vista(sub_request):
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        return response
+
+    try:
+        response = IdempotenciaMiddleware(vista)(sub_request)
+    except Exception:
+        # Un fallo en una sub-petición no tumba el lote completo
+        logger.exception(
+            "Error en la sub-petición %s %s", sub_request.method, sub_request.path
+        )
+        return {
+            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "body": {"error": "Error interno en la sub-petición."},
+        }
+
+    cuerpo = getattr(response, "data", None)
+    if cuerpo is None and response.content:
+        try:
+            cuerpo = json.loads(response.content)
+        except ValueError:
+            cuerpo = response.content.decode(response.charset, errors="replace")
+
+    resultado = {"status": response.status_code, "body": cuerpo}
+    cabeceras = {
+        nombre: response[nombre]
+        for nombre in CABECERAS_DEVUELTAS
+        if response.has_header(nombre)
+    }
+    if cabeceras:
+        resultado["headers"] = cabeceras
+    return resultado
+
+
+def _ejecutar_en_hilo(request, sub):
+    # Cada hilo abre su propia conexión y la cierra al terminar
+    try:
+        return ejecutar_subpeticion(request, sub)
+    finally:
+        connections.close_all()
+
+
+# Vista para agrupar varias peticiones en un solo viaje de red
+class BatchView(APIView):
+    """
+    POST /batch/
+    {
+        "requests": [{"method": "GET", "path": "/publicaciones/<id>/"}, ...],
+        "atomic": false,     # todas las sub-peticiones en una transacción
+        "concurrent": false  # ejecutar en paralelo si todas son de lectura
+    }
+    Devuelve {"responses": [{"status": ..., "body": ...}, ...]} en el mismo orden.
+    Con "atomic" se revierte todo si alguna sub-petición responde con error
+    (también si falla con una excepción, que se informa como status 500): las
+    anteriores se devuelven con status 424 y no se ejecutan las siguientes.
+    """
+
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response(
+                {"error": "El cuerpo debe ser un objeto con la lista 'requests'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        subs = request.data.get("requests")
+        maximo = getattr(settings, "BATCH_MAX_SUBPETICIONES", 20)
+        if not isinstance(subs, list) or not subs:
+            return Response(
+                {"error": "Debe enviar una lista 'requests'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(subs) > maximo:
+            return Response(
+                {"error": f"Máximo {maximo} sub-peticiones por lote."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not all(isinstance(sub, dict) for sub in subs):
+            return Response(
+                {"error": "Cada sub-petición debe ser un objeto."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        atomico = bool(request.data.get("atomic", False))
+        concurrente = bool(request.data.get("concurrent", False))
+        solo_lectura = all(
+            str(sub.get("method", "GET")).upper() in METODOS_LECTURA for sub in subs
+        )
+
+        if atomico:
+            respuestas = self._ejecutar_atomico(request, subs)
+        elif concurrente and solo_lectura and len(subs) > 1:
+            hilos = min(len(subs), getattr(settings, "BATCH_MAX_HILOS", 4))
+            with ThreadPoolExecutor(max_workers=hilos) as pool:
+                respuestas = list(
+                    pool.map(lambda sub: _ejecutar_en_hilo(request, sub), subs)
+                )
+        else:
+            respuestas = [ejecutar_subpeticion(request, sub) for sub in subs]
+
+        return Response({"responses": respuestas})
+
+    def _ejecutar_atomico(self, request, subs):
+        respuestas = []
+        with transaction.atomic():
+            for sub in subs:
+                resultado = ejecutar_subpeticion(request, sub)
+                respuestas.append(resultado)
+                if resultado["status"] >= 400:
+                    transaction.set_rollback(True)
+                    revertida = {
+                        "status": status.HTTP_424_FAILED_DEPENDENCY,
+                        "body": {"error": "Revertida: falló otra sub-petición."},
+                    }
+                    respuestas[:-1] = [revertida] * (len(respuestas) - 1)
+                    break
+        return respuestas
@@ -0,0 +1,135 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from .metricas import medir
+from .models import LikePublicacion
+
+# Contadores de aciertos y fallos guardados en la propia cache
+CLAVE_ACIERTOS = "publicaciones:estadisticas:aciertos"
+CLAVE_FALLOS = "publicaciones:estadisticas:fallos"
+
+
+def _cache():
+    return caches[getattr(settings, "PUBLICACIONES_CACHE_ALIAS", "default")]
+
+
+def clave_publicacion(publicacion_id, version):
+    # La versión forma parte de la clave: al editar, la entrada vieja queda huérfana
+    return f"publicacion:{publicacion_id}:v{version}"
+
+
+def _sumar(clave, cantidad):
+    if not cantidad:
+        return
+    cache = _cache()
+    cache.add(clave, 0, timeout=None)
+    try:
+        cache.incr(clave, cantidad)
+    except ValueError:  # La clave expiró entre add() e incr()
+        cache.set(clave, cantidad, timeout=None)
+
+
+def estadisticas():
+    cache = _cache()
+    valores = cache.get_many([CLAVE_ACIERTOS, CLAVE_FALLOS])
+    aciertos = valores.get(CLAVE_ACIERTOS, 0)
+    fallos = valores.get(CLAVE_FALLOS, 0)
+    total = aciertos + fallos
+    return {
+        "aciertos": aciertos,
+        "fallos": fallos,
+        "tasa_aciertos": round(aciertos / total, 4) if total else 0.0,
+    }
+
+
+def obtener_fragmentos(filas, serializar):
+    """
+    Devuelve las representaciones de las publicaciones en el orden de `filas`
+    (pares id, version). Las que no están en cache se serializan en bloque con
+    `serializar(ids)` y se guardan para las siguientes lecturas.
+    """
+    cache = _cache()
+    claves = {pub_id: clave_publicacion(pub_id, version) for pub_id, version in filas}
+    encontrados = cache.get_many(claves.values())
+
+    faltantes = [pub_id for pub_id, clave in claves.items() if clave not in encontrados]
+    nuevos = {}
+    if faltantes:
+        for data in serializar(faltantes):
+            data = dict(data)
+            data.pop("ya_dio_like", None)
+            nuevos[clave_publicacion(data["id"], data["version"])] = data
+        cache.set_many(nuevos)
+
+    _sumar(CLAVE_ACIERTOS, len(encontrados))
+    _sumar(CLAVE_FALLOS, len(faltantes))
+
+    fragmentos = {**encontrados, **nuevos}
+    # Si la versión cambió mientras se serializaba, se usa la recién leída
+    por_id = {str(data["id"]): data for data in fragmentos.values()}
+    return [por_id[str(pub_id)] for pub_id, _ in filas if str(pub_id) in por_id]
+
+
+def aplicar_ya_dio_like(fragmentos, usuario_id):
+    # Capa por usuario sobre los fragmentos compartidos: una sola consulta
+    con_like = set()
+    if usuario_id and fragmentos:
+        con_like = {
+            str(pub_id)
+            for pub_id in LikePublicacion.objects.filter(
+                id_usuario=usuario_id,
+                id_publicacion__in=[data["id"] for data in fragmentos],
+            ).values_list("id_publicacion", flat=True)
+        }
+    return [
+        {**data, "ya_dio_like": str(data["id"]) in con_like} for data in fragmentos
+    ]
+
+
+# Mixin de cache versionada para list y retrieve de publicaciones
+class CachePublicacionesMixin:
+    prefetch_cache = ("ubicacion", "likes", "comentarios_publicacion", "imagenes")
+
+    def _serializar_ids(self, ids):
+        contexto = {**self.get_serializer_context(), "usuario_id": None}
+        objetos = (
+            self.get_queryset()
+            .filter(id__in=ids)
+            .prefetch_related(*self.prefetch_cache)
+        )
+        with medir("serializacion"):
+            return self.get_serializer_class()(
+                objetos, many=True, context=contexto
+            ).data
+
+    def _usuario_id(self):
+        return self.get_serializer_context().get("usuario_id")
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        filas = list(queryset.values_list("id", "version"))
+
+        page = self.paginate_queryset(filas)
+        fragmentos = obtener_fragmentos(
+            page if page is not None else filas, self._serializar_ids
+        )
+        data = aplicar_ya_dio_like(fragmentos, self._usuario_id())
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        # Reutiliza la versión leída por CondicionalMixin si está disponible
+        fila = getattr(self, "fila_condicional", None)
+        if fila is None:
+            # Valida el identificador y responde 404 igual que DRF
+            instance = self.get_object()
+            fila = {"id": instance.id, "version": instance.version}
+
+        fragmentos = obtener_fragmentos(
+            [(fila["id"], fila["version"])], self._serializar_ids
+        )
+        if not fragmentos:
+            return super().retrieve(request, *args, **kwargs)
+        return Response(aplicar_ya_dio_like(fragmentos, self._usuario_id())[0])
@@ -0,0 +1,162 @@
+import hashlib
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db.models import Count, Max
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import condition, require_GET
+
+from .models import ActividadeAgenda, Inscripciones, Publicacion, Usuario
+from .presupuesto import presupuesto_consultas
+
+# Estados de inscripción que se muestran en el calendario
+ESTADOS_VISIBLES = ("INS", "ASI")
+
+# Duración por defecto de un evento sin fecha de fin
+DURACION_EVENTO = timedelta(hours=2)
+
+
+def _escapar(texto):
+    return (
+        str(texto)
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _linea(nombre, valor):
+    # RFC 5545: líneas de máximo 75 octetos, las siguientes empiezan con espacio
+    linea = f"{nombre}:{valor}".encode()
+    partes = []
+    limite = 75
+    while len(linea) > limite:
+        corte = limite
+        # No partir un carácter UTF-8 a la mitad
+        while linea[corte] & 0xC0 == 0x80:
+            corte -= 1
+        partes.append(linea[:corte])
+        linea = linea[corte:]
+        limite = 74
+    partes.append(linea)
+    return b"\r\n ".join(partes) + b"\r\n"
+
+
+def _fecha_utc(valor):
+    return valor.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _actividades(usuario_id):
+    return ActividadeAgenda.objects.filter(id_usuario=usuario_id)
+
+
+def _inscripciones(usuario_id):
+    return Inscripciones.objects.filter(
+        id_usuario=usuario_id, estado_asistencia__in=ESTADOS_VISIBLES
+    )
+
+
+def _validadores(request, usuario_id):
+    # Se calcula una sola vez por petición para el ETag y el Last-Modified
+    if not hasattr(request, "_validadores_calendario"):
+        if not Usuario.objects.filter(id=usuario_id).exists():
+            raise Http404("Usuario no encontrado.")
+        actividades = _actividades(usuario_id).aggregate(
+            total=Count("id"), ultima=Max("fecha_actualizacion")
+        )
+        inscripciones = _inscripciones(usuario_id).aggregate(
+            total=Count("id"),
+            ultima=Max("fecha_actualizacion"),
+            ultima_publicacion=Max("id_publicacion__fecha_actualizacion"),
+        )
+        fechas = [
+            f
+            for f in (
+                actividades["ultima"],
+                inscripciones["ultima"],
+                inscripciones["ultima_publicacion"],
+            )
+            if f
+        ]
+        ultima = max(fechas) if fechas else None
+        huella = hashlib.md5(
+            f"{actividades['total']}:{inscripciones['total']}:{ultima}".encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+        request._validadores_calendario = (f'"{huella}"', ultima)
+    return request._validadores_calendario
+
+
+def _generar_ics(usuario_id):
+    ahora = _fecha_utc(timezone.now())
+    yield b"BEGIN:VCALENDAR\r\n"
+    yield _linea("VERSION", "2.0")
+    yield _linea("PRODID", "-//GeoPlanner//Agenda//ES")
+    yield _linea("CALSCALE", "GREGORIAN")
+    yield _linea("X-WR-CALNAME", "GeoPlanner")
+
+    actividades = (
+        _actividades(usuario_id)
+        .prefetch_related("ubicacion")
+        .order_by("fecha_activiad")
+        .iterator(chunk_size=500)
+    )
+    for actividad in actividades:
+        yield b"BEGIN:VEVENT\r\n"
+        yield _linea("UID", f"actividad-{actividad.id}@geoplanner")
+        yield _linea("DTSTAMP", ahora)
+        yield _linea("LAST-MODIFIED", _fecha_utc(actividad.fecha_actualizacion))
+        yield _linea("DTSTART;VALUE=DATE", actividad.fecha_activiad.strftime("%Y%m%d"))
+        yield _linea("SUMMARY", _escapar(actividad.titulo))
+        yield _linea("DESCRIPTION", _escapar(actividad.descripcion))
+        ubicaciones = list(actividad.ubicacion.all())
+        if ubicaciones:
+            yield _linea("GEO", f"{ubicaciones[0].latitud};{ubicaciones[0].longitud}")
+        yield b"END:VEVENT\r\n"
+
+    publicaciones = (
+        Publicacion.objects.filter(
+            id__in=_inscripciones(usuario_id).values("id_publicacion")
+        )
+        .prefetch_related("ubicacion")
+        .order_by("fecha_evento")
+        .iterator(chunk_size=500)
+    )
+    for publicacion in publicaciones:
+        yield b"BEGIN:VEVENT\r\n"
+        yield _linea("UID", f"publicacion-{publicacion.id}@geoplanner")
+        yield _linea("DTSTAMP", ahora)
+        yield _linea("LAST-MODIFIED", _fecha_utc(publicacion.fecha_actualizacion))
+        yield _linea("DTSTART", _fecha_utc(publicacion.fecha_evento))
+        yield _linea("DTEND", _fecha_utc(publicacion.fecha_evento + DURACION_EVENTO))
+        yield _linea("SUMMARY", _escapar(publicacion.titulo))
+        yield _linea("DESCRIPTION", _escapar(publicacion.descripcion))
+        yield _linea("CATEGORIES", publicacion.get_categoria_display())
+        if publicacion.estado == "CAN":
+            yield _linea("STATUS", "CANCELLED")
+        ubicaciones = list(publicacion.ubicacion.all())
+        if ubicaciones:
+            yield _linea("GEO", f"{ubicaciones[0].latitud};{ubicaciones[0].longitud}")
+        yield b"END:VEVENT\r\n"
+
+    yield b"END:VCALENDAR\r\n"
+
+
+# Feed iCalendar de un usuario: agenda personal + eventos en los que está inscrito.
+# Presupuesto: 3 consultas para los validadores y 4 al generar el cuerpo
+@presupuesto_consultas(7)
+@require_GET
+@condition(
+    etag_func=lambda request, usuario_id: _validadores(request, usuario_id)[0],
+    last_modified_func=lambda request, usuario_id: _validadores(request, usuario_id)[1],
+)
+def calendario_usuario(request, usuario_id):
+    _validadores(request, usuario_id)
+    response = StreamingHttpResponse(
+        _generar_ics(usuario_id), content_type="text/calendar; charset=utf-8"
+    )
+    response["Content-Disposition"] = 'inline; filename="geoplanner.ics"'
+    response["Cache-Control"] = "no-cache"
+    return response
@@ -0,0 +1,101 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def _etag(*partes):
+    huella = hashlib.md5(
+        ":".join(str(p) for p in partes).encode(), usedforsecurity=False
+    ).hexdigest()
+    return quote_etag(huella)
+
+
+def validadores_coleccion(queryset, request):
+    """
+    Calcula (etag, last_modified) de un listado con una sola consulta agregada,
+    sin cargar ni serializar filas. La marca de agua es la fecha de la última
+    modificación junto al total de filas (que cambia con los borrados).
+    """
+    resumen = queryset.order_by().aggregate(
+        total=Count("pk"), ultima=Max("fecha_actualizacion")
+    )
+    ultima = resumen["ultima"]
+    etag = _etag(
+        resumen["total"], ultima.isoformat() if ultima else "", request.get_full_path()
+    )
+    return etag, ultima
+
+
+def fila_version(queryset, **filtro):
+    """
+    Lee solo id, versión y fecha de modificación de un objeto, o None si no
+    existe o el identificador no es válido.
+    """
+    try:
+        return (
+            queryset.filter(**filtro)
+            .values("id", "version", "fecha_actualizacion")
+            .first()
+        )
+    except (TypeError, ValueError, ValidationError):
+        return None  # Identificador inválido: la vista responderá 404
+
+
+def validadores_objeto(fila, request):
+    """Devuelve (etag, last_modified) de la fila leída con fila_version()."""
+    if fila is None:
+        return None, None
+    etag = _etag(fila["version"], request.get_full_path())
+    return etag, fila["fecha_actualizacion"]
+
+
+def _respuesta_condicional(request, etag, ultima):
+    return get_conditional_response(
+        request, etag=etag, last_modified=int(ultima.timestamp()) if ultima else None
+    )
+
+
+def _poner_validadores(response, etag, ultima):
+    if etag:
+        response["ETag"] = etag
+    if ultima:
+        response["Last-Modified"] = http_date(ultima.timestamp())
+    # El cliente puede guardar la respuesta pero debe revalidarla siempre
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+# Mixin de peticiones condicionales para viewsets (list y retrieve)
+class CondicionalMixin:
+    """
+    Responde 304 a If-None-Match / If-Modified-Since antes de consultar y
+    serializar el cuerpo. El modelo debe tener los campos `version` y
+    `fecha_actualizacion`.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, ultima = validadores_coleccion(queryset, request)
+        no_modificado = _respuesta_condicional(request, etag, ultima)
+        if no_modificado is not None:
+            return no_modificado
+        response = super().list(request, *args, **kwargs)
+        return _poner_validadores(response, etag, ultima)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        # La fila queda disponible para otros mixins (p. ej. la cache)
+        self.fila_condicional = fila_version(
+            self.filter_queryset(self.get_queryset()),
+            **{self.lookup_field: kwargs[lookup_url_kwarg]},
+        )
+        etag, ultima = validadores_objeto(self.fila_condicional, request)
+        if etag is not None:
+            no_modificado = _respuesta_condicional(request, etag, ultima)
+            if no_modificado is not None:
+                return no_modificado
+        response = super().retrieve(request, *args, **kwargs)
+        return _poner_validadores(response, etag, ultima)
@@ -0,0 +1,205 @@
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    IntegrityError,
+    close_old_connections,
+    transaction,
+)
+from django.db.models import F
+from django.utils import timezone
+
+from . import tendencias
+from .tareas import encolar
+
+logger = logging.getLogger(__name__)
+
+# Escrituras pequeñas agrupadas en un solo commit (group commit).
+# En SQLite cada commit toma el único lock de escritura y hace su propio
+# sync: cien likes concurrentes son cien transacciones en fila. Con
+# ESCRITURAS_AGRUPADAS un hilo escritor junta lo que llega durante
+# ESCRITURAS_INTERVALO_MS y lo aplica en una transacción: las inserciones con
+# bulk_create y los contadores sumados por fila (un UPDATE por fila, no por
+# interacción). Lo encolado y no aplicado se pierde si el proceso muere; al
+# salir normalmente se vacía la cola. Si una fila del lote viola una
+# restricción, el lote se repite operación por operación y solo esa se pierde.
+
+
+class ColaEscrituras:
+    def __init__(self, using=DEFAULT_DB_ALIAS, intervalo=None, maximo=None):
+        self.using = using
+        self.intervalo = (
+            intervalo
+            if intervalo is not None
+            else getattr(settings, "ESCRITURAS_INTERVALO_MS", 20) / 1000
+        )
+        self.maximo = maximo or getattr(settings, "ESCRITURAS_MAXIMO_LOTE", 500)
+        self._condicion = threading.Condition()
+        self._aplicando = threading.Lock()
+        self._inserciones = defaultdict(list)
+        self._contadores = defaultdict(Counter)
+        self._despues = {}
+        self._pendientes = 0
+        self._hilo = None
+
+    def insertar(self, objeto):
+        with self._condicion:
+            self._inserciones[type(objeto)].append(objeto)
+            self._agregado()
+
+    def incrementar(self, modelo, pk, despues=(), **deltas):
+        """
+        Suma `deltas` a los campos de la fila. En Publicacion, `tendencia`
+        es el peso de la interacción (al deshacerla, el negativo de
+        tendencias.peso_vigente) y la versión se incrementa como en
+        marcar_modificada. `despues`: [(funcion, *args)] a encolar tras
+        confirmar (sin repetir las iguales).
+        """
+        with self._condicion:
+            self._contadores[(modelo, pk)].update(deltas)
+            for tarea in despues:
+                self._despues.setdefault(_clave(tarea), tarea)
+            self._agregado()
+
+    def _agregado(self):
+        self._pendientes += 1
+        if self._hilo is None:
+            self._hilo = threading.Thread(
+                target=self._bucle, name="geoplanner-escrituras", daemon=True
+            )
+            self._hilo.start()
+        self._condicion.notify()
+
+    def _bucle(self):
+        while True:
+            with self._condicion:
+                self._condicion.wait_for(lambda: self._pendientes)
+                # Dar tiempo a que lleguen más, salvo que el lote ya esté lleno
+                self._condicion.wait_for(
+                    lambda: self._pendientes >= self.maximo, timeout=self.intervalo
+                )
+            close_old_connections()
+            try:
+                self.vaciar()
+            except Exception:
+                logger.exception("Error al aplicar escrituras agrupadas")
+
+    def vaciar(self):
+        """Aplica todo lo pendiente en una transacción. Devuelve cuántas operaciones."""
+        with self._aplicando:
+            with self._condicion:
+                inserciones, self._inserciones = self._inserciones, defaultdict(list)
+                contadores, self._contadores = self._contadores, defaultdict(Counter)
+                despues, self._despues = self._despues, {}
+                total, self._pendientes = self._pendientes, 0
+            if not total:
+                return 0
+            try:
+                with transaction.atomic(using=self.using):
+                    for modelo, objetos in inserciones.items():
+                        modelo.objects.using(self.using).bulk_create(objetos)
+                    for (modelo, pk), deltas in contadores.items():
+                        aplicar_contadores(modelo, pk, deltas, self.using)
+            except IntegrityError:
+                logger.warning("Lote de escrituras inválido, se aplica por separado")
+                self._aplicar_por_separado(inserciones, contadores)
+            for funcion, *args in despues.values():
+                encolar(funcion, *args)
+            return total
+
+    def _aplicar_por_separado(self, inserciones, contadores):
+        for modelo, objetos in inserciones.items():
+            for objeto in objetos:
+                with self._descartar_si_falla(modelo):
+                    modelo.objects.using(self.using).bulk_create([objeto])
+        for (modelo, pk), deltas in contadores.items():
+            with self._descartar_si_falla(modelo):
+                aplicar_contadores(modelo, pk, deltas, self.using)
+
+    @contextmanager
+    def _descartar_si_falla(self, modelo):
+        # Una transacción por operación: solo se pierde la que falla
+        try:
+            with transaction.atomic(using=self.using):
+                yield
+        except IntegrityError:
+            logger.exception("Escritura descartada en %s", modelo.__name__)
+
+
+def _clave(tarea):
+    try:
+        hash(tarea)
+        return tarea
+    except TypeError:
+        return id(tarea)
+
+
+def aplicar_contadores(modelo, pk, deltas, using=DEFAULT_DB_ALIAS):
+    cambios = {
+        campo: F(campo) + delta
+        for campo, delta in deltas.items()
+        if campo != "tendencia" and delta
+    }
+    peso = deltas.get("tendencia", 0)
+    if peso > 0:
+        cambios["tendencia"] = tendencias.sumar(peso)
+    elif peso < 0:
+        cambios["tendencia"] = tendencias.restar(-peso)
+    if hasattr(modelo, "marcar_modificada"):
+        cambios.update(version=F("version") + 1, fecha_actualizacion=timezone.now())
+    if cambios:
+        modelo.objects.using(using).filter(pk=pk).update(**cambios)
+
+
+_cola = None
+_lock = threading.Lock()
+
+
+def agrupadas():
+    return getattr(settings, "ESCRITURAS_AGRUPADAS", False) and not getattr(
+        settings, "TAREAS_SINCRONAS", False
+    )
+
+
+def _obtener_cola():
+    global _cola
+    with _lock:
+        if _cola is None:
+            _cola = ColaEscrituras()
+            atexit.register(_cola.vaciar)
+        return _cola
+
+
+def insertar(objeto):
+    """Guarda `objeto` al confirmar la transacción: agrupado o en el momento."""
+    if agrupadas():
+        transaction.on_commit(lambda: _obtener_cola().insertar(objeto))
+    else:
+        objeto.save(force_insert=True)
+
+
+def incrementar(modelo, pk, despues=(), **deltas):
+    """
+    Suma contadores de una fila (ver ColaEscrituras.incrementar). Sin
+    agrupar se aplica en el momento y `despues` se encola al confirmar.
+    """
+    if agrupadas():
+        transaction.on_commit(
+            lambda: _obtener_cola().incrementar(modelo, pk, despues, **deltas)
+        )
+        return
+    aplicar_contadores(modelo, pk, deltas)
+    for funcion, *args in despues:
+        transaction.on_commit(
+            lambda funcion=funcion, args=args: encolar(funcion, *args)
+        )
+
+
+def vaciar():
+    """Aplica lo pendiente ya (tests, comandos, apagado)."""
+    return _cola.vaciar() if _cola is not None else 0
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Inscripciones, Publicacion
+from .serializers import TAMANO_LOTE
+from .tareas import programar
+
+
+def finalizar_eventos(hasta=None, tamano_lote=TAMANO_LOTE):
+    """
+    Pasa a "FIN" las publicaciones vigentes cuyo fecha_evento ya pasó y sus
+    inscripciones "INS" a "NOASI". Trabaja por lotes de `tamano_lote`
+    publicaciones, cada uno en su propia transacción corta (en SQLite la
+    escritura bloquea toda la base). Es idempotente: solo toca filas que
+    siguen en el estado de origen. Devuelve los totales procesados.
+    """
+    hasta = hasta or timezone.now()
+    totales = {"publicaciones": 0, "inscripciones": 0, "lotes": 0}
+    vencidas = Publicacion.objects.filter(estado="VIG", fecha_evento__lt=hasta)
+    while True:
+        # Recorre el índice (estado, fecha_evento); las ya finalizadas salen
+        # del rango, así que cada vuelta lee el siguiente lote
+        ids = list(
+            vencidas.order_by("fecha_evento").values_list("id", flat=True)[:tamano_lote]
+        )
+        if not ids:
+            return totales
+        ahora = timezone.now()
+        with transaction.atomic():
+            totales["publicaciones"] += Publicacion.objects.filter(
+                id__in=ids, estado="VIG"
+            ).update(
+                estado="FIN",
+                version=F("version") + 1,
+                fecha_actualizacion=ahora,
+            )
+            # update() no aplica auto_now: la sincronización usa esta fecha
+            totales["inscripciones"] += Inscripciones.objects.filter(
+                id_publicacion__in=ids, estado_asistencia="INS"
+            ).update(estado_asistencia="NOASI", fecha_actualizacion=ahora)
+        totales["lotes"] += 1
+
+
+def iniciar_planificador():
+    """
+    Programa finalizar_eventos en este proceso cada
+    FINALIZAR_EVENTOS_INTERVALO segundos (0 lo desactiva). Se llama desde
+    wsgi.py/asgi.py para no arrancarlo en comandos de gestión ni tests; con
+    varios procesos cada uno lo ejecuta, lo que es inocuo al ser idempotente.
+    """
+    intervalo = getattr(settings, "FINALIZAR_EVENTOS_INTERVALO", 300)
+    if intervalo > 0:
+        programar(finalizar_eventos, intervalo)
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .limites import usuario_de
+from .models import RespuestaIdempotente
+from .presupuesto import fuera_de_presupuesto
+from .tareas import programar
+
+# Cabecera Idempotency-Key en los POST:
+# - La primera petición con una clave reserva la fila (cliente, clave) y, al
+#   terminar, guarda su respuesta durante IDEMPOTENCIA_TTL segundos.
+# - Los reintentos con la misma clave reciben la respuesta guardada sin
+#   ejecutar la vista (sin likes, contadores ni llamadas a Gemini repetidas):
+#   una consulta por el índice único.
+# - Si la primera aún está en curso, el duplicado espera a que termine y
+#   repite su resultado. La misma clave con otro cuerpo o ruta responde 422.
+# - Los errores 5xx y 429 no se guardan: el cliente puede reintentar.
+# - Una reserva sin respuesta tras IDEMPOTENCIA_ESPERA segundos se da por
+#   abandonada (el worker murió) y la clave vuelve a quedar libre.
+
+CABECERA = "Idempotency-Key"
+# Cuerpos que se leen para la huella y el usuario; el resto (multipart,
+# fragmentos de subidas) se identifica por su tamaño sin leerlo aquí
+TIPOS_LEIDOS = ("application/json", "application/x-www-form-urlencoded")
+
+
+def _respuesta_error(mensaje, estado):
+    return JsonResponse({"error": mensaje}, status=estado)
+
+
+def cliente_y_huella(request):
+    tipo = request.content_type or ""
+    datos = None
+    if tipo in TIPOS_LEIDOS:
+        cuerpo = request.body
+        if tipo == "application/json":
+            try:
+                datos = json.loads(cuerpo or b"null")
+            except ValueError:
+                datos = None
+        else:
+            datos = request.POST
+    else:
+        cuerpo = f"{tipo}:{request.META.get('CONTENT_LENGTH', '')}".encode()
+    usuario = usuario_de(request.GET, datos)
+    cliente = (
+        f"usuario:{usuario}"
+        if usuario is not None
+        else f"ip:{request.META.get('REMOTE_ADDR', '')}"
+    )
+    huella = hashlib.sha256(
+        b"\n".join([request.method.encode(), request.get_full_path().encode(), cuerpo])
+    ).hexdigest()
+    return cliente, huella
+
+
+def reproducir(guardada):
+    response = HttpResponse(
+        bytes(guardada.contenido),
+        status=guardada.codigo,
+        content_type=guardada.tipo_contenido or None,
+    )
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def guardar(fila, response):
+    codigo = response.status_code
+    if response.streaming or codigo >= 500 or codigo == 429:
+        RespuestaIdempotente.objects.filter(pk=fila.pk).delete()
+        return
+    RespuestaIdempotente.objects.filter(pk=fila.pk).update(
+        codigo=response.status_code,
+        tipo_contenido=response.get("Content-Type", ""),
+        contenido=response.content,
+    )
+
+
+def purgar_expiradas():
+    return RespuestaIdempotente.objects.filter(expira__lte=timezone.now()).delete()[0]
+
+
+def iniciar_limpieza_periodica():
+    """Borra las respuestas vencidas cada IDEMPOTENCIA_LIMPIEZA_INTERVALO segundos."""
+    intervalo = getattr(settings, "IDEMPOTENCIA_LIMPIEZA_INTERVALO", 3600)
+    if intervalo > 0:
+        programar(purgar_expiradas, intervalo)
+
+
+class IdempotenciaMiddleware:
+    """Aplica Idempotency-Key a los POST (ver arriba); sin la cabecera no hace nada."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        clave = request.headers.get(CABECERA)
+        if request.method != "POST" or not clave:
+            return self.get_response(request)
+        if len(clave) > 255:
+            return _respuesta_error(f"{CABECERA} demasiado larga.", 400)
+        cliente, huella = cliente_y_huella(request)
+
+        # Fuera del presupuesto de consultas de la vista (ver api.presupuesto)
+        with fuera_de_presupuesto():
+            guardada = self.buscar(cliente, clave)
+            fila = self.reservar(cliente, clave, huella) if guardada is None else None
+        if fila is None:
+            with fuera_de_presupuesto():
+                return self.repetir(cliente, clave, huella, guardada)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            with fuera_de_presupuesto():
+                RespuestaIdempotente.objects.filter(pk=fila.pk).delete()
+            raise
+        with fuera_de_presupuesto():
+            guardar(fila, response)
+        return response
+
+    def repetir(self, cliente, clave, huella, guardada):
+        if guardada is None:
+            # Otra petición la reservó entre la búsqueda y la inserción
+            guardada = self.buscar(cliente, clave)
+        if guardada is not None and guardada.huella != huella:
+            return _respuesta_error(f"{CABECERA} ya usada con otra petición.", 422)
+        if guardada is not None and guardada.codigo is None:
+            guardada = self.esperar(cliente, clave)
+        if guardada is None or guardada.codigo is None:
+            return _respuesta_error(
+                "La petición original con esta clave sigue en curso o falló; "
+                "reintentar.",
+                409,
+            )
+        return reproducir(guardada)
+
+    def buscar(self, cliente, clave):
+        guardada = RespuestaIdempotente.objects.filter(
+            cliente=cliente, clave=clave
+        ).first()
+        if guardada is None:
+            return None
+        ahora = timezone.now()
+        espera = timedelta(seconds=getattr(settings, "IDEMPOTENCIA_ESPERA", 30))
+        # Reservada y sin respuesta pasada la espera: el proceso que la
+        # reservó murió (un duplicado ya no la esperaría); se libera la clave
+        abandonada = (
+            guardada.codigo is None and guardada.fecha_creacion + espera <= ahora
+        )
+        if guardada.expira <= ahora or abandonada:
+            RespuestaIdempotente.objects.filter(pk=guardada.pk).delete()
+            return None
+        return guardada
+
+    def reservar(self, cliente, clave, huella):
+        ttl = getattr(settings, "IDEMPOTENCIA_TTL", 60 * 60 * 24)
+        try:
+            with transaction.atomic():
+                return RespuestaIdempotente.objects.create(
+                    cliente=cliente,
+                    clave=clave,
+                    huella=huella,
+                    expira=timezone.now() + timedelta(seconds=ttl),
+                )
+        except IntegrityError:
+            return None
+
+    def esperar(self, cliente, clave):
+        limite = time.monotonic() + getattr(settings, "IDEMPOTENCIA_ESPERA", 30)
+        while time.monotonic() < limite:
+            time.sleep(0.05)
+            guardada = self.buscar(cliente, clave)
+            if guardada is None or guardada.codigo is not None:
+                return guardada
+        return None
@@ -0,0 +1,183 @@
+import hashlib
+import io
+import logging
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Variantes WebP generadas para cada imagen: nombre -> (ancho, alto, recortar)
+VARIANTES = {
+    "miniatura": (150, 150, True),
+    "mediana": (600, 600, False),
+    "grande": (1280, 1280, False),
+}
+CALIDAD_WEBP = 80
+
+# Formato de guardado del original sin metadatos
+FORMATOS_ORIGINAL = {"JPEG": ("JPEG", ".jpg"), "MPO": ("JPEG", ".jpg")}
+FORMATOS_ORIGINAL.update({"PNG": ("PNG", ".png"), "WEBP": ("WEBP", ".webp")})
+
+
+# Subidas aún sin procesar (con EXIF y GPS): /media/ no las sirve nunca
+PREFIJO_PENDIENTES = "pendientes/"
+
+
+def pendiente(nombre):
+    return bool(nombre) and nombre.startswith(PREFIJO_PENDIENTES)
+
+
+def ruta_original(huella, extension):
+    return f"originales/{huella[:2]}/{huella}{extension}"
+
+
+def ruta_variante(huella, nombre):
+    # Dirección por contenido: subidas idénticas comparten las mismas variantes
+    return f"variantes/{huella[:2]}/{huella}/{nombre}.webp"
+
+
+def urls_variantes(huella):
+    """URLs de las variantes de una imagen ya procesada (None si no lo está)."""
+    if not huella:
+        return None
+    return {
+        nombre: default_storage.url(ruta_variante(huella, nombre))
+        for nombre in VARIANTES
+    }
+
+
+def _sin_exif(imagen, formato_origen):
+    # Aplica la orientación EXIF y guarda sin metadatos (GPS, cámara, etc.)
+    imagen = ImageOps.exif_transpose(imagen)
+    formato, extension = FORMATOS_ORIGINAL.get(formato_origen, ("PNG", ".png"))
+    if formato == "JPEG" and imagen.mode not in ("RGB", "L"):
+        imagen = imagen.convert("RGB")
+    buffer = io.BytesIO()
+    opciones = {"quality": 90, "optimize": True} if formato == "JPEG" else {}
+    imagen.save(buffer, formato, **opciones)
+    return buffer.getvalue(), extension, imagen
+
+
+def _variante(imagen, ancho, alto, recortar):
+    if recortar:
+        variante = ImageOps.fit(imagen, (ancho, alto), Image.Resampling.LANCZOS)
+    else:
+        variante = imagen.copy()
+        variante.thumbnail((ancho, alto), Image.Resampling.LANCZOS)
+    if variante.mode not in ("RGB", "RGBA"):
+        variante = variante.convert("RGBA" if "A" in variante.getbands() else "RGB")
+    buffer = io.BytesIO()
+    variante.save(buffer, "WEBP", quality=CALIDAD_WEBP, method=4)
+    return buffer.getvalue()
+
+
+def _guardar_si_no_existe(ruta, contenido):
+    if default_storage.exists(ruta):
+        return ruta
+    return default_storage.save(ruta, ContentFile(contenido))
+
+
+def procesar_imagen(modelo, pk, campo, campo_huella, nombre_subido):
+    """
+    Tarea en segundo plano para una imagen recién subida:
+    - calcula su huella SHA-256,
+    - guarda el original sin EXIF en una ruta por contenido (deduplicado),
+    - genera las variantes WebP si aún no existen,
+    - apunta el campo del modelo al original deduplicado.
+    Hasta entonces la subida está en PREFIJO_PENDIENTES y no se sirve; si no
+    es una imagen válida se borra y el campo queda vacío.
+    Si la imagen fue reemplazada mientras esperaba en la cola, no hace nada.
+    """
+    instancia = modelo.objects.filter(pk=pk).only(campo).first()
+    archivo = getattr(instancia, campo, None) if instancia else None
+    if not archivo or archivo.name != nombre_subido:
+        return None
+
+    # Se lee por bloques: el archivo subido no se copia entero en memoria
+    with archivo.open("rb") as f:
+        sha = hashlib.sha256()
+        for bloque in f.chunks():
+            sha.update(bloque)
+        huella = sha.hexdigest()
+        f.seek(0)
+        try:
+            imagen = Image.open(f)
+            imagen.load()
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+            imagen = None
+
+    if imagen is None:
+        # Sin un original limpio no hay nada que servir: se descarta la subida
+        # (también las que superan Image.MAX_IMAGE_PIXELS)
+        logger.warning("Imagen inválida, se descarta: %s", nombre_subido)
+        vaciadas = modelo.objects.filter(pk=pk, **{campo: nombre_subido}).update(
+            **{campo: ""}
+        )
+        if vaciadas:
+            default_storage.delete(nombre_subido)
+        return None
+
+    formato, extension = FORMATOS_ORIGINAL.get(imagen.format, ("PNG", ".png"))
+    destino = ruta_original(huella, extension)
+    if not default_storage.exists(destino):
+        limpio, _, imagen = _sin_exif(imagen, imagen.format)
+        destino = _guardar_si_no_existe(destino, limpio)
+    else:
+        imagen = ImageOps.exif_transpose(imagen)
+
+    for nombre, (ancho, alto, recortar) in VARIANTES.items():
+        ruta = ruta_variante(huella, nombre)
+        if not default_storage.exists(ruta):
+            _guardar_si_no_existe(ruta, _variante(imagen, ancho, alto, recortar))
+
+    actualizadas = modelo.objects.filter(pk=pk, **{campo: nombre_subido}).update(
+        **{campo: destino, campo_huella: huella}
+    )
+    if actualizadas and nombre_subido != destino:
+        default_storage.delete(nombre_subido)
+    return huella
+
+
+def procesar_imagen_publicacion(imagen_id, nombre_subido):
+    from .models import ImagenPublicacion, Publicacion
+
+    huella = procesar_imagen(
+        ImagenPublicacion, imagen_id, "imagen", "huella", nombre_subido
+    )
+    imagen = ImagenPublicacion.objects.filter(pk=imagen_id).first()
+    if imagen is None:
+        return huella
+    if not imagen.imagen:
+        # Archivo inválido: la imagen de la publicación desaparece
+        imagen.delete()
+    elif not huella:
+        return None
+    # La URL y las variantes cambian: invalida la cache de la publicación
+    Publicacion.marcar_modificada(imagen.publicacion_id)
+    return huella
+
+
+def _referencias(huella):
+    from .models import ImagenPublicacion, Usuario
+
+    return (
+        Usuario.objects.filter(foto_perfil_huella=huella).count()
+        + ImagenPublicacion.objects.filter(huella=huella).count()
+    )
+
+
+def eliminar_imagen(nombre, huella):
+    """
+    Borra el archivo de una imagen y sus variantes cuando ya nadie la usa.
+    Debe llamarse después de desvincular la imagen del objeto.
+    """
+    if huella:
+        if _referencias(huella):
+            return False
+        for nombre_variante in VARIANTES:
+            default_storage.delete(ruta_variante(huella, nombre_variante))
+    if nombre:
+        default_storage.delete(nombre)
+    return True
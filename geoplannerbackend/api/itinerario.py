@@ -0,0 +1,165 @@
+import time
+
+import numpy as np
+
+RADIO_TIERRA_KM = 6371.0088
+
+# Hasta este número de paradas se usa el algoritmo exacto (Held-Karp)
+MAX_PARADAS_EXACTO = 9
+
+
+def matriz_haversine(latitudes, longitudes):
+    """Matriz NxN de distancias en km entre todos los puntos (vectorizada)."""
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = (
+        np.sin(dlat / 2) ** 2
+        + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    )
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def longitud_ruta(orden, distancias):
+    orden = np.asarray(orden)
+    if len(orden) < 2:
+        return 0.0
+    return float(distancias[orden[:-1], orden[1:]].sum())
+
+
+def held_karp(distancias, inicio=None):
+    """
+    Camino abierto óptimo (sin volver al origen) por programación dinámica
+    sobre subconjuntos. O(2^n · n^2): solo para pocas paradas.
+    """
+    n = len(distancias)
+    completo = (1 << n) - 1
+    costo = np.full((1 << n, n), np.inf)
+    previo = np.full((1 << n, n), -1, dtype=np.int64)
+    inicios = [inicio] if inicio is not None else range(n)
+    for j in inicios:
+        costo[1 << j, j] = 0.0
+
+    nodos = np.arange(n)
+    bits = 1 << nodos
+    for mascara in range(1, completo + 1):
+        fila = costo[mascara]
+        finales = np.flatnonzero(np.isfinite(fila))
+        candidatos = nodos[(mascara & bits) == 0]
+        if not len(finales) or not len(candidatos):
+            continue
+        siguientes = mascara | bits[candidatos]
+        for j in finales:
+            # Extender el camino que termina en j a cada nodo no visitado
+            nuevos = fila[j] + distancias[j, candidatos]
+            mejores = nuevos < costo[siguientes, candidatos]
+            costo[siguientes[mejores], candidatos[mejores]] = nuevos[mejores]
+            previo[siguientes[mejores], candidatos[mejores]] = j
+
+    ultimo = int(np.argmin(costo[completo]))
+    orden, mascara = [], completo
+    while ultimo != -1:
+        orden.append(ultimo)
+        anterior = int(previo[mascara, ultimo])
+        mascara &= ~(1 << ultimo)
+        ultimo = anterior
+    return orden[::-1]
+
+
+def vecino_mas_cercano(distancias, inicio=0):
+    n = len(distancias)
+    visitado = np.zeros(n, dtype=bool)
+    orden = [inicio]
+    visitado[inicio] = True
+    for _ in range(n - 1):
+        fila = np.where(visitado, np.inf, distancias[orden[-1]])
+        siguiente = int(np.argmin(fila))
+        orden.append(siguiente)
+        visitado[siguiente] = True
+    return orden
+
+
+def dos_opt(orden, distancias, limite, fijar_inicio=False):
+    """
+    Mejora 2-opt de un camino abierto hasta no encontrar mejoras o agotar el
+    tiempo (`limite` en segundos de perf_counter). Para cada i se evalúan
+    todos los j de una vez con NumPy.
+    """
+    ruta = np.array(orden, dtype=np.int64)
+    n = len(ruta)
+    if n < 3:
+        return ruta.tolist()
+
+    # Nodo ficticio con distancia 0 a todos: convierte el camino en un ciclo
+    m = n + 1
+    extendida = np.zeros((m, m))
+    extendida[:n, :n] = distancias
+    if fijar_inicio:
+        # Solo el inicio puede quedar junto al nodo ficticio sin penalización
+        penalizacion = distancias.max() * m + 1
+        extendida[n, :n] = extendida[:n, n] = penalizacion
+        extendida[n, ruta[0]] = extendida[ruta[0], n] = 0.0
+    ciclo = np.concatenate(([n], ruta))
+
+    mejora = True
+    while mejora and time.perf_counter() < limite:
+        mejora = False
+        for i in range(1, m - 1):
+            a, b = ciclo[i - 1], ciclo[i]
+            c = ciclo[i + 1 :]
+            d = np.append(ciclo[i + 2 :], ciclo[0])
+            delta = (
+                extendida[a, c] + extendida[b, d] - extendida[a, b] - extendida[c, d]
+            )
+            j = int(np.argmin(delta))
+            if delta[j] < -1e-9:
+                ciclo[i : i + j + 2] = ciclo[i : i + j + 2][::-1]
+                mejora = True
+            if time.perf_counter() >= limite:
+                break
+
+    # Volver a cortar el ciclo en el nodo ficticio
+    posicion = int(np.flatnonzero(ciclo == n)[0])
+    ruta = np.concatenate((ciclo[posicion + 1 :], ciclo[:posicion]))
+    if fijar_inicio and ruta[0] != orden[0]:
+        ruta = ruta[::-1]
+    return ruta.tolist()
+
+
+def optimizar_ruta(distancias, inicio=None, presupuesto_ms=40):
+    """
+    Devuelve (orden, distancia_total_km, metodo) del recorrido que minimiza la
+    distancia. Usa Held-Karp para pocas paradas y vecino más cercano + 2-opt
+    con límite de tiempo para el resto.
+    """
+    distancias = np.asarray(distancias, dtype=np.float64)
+    n = len(distancias)
+    if n <= 2:
+        orden = list(range(n))
+        if inicio is not None and n == 2 and inicio == 1:
+            orden = [1, 0]
+        return orden, longitud_ruta(orden, distancias), "trivial"
+
+    if n <= MAX_PARADAS_EXACTO:
+        orden = held_karp(distancias, inicio)
+        return orden, longitud_ruta(orden, distancias), "exacto"
+
+    limite = time.perf_counter() + presupuesto_ms / 1000
+    if inicio is not None:
+        orden = dos_opt(
+            vecino_mas_cercano(distancias, inicio), distancias, limite, True
+        )
+    else:
+        # Sin inicio fijo se prueba desde varios orígenes mientras haya tiempo
+        orden, mejor = None, np.inf
+        for origen in np.argsort(distancias.sum(axis=1))[::-1]:
+            candidato = dos_opt(
+                vecino_mas_cercano(distancias, int(origen)), distancias, limite
+            )
+            longitud = longitud_ruta(candidato, distancias)
+            if longitud < mejor:
+                orden, mejor = candidato, longitud
+            if time.perf_counter() >= limite:
+                break
+    return orden, longitud_ruta(orden, distancias), "heuristico"
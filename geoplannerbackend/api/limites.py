@@ -0,0 +1,214 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.throttling import BaseThrottle
+
+from .visibilidad import normalizar_usuario
+
+logger = logging.getLogger(__name__)
+
+# Límite de peticiones con cubetas de tokens (token bucket):
+# - Cada cliente tiene una cubeta por IP y, si la petición identifica a un
+#   usuario, otra por usuario (LIMITES_CUBETAS: capacidad y tokens por
+#   segundo). La petición pasa si ambas tienen tokens para su costo.
+# - Cada vista declara su costo con @costo_limite(n) o con el atributo
+#   `costo_limite = {"create": n, ...}` (o un número para todas sus
+#   acciones), como el presupuesto de consultas.
+#   Sin costo declarado (LIMITES_COSTO_POR_DEFECTO = 0) no se consulta nada.
+# - El estado de cada cubeta es (tokens, instante) y se guarda en la cache
+#   LIMITES_CACHE_ALIAS, compartida entre procesos, con un lock por clave
+#   (cache.add) para leer y escribir de forma atómica. Si la cache falla o no
+#   existe, las cubetas se guardan en la memoria del proceso.
+# - Al rechazar, DRF responde 429 con Retry-After (segundos hasta tener tokens).
+
+# Campos con el usuario que hace la petición, según la vista
+CAMPOS_USUARIO = ("usuario_id", "id_usuario", "seguidor", "usuario")
+
+
+def costo_limite(costo):
+    """Declara el costo en tokens de una vista de función o de una acción."""
+
+    def decorar(vista):
+        vista.costo_limite = costo
+        # Encima de @api_view: el throttle recibe la instancia de la clase
+        if hasattr(vista, "cls"):
+            vista.cls.costo_limite = costo
+        return vista
+
+    return decorar
+
+
+def costo_de(view, request):
+    """Costo declarado por la vista (instancia de APIView) para esta petición."""
+    accion = getattr(view, "action", None) or request.method.lower()
+    costo = getattr(getattr(view, accion, None), "costo_limite", None)
+    if costo is not None:
+        return costo
+    costos = getattr(view, "costo_limite", None)
+    if isinstance(costos, dict):
+        costos = costos.get(accion)
+    if costos is not None:
+        return costos
+    return getattr(settings, "LIMITES_COSTO_POR_DEFECTO", 0)
+
+
+def cubeta(estado, ahora, costo, capacidad, tasa):
+    """
+    Aplica `costo` a la cubeta `estado` = (tokens, instante) o None si está
+    llena. Devuelve (nuevo estado, segundos a esperar); 0 = permitido.
+    Un costo negativo devuelve tokens.
+    """
+    if estado is None:
+        tokens = capacidad
+    else:
+        tokens, instante = estado
+        tokens = min(capacidad, tokens + max(0.0, ahora - instante) * tasa)
+    if tokens >= costo:
+        return (min(capacidad, tokens - costo), ahora), 0
+    return (tokens, ahora), (costo - tokens) / tasa
+
+
+class AlmacenLocal:
+    """Cubetas en memoria del proceso; las más antiguas se descartan al llenarse."""
+
+    def __init__(self, maximo=100_000):
+        self.maximo = maximo
+        self._estados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def actualizar(self, clave, funcion, expira=None):
+        with self._lock:
+            estado, resultado = funcion(self._estados.pop(clave, None))
+            self._estados[clave] = estado
+            if len(self._estados) > self.maximo:
+                self._estados.popitem(last=False)
+            return resultado
+
+    def reiniciar(self):
+        with self._lock:
+            self._estados.clear()
+
+
+class AlmacenCache:
+    """
+    Cubetas en una cache de Django compartida entre procesos. El lock por
+    clave usa cache.add, atómico en Redis, Memcached, LocMemCache y
+    DatabaseCache (no en FileBasedCache).
+    """
+
+    def __init__(self, cache, espera_lock=0.05):
+        self.cache = cache
+        self.espera_lock = espera_lock
+
+    def actualizar(self, clave, funcion, expira=None):
+        lock = f"{clave}:lock"
+        limite = time.monotonic() + self.espera_lock
+        while not self.cache.add(lock, 1, timeout=1):
+            if time.monotonic() > limite:
+                # Tantas peticiones a la vez sobre una misma cubeta solo las
+                # hace un cliente que ya está por encima del límite
+                logger.debug("Lock de límite ocupado, se rechaza: %s", clave)
+                return 1
+            time.sleep(0.001)
+        try:
+            estado, resultado = funcion(self.cache.get(clave))
+            self.cache.set(clave, estado, timeout=expira)
+        finally:
+            self.cache.delete(lock)
+        return resultado
+
+
+_local = AlmacenLocal()
+
+
+def obtener_almacen(alias=None):
+    """Almacén de la cache `alias` (por defecto LIMITES_CACHE_ALIAS)."""
+    alias = alias or getattr(settings, "LIMITES_CACHE_ALIAS", None)
+    if not alias:
+        return _local
+    try:
+        cache = caches[alias]
+    except InvalidCacheBackendError:
+        return _local
+    # LocMemCache tampoco se comparte entre procesos: mejor el dict directo
+    if isinstance(cache, LocMemCache):
+        return _local
+    return AlmacenCache(cache)
+
+
+def consumir(clave, costo, capacidad, tasa, almacen=None):
+    """Resta `costo` tokens de la cubeta `clave`. Devuelve los segundos a esperar (0 = permitido)."""
+    almacen = almacen or obtener_almacen()
+
+    def aplicar(estado):
+        return cubeta(estado, time.time(), costo, capacidad, tasa)
+
+    # Una cubeta llena equivale a no tener estado: la clave expira entonces
+    expira = math.ceil(capacidad / tasa) + 1
+    try:
+        return almacen.actualizar(clave, aplicar, expira)
+    except Exception:
+        if almacen is _local:
+            raise
+        logger.exception("Cache de límites no disponible, usando memoria local")
+        return _local.actualizar(clave, aplicar)
+
+
+def reiniciar():
+    """Vacía las cubetas en memoria (tests)."""
+    _local.reiniciar()
+
+
+def usuario_de(*fuentes):
+    """UUID del usuario en el primer campo de CAMPOS_USUARIO de `fuentes`, o None."""
+    for datos in fuentes:
+        if not hasattr(datos, "get"):
+            continue
+        for campo in CAMPOS_USUARIO:
+            usuario = normalizar_usuario(datos.get(campo))
+            if usuario is not None:
+                return usuario
+    return None
+
+
+def claves_cliente(request):
+    """{tipo de cubeta: clave} del cliente: su IP y, si viene, su usuario."""
+    claves = {"ip": f"limite:ip:{request.META.get('REMOTE_ADDR', '')}"}
+    usuario = usuario_de(request.query_params, request.data)
+    if usuario is not None:
+        claves["usuario"] = f"limite:usuario:{usuario}"
+    return claves
+
+
+class CubetaThrottle(BaseThrottle):
+    """Throttle de DRF con las cubetas de LIMITES_CUBETAS (ver arriba)."""
+
+    def allow_request(self, request, view):
+        self.espera = 0
+        costo = costo_de(view, request)
+        if not costo or not getattr(settings, "LIMITES_ACTIVOS", True):
+            return True
+        cubetas = getattr(settings, "LIMITES_CUBETAS", {})
+        consumidas = []
+        for tipo, clave in claves_cliente(request).items():
+            if tipo not in cubetas:
+                continue
+            capacidad, tasa = cubetas[tipo]
+            espera = consumir(clave, costo, capacidad, tasa)
+            if espera:
+                # Devolver lo ya descontado en las otras cubetas
+                for clave_anterior, capacidad, tasa in consumidas:
+                    consumir(clave_anterior, -costo, capacidad, tasa)
+                self.espera = espera
+                return False
+            consumidas.append((clave, capacidad, tasa))
+        return True
+
+    def wait(self):
+        return math.ceil(self.espera) if self.espera else None
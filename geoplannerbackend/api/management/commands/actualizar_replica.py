@@ -0,0 +1,48 @@
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.routers import ESCRITURA, LECTURA
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia la base de datos principal sobre la réplica de lectura cuando "
+        "ambas son archivos SQLite distintos (ver settings.DATABASES). Usa la "
+        "API de backup de SQLite: las conexiones abiertas a la réplica ven la "
+        "copia nueva sin reconectar. Con --intervalo repite cada N segundos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--intervalo", type=float, default=0)
+
+    def handle(self, *args, **options):
+        if LECTURA not in connections.settings:
+            raise CommandError(f'No hay alias "{LECTURA}" en DATABASES.')
+        origen, destino = (connections.settings[a] for a in (ESCRITURA, LECTURA))
+        if not all(d["ENGINE"].endswith("sqlite3") for d in (origen, destino)):
+            raise CommandError(
+                "Solo para réplicas SQLite (PostgreSQL usa su propia replicación)."
+            )
+        if Path(origen["NAME"]).resolve() == Path(destino["NAME"]).resolve():
+            self.stdout.write(
+                "La réplica es el mismo archivo (conexiones de solo lectura): "
+                "no hay nada que copiar."
+            )
+            return
+        while True:
+            inicio = time.perf_counter()
+            with closing(sqlite3.connect(origen["NAME"])) as principal, closing(
+                sqlite3.connect(destino["NAME"], timeout=20)
+            ) as replica:
+                principal.backup(replica)
+            self.stdout.write(
+                f"Réplica actualizada en {time.perf_counter() - inicio:.2f} s."
+            )
+            if not options["intervalo"]:
+                return
+            time.sleep(options["intervalo"])
@@ -0,0 +1,340 @@
+import json
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import requests
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.utils import timezone
+
+from api.models import (
+    ActividadeAgenda,
+    ComentarioPublicacion,
+    Inscripciones,
+    LikePublicacion,
+    Publicacion,
+    Seguimiento,
+    UbicacionEvento,
+    Usuario,
+)
+from api.presupuesto import VerificarConsultas
+
+# Consultas SQL informadas por InstrumentacionMiddleware (api.metricas)
+SERVER_TIMING_DB = re.compile(r'db;[^,]*desc="(\d+) consultas"')
+
+# Rutas de api/urls.py que no se miden: modifican datos (POST/PATCH/DELETE
+# salvo login), llaman a servicios externos o agrupan otras peticiones
+OMITIDAS = (
+    "escrituras de todos los ViewSets",
+    "subidas",
+    "chatbot (Gemini)",
+    "batch",
+    "estadisticas (Nominatim, con --externos)",
+)
+
+
+def muestra():
+    """Objetos representativos: el usuario más seguido y la publicación con más likes."""
+    usuario = Usuario.objects.order_by("-num_seguidores").first()
+    publicacion = (
+        Publicacion.objects.filter(privacidad="PUB")
+        .order_by("-me_gusta")
+        .only("id", "region")
+        .first()
+    )
+    if usuario is None or publicacion is None:
+        raise CommandError("No hay datos: ejecutar antes generar_datos.")
+    ubicacion = (
+        UbicacionEvento.objects.filter(
+            content_type=ContentType.objects.get_for_model(Publicacion),
+            object_id=publicacion.id,
+        )
+        .values("latitud", "longitud")
+        .first()
+    ) or {"latitud": 10.6427, "longitud": -71.6125}
+    return {
+        "usuario": usuario.id,
+        "usuario_nombre": usuario.nombre_usuario,
+        "password": usuario.password_hash,
+        "publicacion": publicacion.id,
+        "region": publicacion.region or "d6nyd",
+        "lat": ubicacion["latitud"],
+        "lon": ubicacion["longitud"],
+        "fecha": date.today().isoformat(),
+    }
+
+
+def rutas(m, externos=False):
+    """[(nombre, método, url, cuerpo JSON)] de cada ruta medible de api/urls.py."""
+    u = m["usuario"]
+    lista = [
+        ("usuario-list", "GET", "/usuarios/", None),
+        ("usuario-detail", "GET", f"/usuarios/{u}/", None),
+        ("actividad-list", "GET", f"/actividades/?usuario={u}", None),
+        (
+            "actividad-itinerario",
+            "GET",
+            f"/actividades/itinerario/?usuario={u}&fecha={m['fecha']}",
+            None,
+        ),
+        ("publicacion-list", "GET", f"/publicaciones/?usuario_id={u}", None),
+        (
+            "publicacion-detail",
+            "GET",
+            f"/publicaciones/{m['publicacion']}/?usuario_id={u}",
+            None,
+        ),
+        ("publicacion-para-ti", "GET", f"/publicaciones/para-ti/?usuario_id={u}", None),
+        (
+            "publicacion-cercanas",
+            "GET",
+            f"/publicaciones/cercanas/?lat={m['lat']}&lon={m['lon']}&usuario_id={u}",
+            None,
+        ),
+        (
+            "publicacion-en-tendencia",
+            "GET",
+            f"/publicaciones/tendencias/?region={m['region']}",
+            None,
+        ),
+        ("ubicacion-list", "GET", "/ubicaciones/", None),
+        ("inscripcion-list", "GET", "/inscripciones/", None),
+        ("likes-list", "GET", "/likes/", None),
+        ("comentarios-list", "GET", "/comentarios/", None),
+        ("imagen-list", "GET", "/imagenes/", None),
+        ("seguimiento-list", "GET", f"/seguimientos/?seguido={u}", None),
+        ("seguimiento-amigos", "GET", f"/seguimientos/amigos/?usuario={u}", None),
+        ("sincronizacion", "GET", f"/sync/?usuario_id={u}", None),
+        ("calendario_usuario", "GET", f"/calendario/{u}.ics", None),
+        ("metricas", "GET", "/metricas/", None),
+        (
+            "login",
+            "POST",
+            "/login/",
+            {"nombre_usuario": m["usuario_nombre"], "password": m["password"]},
+        ),
+    ]
+    if externos:
+        lista.append(("estadisticas_admin", "GET", "/estadisticas/", None))
+    return lista
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _resumen(latencias, duracion, consultas, estados, tamanos):
+    latencias = np.array(latencias) * 1000
+    return {
+        "peticiones": len(latencias),
+        "rps": round(len(latencias) / duracion, 1),
+        "media_ms": round(float(latencias.mean()), 2),
+        "p50_ms": round(float(np.percentile(latencias, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencias, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencias, 99)), 2),
+        "consultas": round(float(np.mean(consultas)), 1) if consultas else None,
+        "estados": sorted(set(estados)),
+        "bytes": int(np.mean(tamanos)),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cada ruta de api/urls.py (throughput, latencia p50/p95/p99 y "
+        "consultas por petición) con el cliente de pruebas de Django o, con "
+        "--url, con varios workers HTTP contra un servidor local. Guarda los "
+        "resultados en JSON (--salida) y los compara con otra ejecución "
+        "(--comparar). Usar sobre datos de generar_datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--peticiones", type=int, default=50)
+        parser.add_argument("--calentamiento", type=int, default=3)
+        parser.add_argument(
+            "--url", help="Servidor a medir por HTTP, p. ej. http://127.0.0.1:8000"
+        )
+        parser.add_argument(
+            "--concurrencia", type=int, default=8, help="Workers HTTP (con --url)."
+        )
+        parser.add_argument("--rutas", help="Nombres separados por coma.")
+        parser.add_argument("--token", help="METRICAS_TOKEN para /metricas/.")
+        parser.add_argument(
+            "--externos",
+            action="store_true",
+            help="Incluir rutas que llaman a servicios externos.",
+        )
+        parser.add_argument("--salida", help="Archivo JSON de resultados.")
+        parser.add_argument("--comparar", help="JSON de una ejecución anterior.")
+
+    def handle(self, *args, **options):
+        seleccion = rutas(muestra(), options["externos"])
+        if options["rutas"]:
+            nombres = {n.strip() for n in options["rutas"].split(",")}
+            desconocidas = nombres - {nombre for nombre, *_ in seleccion}
+            if desconocidas:
+                raise CommandError(f"Rutas desconocidas: {', '.join(desconocidas)}")
+            seleccion = [ruta for ruta in seleccion if ruta[0] in nombres]
+        token = options["token"] or getattr(settings, "METRICAS_TOKEN", "")
+        self.cabeceras = {"Authorization": f"Bearer {token}"} if token else {}
+
+        if options["url"]:
+            medir = self.medir_http
+            modo = f"http ({options['concurrencia']} workers)"
+        else:
+            medir = self.medir_cliente
+            modo = "cliente de pruebas"
+        self.stdout.write(
+            f"Midiendo {len(seleccion)} rutas, {options['peticiones']} peticiones "
+            f"cada una, {modo}. Omitidas: {'; '.join(OMITIDAS)}."
+        )
+
+        resultados = {}
+        for nombre, metodo, url, cuerpo in seleccion:
+            resultados[nombre] = {
+                "metodo": metodo,
+                "url": url,
+                **medir(metodo, url, cuerpo, options),
+            }
+            self.imprimir(nombre, resultados[nombre])
+
+        informe = {
+            "fecha": timezone.now().isoformat(),
+            "commit": _commit(),
+            "modo": modo,
+            "datos": {
+                modelo._meta.model_name: modelo.objects.count()
+                for modelo in (
+                    Usuario,
+                    Seguimiento,
+                    Publicacion,
+                    LikePublicacion,
+                    ComentarioPublicacion,
+                    Inscripciones,
+                    ActividadeAgenda,
+                )
+            },
+            "rutas": resultados,
+        }
+        if options["salida"]:
+            Path(options["salida"]).write_text(json.dumps(informe, indent=2))
+            self.stdout.write(f"Resultados en {options['salida']}")
+        if options["comparar"]:
+            self.comparar(json.loads(Path(options["comparar"]).read_text()), informe)
+
+    def medir_cliente(self, metodo, url, cuerpo, options):
+        cliente = Client(HTTP_HOST="localhost")
+        extra = (
+            {"HTTP_AUTHORIZATION": self.cabeceras["Authorization"]}
+            if (self.cabeceras)
+            else {}
+        )
+
+        def peticion():
+            if metodo == "POST":
+                return cliente.post(
+                    url, cuerpo, content_type="application/json", **extra
+                )
+            return cliente.get(url, **extra)
+
+        for _ in range(options["calentamiento"]):
+            peticion()
+        latencias, consultas, estados, tamanos = [], [], [], []
+        inicio_total = time.perf_counter()
+        for _ in range(options["peticiones"]):
+            with VerificarConsultas(fallar=False) as verificacion:
+                inicio = time.perf_counter()
+                response = peticion()
+                contenido = (
+                    b"".join(response.streaming_content)
+                    if response.streaming
+                    else response.content
+                )
+                latencias.append(time.perf_counter() - inicio)
+            consultas.append(verificacion.total)
+            estados.append(response.status_code)
+            tamanos.append(len(contenido))
+        return _resumen(
+            latencias, time.perf_counter() - inicio_total, consultas, estados, tamanos
+        )
+
+    def medir_http(self, metodo, url, cuerpo, options):
+        base = options["url"].rstrip("/")
+        locales = threading.local()
+
+        def peticion(_):
+            sesion = getattr(locales, "sesion", None)
+            if sesion is None:
+                sesion = locales.sesion = requests.Session()
+                sesion.headers.update(self.cabeceras)
+            inicio = time.perf_counter()
+            response = sesion.request(metodo, base + url, json=cuerpo, timeout=60)
+            duracion = time.perf_counter() - inicio
+            coincidencia = SERVER_TIMING_DB.search(
+                response.headers.get("Server-Timing", "")
+            )
+            return (
+                duracion,
+                int(coincidencia.group(1)) if coincidencia else None,
+                response.status_code,
+                len(response.content),
+            )
+
+        with ThreadPoolExecutor(max_workers=options["concurrencia"]) as pool:
+            list(pool.map(peticion, range(options["calentamiento"])))
+            inicio = time.perf_counter()
+            filas = list(pool.map(peticion, range(options["peticiones"])))
+            duracion = time.perf_counter() - inicio
+        latencias, consultas, estados, tamanos = zip(*filas)
+        return _resumen(
+            latencias,
+            duracion,
+            [c for c in consultas if c is not None],
+            estados,
+            tamanos,
+        )
+
+    def imprimir(self, nombre, r):
+        consultas = "-" if r["consultas"] is None else r["consultas"]
+        self.stdout.write(
+            f"{nombre:<26} {r['rps']:>8.1f} req/s  p50={r['p50_ms']:>8.2f} ms  "
+            f"p95={r['p95_ms']:>8.2f} ms  p99={r['p99_ms']:>8.2f} ms  "
+            f"consultas={consultas}  bytes={r['bytes']}  estados={r['estados']}"
+        )
+
+    def comparar(self, base, actual):
+        self.stdout.write(
+            f"\nComparación con {base.get('commit') or base['fecha']} "
+            f"({base['modo']}):"
+        )
+        for nombre, r in actual["rutas"].items():
+            anterior = base["rutas"].get(nombre)
+            if anterior is None:
+                self.stdout.write(f"{nombre:<26} (nueva)")
+                continue
+            cambios = []
+            for campo in ("rps", "p50_ms", "p95_ms", "consultas"):
+                antes, despues = anterior.get(campo), r.get(campo)
+                if not antes or despues is None:
+                    cambios.append(f"{campo}={despues}")
+                    continue
+                cambios.append(
+                    f"{campo}={antes}->{despues} ({(despues - antes) / antes:+.0%})"
+                )
+            self.stdout.write(f"{nombre:<26} " + "  ".join(cambios))
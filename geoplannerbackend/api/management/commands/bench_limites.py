@@ -0,0 +1,116 @@
+import multiprocessing
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.commands.createcachetable import (
+    Command as CrearTablaCache,
+)
+from django.db import connection, connections
+
+from api import limites
+
+TABLA_BENCH = "limites_bench"
+
+
+def _trabajador(almacen, clave, capacidad, tasa, inicio, fin, resultados):
+    permitidas = rechazadas = 0
+    latencias = []
+    while time.time() < inicio:
+        time.sleep(0.001)
+    while time.time() < fin:
+        antes = time.perf_counter()
+        espera = limites.consumir(clave, 1, capacidad, tasa, almacen)
+        latencias.append(time.perf_counter() - antes)
+        if espera:
+            rechazadas += 1
+        else:
+            permitidas += 1
+    connections.close_all()
+    resultados.put((permitidas, rechazadas, float(np.mean(latencias)) * 1e6))
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga de api.limites con varios procesos consumiendo de la "
+        "misma cubeta: compara las peticiones permitidas con las teóricas "
+        "(capacidad + tasa x duración) y mide el costo por petición. Con "
+        "--bd usa una DatabaseCache temporal en la base de datos principal "
+        "(compartida y atómica sin servicios externos)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procesos", type=int, default=4)
+        parser.add_argument("--segundos", type=float, default=5)
+        parser.add_argument("--capacidad", type=int, default=50)
+        parser.add_argument("--tasa", type=float, default=20)
+        parser.add_argument(
+            "--cache",
+            default=None,
+            help="Alias de cache (por defecto LIMITES_CACHE_ALIAS).",
+        )
+        parser.add_argument("--bd", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["bd"]:
+            creador = CrearTablaCache()
+            creador.verbosity = 0
+            creador.create_table(connection.alias, TABLA_BENCH, False)
+            almacen = limites.AlmacenCache(DatabaseCache(TABLA_BENCH, {}))
+            descripcion = f"DatabaseCache ({connection.vendor})"
+        else:
+            alias = options["cache"] or getattr(settings, "LIMITES_CACHE_ALIAS", None)
+            if alias and alias not in settings.CACHES:
+                raise CommandError(f'No hay cache "{alias}" en CACHES.')
+            almacen = limites.obtener_almacen(alias)
+            descripcion = (
+                "memoria de cada proceso"
+                if almacen is limites._local
+                else caches[alias].__class__.__name__
+            )
+        try:
+            self.medir(almacen, descripcion, options)
+        finally:
+            if options["bd"]:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"DROP TABLE {connection.ops.quote_name(TABLA_BENCH)}"
+                    )
+
+    def medir(self, almacen, descripcion, options):
+        capacidad, tasa = options["capacidad"], options["tasa"]
+        clave = f"limite:bench:{time.time()}"
+        # Los hijos abren sus propias conexiones
+        connections.close_all()
+        contexto = multiprocessing.get_context("fork")
+        resultados = contexto.Queue()
+        inicio = time.time() + 0.5
+        fin = inicio + options["segundos"]
+        procesos = [
+            contexto.Process(
+                target=_trabajador,
+                args=(almacen, clave, capacidad, tasa, inicio, fin, resultados),
+            )
+            for _ in range(options["procesos"])
+        ]
+        for proceso in procesos:
+            proceso.start()
+        filas = [resultados.get() for _ in procesos]
+        for proceso in procesos:
+            proceso.join()
+
+        permitidas = sum(f[0] for f in filas)
+        rechazadas = sum(f[1] for f in filas)
+        teoricas = capacidad + tasa * options["segundos"]
+        self.stdout.write(
+            f"{descripcion}, {options['procesos']} procesos, "
+            f"{options['segundos']} s, capacidad={capacidad} tasa={tasa}/s\n"
+            f"  peticiones: {permitidas + rechazadas} "
+            f"({(permitidas + rechazadas) / options['segundos']:.0f}/s)\n"
+            f"  permitidas: {permitidas} (teóricas {teoricas:.0f}, "
+            f"error {(permitidas - teoricas) / teoricas:+.1%})\n"
+            f"  costo medio por petición: {np.mean([f[2] for f in filas]):.1f} µs"
+        )
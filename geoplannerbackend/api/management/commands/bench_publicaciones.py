@@ -0,0 +1,112 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.middleware import codificaciones_disponibles
+from api.models import ComentarioPublicacion, Publicacion, UbicacionEvento, Usuario
+from api.renderers import OrjsonRenderer
+from api.serializers import PublicacionSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el tiempo de render JSON y los bytes transferidos de /publicaciones/. "
+        "Los datos sintéticos se crean dentro de una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--publicaciones", type=int, default=200)
+        parser.add_argument("--repeticiones", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.crear_datos(options["publicaciones"])
+            self.medir_render(options["repeticiones"])
+            self.medir_bytes()
+            transaction.set_rollback(True)
+
+    def crear_datos(self, cantidad):
+        usuario = Usuario.objects.create(
+            nombre_usuario="bench",
+            email="bench@geoplanner.local",
+            password_hash="bench",
+            nombre="Bench",
+            apellido="Geoplanner",
+            fecha_nacimiento=date(2000, 1, 1),
+        )
+        ahora = timezone.now()
+        publicaciones = Publicacion.objects.bulk_create(
+            [
+                Publicacion(
+                    id_usuario=usuario,
+                    titulo=f"Evento {i}",
+                    descripcion="Descripción de prueba " * 5,
+                    categoria=random.choice(Publicacion.CATEGORIA_OPCIONES)[0],
+                    terminos_condiciones="Términos",
+                    capacidad_maxima=random.randint(10, 500),
+                    fecha_evento=ahora + timedelta(days=i % 60),
+                )
+                for i in range(cantidad)
+            ]
+        )
+        UbicacionEvento.objects.bulk_create(
+            [
+                UbicacionEvento(
+                    content_object=p,
+                    latitud=Decimal("10.6") + Decimal(random.random()).quantize(
+                        Decimal("0.000001")
+                    ),
+                    longitud=Decimal("-71.6") + Decimal(random.random()).quantize(
+                        Decimal("0.000001")
+                    ),
+                )
+                for p in publicaciones
+            ]
+        )
+        ComentarioPublicacion.objects.bulk_create(
+            [
+                ComentarioPublicacion(
+                    id_usuario=usuario, id_publicacion=p, texto="¡Nos vemos allí!"
+                )
+                for p in publicaciones
+                for _ in range(2)
+            ]
+        )
+
+    def medir_render(self, repeticiones):
+        queryset = Publicacion.objects.prefetch_related(
+            "ubicacion", "likes", "comentarios_publicacion"
+        )
+        data = PublicacionSerializer(queryset, many=True).data
+
+        for renderer in (JSONRenderer(), OrjsonRenderer()):
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                contenido = renderer.render(data)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            self.stdout.write(
+                f"{type(renderer).__name__:<16} mediana={statistics.median(tiempos):.2f} ms "
+                f"min={min(tiempos):.2f} ms bytes={len(contenido)}"
+            )
+
+    def medir_bytes(self):
+        cliente = Client(HTTP_HOST="localhost")
+        for codificacion in ["identity"] + codificaciones_disponibles():
+            response = cliente.get(
+                "/publicaciones/",
+                HTTP_ACCEPT="application/json",
+                HTTP_ACCEPT_ENCODING=codificacion,
+            )
+            self.stdout.write(
+                f"Accept-Encoding={codificacion:<9} bytes={len(response.content)} "
+                f"Content-Encoding={response.get('Content-Encoding', '-')}"
+            )
@@ -0,0 +1,197 @@
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from api.escrituras import ColaEscrituras
+from api.models import Conversacion, LikePublicacion, Publicacion, Usuario
+
+# Configuraciones comparadas: la de antes (SQLite sin opciones), el perfil de
+# producción de settings.py y el perfil con la cola de escrituras agrupadas
+CONFIGURACIONES = (
+    ("por_defecto", {}, False),
+    ("produccion", None, False),
+    ("produccion+cola", None, True),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el throughput de escrituras concurrentes en SQLite (likes y "
+        "mensajes del chatbot desde varios hilos) con la configuración por "
+        "defecto, con el perfil de producción (WAL, busy_timeout, BEGIN "
+        "IMMEDIATE) y con la cola de escrituras agrupadas. Cada configuración "
+        "usa una base temporal con el esquema actual."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hilos", type=int, default=8)
+        parser.add_argument(
+            "--operaciones", type=int, default=200, help="Likes por hilo."
+        )
+        parser.add_argument(
+            "--publicaciones",
+            type=int,
+            default=20,
+            help="Publicaciones que reciben los likes (menos = más contención).",
+        )
+
+    def handle(self, *args, **options):
+        esquema = self.esquema()
+        self.stdout.write(
+            f"{options['hilos']} hilos x {options['operaciones']} operaciones "
+            "(like: comprobar + insertar + contador; mensaje: insertar Conversacion)"
+        )
+        with tempfile.TemporaryDirectory() as directorio:
+            for nombre, opciones, cola in CONFIGURACIONES:
+                if opciones is None:
+                    opciones = settings.DATABASES["default"].get("OPTIONS", {})
+                alias = f"bench_{nombre.replace('+', '_')}"
+                ruta = Path(directorio) / f"{alias}.sqlite3"
+                with sqlite3.connect(ruta) as conexion:
+                    conexion.executescript(esquema)
+                connections.settings[alias] = {
+                    **connections.settings["default"],
+                    "NAME": str(ruta),
+                    "OPTIONS": opciones,
+                }
+                try:
+                    resultado = self.medir(alias, cola, options)
+                finally:
+                    connections[alias].close()
+                self.imprimir(nombre, resultado)
+
+    def esquema(self):
+        with connections["default"].cursor() as cursor:
+            cursor.execute(
+                "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL "
+                "AND name NOT LIKE 'sqlite_%' ORDER BY type = 'index'"
+            )
+            return ";\n".join(sql for (sql,) in cursor.fetchall()) + ";"
+
+    def medir(self, alias, agrupar, options):
+        usuarios = Usuario.objects.using(alias).bulk_create(
+            [
+                Usuario(
+                    nombre_usuario=f"bench{i}",
+                    email=f"bench{i}@geoplanner.local",
+                    password_hash="bench",
+                    nombre="Bench",
+                    apellido="Geoplanner",
+                    fecha_nacimiento=date(2000, 1, 1),
+                )
+                for i in range(options["hilos"] * options["operaciones"])
+            ]
+        )
+        publicaciones = Publicacion.objects.using(alias).bulk_create(
+            [
+                Publicacion(
+                    id_usuario=usuarios[0],
+                    titulo=f"Evento {i}",
+                    descripcion="Descripción",
+                    terminos_condiciones="Términos",
+                    capacidad_maxima=100,
+                    fecha_evento=timezone.now(),
+                )
+                for i in range(options["publicaciones"])
+            ]
+        )
+        cola = ColaEscrituras(using=alias) if agrupar else None
+        latencias, errores = [], []
+        lock = threading.Lock()
+
+        def dar_like(usuario, publicacion):
+            existe = (
+                LikePublicacion.objects.using(alias)
+                .filter(id_usuario=usuario, id_publicacion=publicacion)
+                .exists()
+            )
+            if existe:
+                return
+            if cola is not None:
+                cola.insertar(
+                    LikePublicacion(id_usuario=usuario, id_publicacion=publicacion)
+                )
+                cola.incrementar(Publicacion, publicacion.id, me_gusta=1)
+                return
+            with transaction.atomic(using=alias):
+                LikePublicacion.objects.using(alias).create(
+                    id_usuario=usuario, id_publicacion=publicacion
+                )
+                Publicacion.objects.using(alias).filter(id=publicacion.id).update(
+                    me_gusta=F("me_gusta") + 1
+                )
+
+        def escribir_mensaje(usuario):
+            mensaje = Conversacion(usuario=usuario, remitente="usuario", mensaje="Hola")
+            if cola is not None:
+                cola.insertar(mensaje)
+            else:
+                mensaje.save(using=alias, force_insert=True)
+
+        def trabajador(indice):
+            propias, fallidas = [], 0
+            for i in range(options["operaciones"]):
+                usuario = usuarios[indice * options["operaciones"] + i]
+                for operacion in (
+                    lambda: dar_like(usuario, publicaciones[i % len(publicaciones)]),
+                    lambda: escribir_mensaje(usuario),
+                ):
+                    inicio = time.perf_counter()
+                    try:
+                        operacion()
+                    except OperationalError:
+                        # "database is locked": el busy timeout se agotó
+                        fallidas += 1
+                        continue
+                    propias.append(time.perf_counter() - inicio)
+            connections[alias].close()
+            with lock:
+                latencias.extend(propias)
+                errores.append(fallidas)
+
+        hilos = [
+            threading.Thread(target=trabajador, args=(i,))
+            for i in range(options["hilos"])
+        ]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        if cola is not None:
+            cola.vaciar()
+        duracion = time.perf_counter() - inicio
+
+        likes = LikePublicacion.objects.using(alias).count()
+        contadores = (
+            Publicacion.objects.using(alias).aggregate(total=Sum("me_gusta"))["total"]
+            or 0
+        )
+        latencias = np.array(latencias) * 1000
+        return {
+            "ops_s": len(latencias) / duracion,
+            "errores": sum(errores),
+            "p50_ms": float(np.percentile(latencias, 50)) if len(latencias) else 0,
+            "p95_ms": float(np.percentile(latencias, 95)) if len(latencias) else 0,
+            "likes": likes,
+            "mensajes": Conversacion.objects.using(alias).count(),
+            "contadores_ok": likes == contadores,
+        }
+
+    def imprimir(self, nombre, r):
+        self.stdout.write(
+            f"{nombre:<16} {r['ops_s']:>9.1f} ops/s  errores={r['errores']:<5} "
+            f"p50={r['p50_ms']:>7.2f} ms  p95={r['p95_ms']:>8.2f} ms  "
+            f"likes={r['likes']} mensajes={r['mensajes']} "
+            f"contadores {'ok' if r['contadores_ok'] else 'DESCUADRADOS'}"
+        )
@@ -0,0 +1,140 @@
+import hashlib
+import io
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+from PIL import Image
+
+from api import tareas
+from api.models import Publicacion, Usuario
+
+
+def generar_imagen(megabytes):
+    # Ruido aleatorio: JPEG casi incompresible, el tamaño sigue al número de píxeles
+    lado = max(64, int((megabytes * 1024 * 1024 / 1.2) ** 0.5))
+    pixeles = np.random.default_rng(0).integers(0, 256, (lado, lado, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixeles).save(buffer, "JPEG", quality=95)
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el throughput y el pico de memoria de subidas concurrentes de "
+        "imágenes: multipart a /imagenes/ y reanudable por fragmentos a "
+        "/subidas/. El pico de memoria (tracemalloc) incluye el cuerpo que arma "
+        "el cliente de prueba: un archivo completo por petición multipart y un "
+        "fragmento por petición reanudable."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrencia", type=int, default=4)
+        parser.add_argument("--archivos", type=int, default=16)
+        parser.add_argument("--tamano-mb", type=float, default=4)
+        parser.add_argument("--fragmento-mb", type=float, default=1)
+
+    def handle(self, *args, **options):
+        contenido = generar_imagen(options["tamano_mb"])
+        self.fragmento = int(options["fragmento_mb"] * 1024 * 1024)
+        self.stdout.write(
+            f"{options['archivos']} archivos de {len(contenido) / 1e6:.2f} MB, "
+            f"concurrencia {options['concurrencia']}"
+        )
+
+        usuario = Usuario.objects.create(
+            nombre_usuario="bench_subidas",
+            email="bench_subidas@geoplanner.local",
+            password_hash="bench",
+            nombre="Bench",
+            apellido="Geoplanner",
+            fecha_nacimiento=date(2000, 1, 1),
+        )
+        try:
+            self.publicacion = Publicacion.objects.create(
+                id_usuario=usuario,
+                titulo="Bench subidas",
+                descripcion="",
+                categoria="OTR",
+                terminos_condiciones="",
+                capacidad_maxima=1,
+                fecha_evento=timezone.now(),
+            )
+            for modo in (self.subir_multipart, self.subir_fragmentos):
+                self.medir(modo, contenido, options)
+        finally:
+            # Las variantes se generan en segundo plano: esperar antes de borrar
+            tareas.esperar(timeout=120)
+            usuario.delete()
+
+    def medir(self, modo, contenido, options):
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrencia"]) as pool:
+            estados = list(
+                pool.map(lambda i: modo(contenido, i), range(options["archivos"]))
+            )
+        duracion = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        total = len(contenido) * options["archivos"]
+        fallidas = sum(1 for estado in estados if estado != 201)
+        self.stdout.write(
+            f"{modo.__name__:<17} {total / duracion / 1e6:7.1f} MB/s  "
+            f"{duracion:6.2f} s  pico={pico / 1e6:6.1f} MB  fallidas={fallidas}"
+        )
+
+    def _cliente(self):
+        return Client(HTTP_HOST="localhost")
+
+    def subir_multipart(self, contenido, i):
+        try:
+            response = self._cliente().post(
+                "/imagenes/",
+                {
+                    "publicacion": str(self.publicacion.id),
+                    "imagenes": SimpleUploadedFile(f"bench_{i}.jpg", contenido),
+                },
+            )
+            return response.status_code
+        finally:
+            connection.close()
+
+    def subir_fragmentos(self, contenido, i):
+        cliente = self._cliente()
+        try:
+            response = cliente.post(
+                "/subidas/",
+                {
+                    "publicacion": str(self.publicacion.id),
+                    "nombre_archivo": f"bench_{i}.jpg",
+                    "tamano_total": len(contenido),
+                    "sha256": hashlib.sha256(contenido).hexdigest(),
+                },
+                content_type="application/json",
+            )
+            subida_id = response.json()["id"]
+            vista = memoryview(contenido)
+            for offset in range(0, len(contenido), self.fragmento):
+                fragmento = vista[offset : offset + self.fragmento].tobytes()
+                response = cliente.put(
+                    f"/subidas/{subida_id}/fragmento/",
+                    fragmento,
+                    content_type="application/offset+octet-stream",
+                    HTTP_UPLOAD_OFFSET=str(offset),
+                    HTTP_UPLOAD_CHECKSUM="sha256 "
+                    + hashlib.sha256(fragmento).hexdigest(),
+                )
+                if response.status_code != 200:
+                    return response.status_code
+            return cliente.post(f"/subidas/{subida_id}/finalizar/").status_code
+        finally:
+            connection.close()
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import reset_queries
+
+from api.models import Usuario
+from api.timeline import construir_timeline
+
+
+class Command(BaseCommand):
+    help = (
+        "Construye (o reconstruye) los timelines precalculados de los usuarios "
+        "con las publicaciones recientes de sus seguidos y las cercanas. Útil "
+        "al activar los timelines o después de importar_eventos, cuyas "
+        "inserciones masivas no pasan por el fan-out."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--usuario", action="append", help="UUID de un usuario (repetible)."
+        )
+        parser.add_argument("--tamano-bloque", type=int, default=500)
+
+    def handle(self, *args, **options):
+        usuarios = Usuario.objects.order_by("id")
+        if options["usuario"]:
+            usuarios = usuarios.filter(id__in=options["usuario"])
+            if not usuarios.exists():
+                raise CommandError("No existe ninguno de los usuarios indicados.")
+
+        total = usuarios.count()
+        procesados = entradas = 0
+        inicio = time.perf_counter()
+        for usuario in usuarios.iterator(chunk_size=options["tamano_bloque"]):
+            entradas += construir_timeline(usuario)
+            procesados += 1
+            if procesados % options["tamano_bloque"] == 0:
+                reset_queries()  # Con DEBUG=True el log de consultas crecería
+                self.stdout.write(
+                    f"{procesados}/{total} usuarios, "
+                    f"{procesados / (time.perf_counter() - inicio):.0f} usuarios/s"
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Timelines construidos: {procesados} usuarios, {entradas} entradas "
+                f"en {time.perf_counter() - inicio:.1f} s."
+            )
+        )
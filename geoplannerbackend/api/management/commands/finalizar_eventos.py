@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api.eventos import finalizar_eventos
+from api.serializers import TAMANO_LOTE
+
+
+class Command(BaseCommand):
+    help = (
+        "Pasa a 'FIN' las publicaciones vigentes cuyo fecha_evento ya pasó y "
+        "marca como 'NOASI' sus inscripciones pendientes, por lotes. Es "
+        "idempotente: puede ejecutarse desde cron tantas veces como se quiera "
+        "(el servidor también lo hace cada FINALIZAR_EVENTOS_INTERVALO)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hasta",
+            help="Fecha/hora límite ISO 8601 (por defecto, ahora).",
+        )
+        parser.add_argument("--tamano-lote", type=int, default=TAMANO_LOTE)
+
+    def handle(self, *args, **options):
+        hasta = None
+        if options["hasta"]:
+            hasta = parse_datetime(options["hasta"])
+            if hasta is None:
+                raise CommandError("--hasta debe ser una fecha/hora ISO 8601.")
+            if timezone.is_naive(hasta):
+                hasta = timezone.make_aware(hasta)
+        if options["tamano_lote"] < 1:
+            raise CommandError("--tamano-lote debe ser mayor que 0.")
+
+        inicio = time.perf_counter()
+        totales = finalizar_eventos(hasta, options["tamano_lote"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Eventos finalizados: {totales['publicaciones']} publicaciones, "
+                f"{totales['inscripciones']} inscripciones en {totales['lotes']} "
+                f"lotes ({time.perf_counter() - inicio:.2f} s)."
+            )
+        )
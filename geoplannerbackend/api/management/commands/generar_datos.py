@@ -0,0 +1,408 @@
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import (
+    ComentarioPublicacion,
+    Conversacion,
+    Inscripciones,
+    LikePublicacion,
+    Publicacion,
+    Seguimiento,
+    UbicacionEvento,
+    Usuario,
+)
+from api.serializers import TAMANO_LOTE
+from api.tendencias import geohash
+
+# (ciudad, país, latitud, longitud, fracción de los usuarios)
+CIUDADES = (
+    ("Caracas", "Venezuela", 10.4806, -66.9036, 0.30),
+    ("Maracaibo", "Venezuela", 10.6427, -71.6125, 0.22),
+    ("Valencia", "Venezuela", 10.1620, -68.0077, 0.15),
+    ("Barquisimeto", "Venezuela", 10.0678, -69.3474, 0.12),
+    ("Mérida", "Venezuela", 8.5897, -71.1561, 0.08),
+    ("Bogotá", "Colombia", 4.7110, -74.0721, 0.13),
+)
+DISPERSION_KM = 6  # desviación típica alrededor del centro de cada ciudad
+KM_POR_GRADO = 111.32
+
+CATEGORIAS = (("SOC", 0.35), ("CUL", 0.25), ("DEP", 0.2), ("ACA", 0.1), ("OTR", 0.1))
+PRIVACIDADES = (("PUB", 0.8), ("AMI", 0.15), ("PRI", 0.05))
+
+# Exponente de las colas (Pareto): pocos usuarios concentran seguidores,
+# publicaciones y la mayoría de likes y comentarios caen en pocos eventos
+ALFA = 1.5
+SEGUIMIENTOS_LOCALES = 0.7  # fracción de seguidos de la misma ciudad
+
+COMENTARIOS = (
+    "¡Nos vemos allí!",
+    "¿Hay estacionamiento cerca?",
+    "Excelente iniciativa, cuenten conmigo.",
+    "¿A qué hora termina?",
+    "El año pasado estuvo increíble.",
+)
+MENSAJES = (
+    ("usuario", "¿Qué eventos hay este fin de semana?"),
+    ("bot", "Encontré varios eventos culturales cerca de ti."),
+    ("usuario", "¿Alguno gratuito?"),
+    ("bot", "Sí, el concierto del sábado en la plaza es gratuito."),
+)
+
+DOMINIO = "generado.geoplanner"
+
+
+def _uuids(rng, cantidad):
+    datos = rng.bytes(16 * cantidad)
+    return [
+        uuid.UUID(bytes=datos[i : i + 16], version=4) for i in range(0, len(datos), 16)
+    ]
+
+
+def _cola_pesada(rng, media, cantidad, maximo):
+    """Enteros >= 0 con cola de Pareto y la media pedida, acotados a `maximo`."""
+    if media <= 0:
+        return np.zeros(cantidad, dtype=np.int64)
+    valores = (rng.pareto(ALFA, cantidad) + 1) * media * (ALFA - 1) / ALFA
+    return np.minimum(valores.astype(np.int64), maximo)
+
+
+def _muestrear(rng, acumulada, cantidad):
+    # Índices según la distribución acumulada (búsqueda binaria, vectorizada)
+    return np.minimum(
+        np.searchsorted(acumulada, rng.random(cantidad) * acumulada[-1]),
+        len(acumulada) - 1,
+    )
+
+
+def _coordenada(rng, centros, cantidad):
+    desvio = DISPERSION_KM / KM_POR_GRADO
+    return np.round(centros + rng.normal(0, desvio, (cantidad, 2)), 6)
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un dataset sintético realista con bulk_create: usuarios "
+        "agrupados en ciudades, seguimientos, publicaciones con categorías y "
+        "ubicación, likes y comentarios con distribución de ley de potencias, "
+        "inscripciones y conversaciones. Escala a millones de filas procesando "
+        "por lotes. Los usuarios generados usan correos @generado.geoplanner."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuarios", type=int, default=1000)
+        parser.add_argument(
+            "--publicaciones",
+            type=int,
+            help="Por defecto, 2 por usuario.",
+        )
+        parser.add_argument("--seguidos-promedio", type=float, default=20)
+        parser.add_argument("--likes-promedio", type=float, default=15)
+        parser.add_argument("--comentarios-promedio", type=float, default=3)
+        parser.add_argument("--inscripciones-promedio", type=float, default=8)
+        parser.add_argument("--mensajes-promedio", type=float, default=2)
+        parser.add_argument("--semilla", type=int, default=0)
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=5000,
+            help="Filas principales por transacción.",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = np.random.default_rng(options["semilla"])
+        self.lote = max(options["lote"], 1)
+        self.opciones = options
+        n_usuarios = options["usuarios"]
+        if n_usuarios < 2:
+            raise CommandError("Se necesitan al menos 2 usuarios.")
+        n_publicaciones = options["publicaciones"]
+        if n_publicaciones is None:
+            n_publicaciones = 2 * n_usuarios
+        if Usuario.todos.filter(email__endswith=f"@{DOMINIO}").exists():
+            raise CommandError(
+                "Ya hay usuarios generados; usar otra base de datos o "
+                "borrarlos antes de volver a generar."
+            )
+
+        inicio = time.perf_counter()
+        self.totales = {}
+        self.usuarios = _uuids(self.rng, n_usuarios)
+
+        pesos = np.array([ciudad[4] for ciudad in CIUDADES])
+        self.ciudad = self.rng.choice(len(CIUDADES), n_usuarios, p=pesos / pesos.sum())
+        self.centros = np.array([ciudad[2:4] for ciudad in CIUDADES])
+        popularidad = self.rng.pareto(ALFA, n_usuarios) + 1
+        self.acumulada = np.cumsum(popularidad)
+        self.por_ciudad = [
+            (indices, np.cumsum(popularidad[indices]))
+            for indices in (
+                np.flatnonzero(self.ciudad == c) for c in range(len(CIUDADES))
+            )
+        ]
+
+        seguidores, seguidos = self.generar_seguimientos()
+        self.crear_usuarios(np.bincount(seguidos, minlength=n_usuarios))
+        self.crear_seguimientos(seguidores, seguidos)
+        self.crear_publicaciones(n_publicaciones)
+        self.crear_conversaciones()
+
+        duracion = time.perf_counter() - inicio
+        filas = sum(self.totales.values())
+        resumen = ", ".join(
+            f"{nombre}={total}" for nombre, total in self.totales.items()
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{filas} filas en {duracion:.1f} s ({filas / duracion:.0f} filas/s): "
+                f"{resumen}"
+            )
+        )
+        self.stdout.write(
+            "Sugerencia: ejecutar recalcular_tendencias y construir_timelines."
+        )
+
+    def _guardar(self, nombre, modelo, objetos):
+        modelo.objects.bulk_create(objetos, batch_size=TAMANO_LOTE)
+        self.totales[nombre] = self.totales.get(nombre, 0) + len(objetos)
+
+    def _progreso(self, nombre, hechos, total):
+        self.stdout.write(f"  {nombre}: {hechos}/{total}")
+
+    def generar_seguimientos(self):
+        """Pares (seguidor, seguido) sin repetir: la mayoría de la misma ciudad."""
+        n = len(self.usuarios)
+        cantidades = np.minimum(
+            self.rng.poisson(self.opciones["seguidos_promedio"], n), n - 1
+        )
+        seguidores = np.repeat(np.arange(n), cantidades)
+        seguidos = _muestrear(self.rng, self.acumulada, len(seguidores))
+        locales = self.rng.random(len(seguidores)) < SEGUIMIENTOS_LOCALES
+        ciudad_seguidor = self.ciudad[seguidores]
+        for c, (indices, acumulada) in enumerate(self.por_ciudad):
+            mascara = locales & (ciudad_seguidor == c)
+            if len(indices) and mascara.any():
+                seguidos[mascara] = indices[
+                    _muestrear(self.rng, acumulada, int(mascara.sum()))
+                ]
+        pares = np.unique(seguidores * n + seguidos)
+        seguidores, seguidos = pares // n, pares % n
+        distintos = seguidores != seguidos
+        return seguidores[distintos], seguidos[distintos]
+
+    def crear_usuarios(self, num_seguidores):
+        n = len(self.usuarios)
+        coordenadas = _coordenada(self.rng, self.centros[self.ciudad], n)
+        generos = self.rng.choice(["M", "F", "O", "N"], n, p=[0.47, 0.47, 0.02, 0.04])
+        edades = self.rng.integers(18 * 365, 65 * 365, n)
+        hoy = date.today()
+        for inicio in range(0, n, self.lote):
+            fin = min(inicio + self.lote, n)
+            with transaction.atomic():
+                self._guardar(
+                    "usuarios",
+                    Usuario,
+                    [
+                        Usuario(
+                            id=self.usuarios[i],
+                            nombre_usuario=f"gen{i}",
+                            email=f"gen{i}@{DOMINIO}",
+                            password_hash="generado",
+                            nombre=f"Usuario{i}",
+                            apellido="Generado",
+                            fecha_nacimiento=hoy - timedelta(days=int(edades[i])),
+                            genero=generos[i],
+                            latitud=Decimal(str(coordenadas[i, 0])),
+                            longitud=Decimal(str(coordenadas[i, 1])),
+                            ciudad=CIUDADES[self.ciudad[i]][0],
+                            pais=CIUDADES[self.ciudad[i]][1],
+                            num_seguidores=int(num_seguidores[i]),
+                        )
+                        for i in range(inicio, fin)
+                    ],
+                )
+            self._progreso("usuarios", fin, n)
+
+    def crear_seguimientos(self, seguidores, seguidos):
+        total = len(seguidores)
+        for inicio in range(0, total, self.lote):
+            fin = min(inicio + self.lote, total)
+            with transaction.atomic():
+                self._guardar(
+                    "seguimientos",
+                    Seguimiento,
+                    [
+                        Seguimiento(
+                            seguidor_id=self.usuarios[seguidor],
+                            seguido_id=self.usuarios[seguido],
+                        )
+                        for seguidor, seguido in zip(
+                            seguidores[inicio:fin].tolist(),
+                            seguidos[inicio:fin].tolist(),
+                        )
+                    ],
+                )
+            self._progreso("seguimientos", fin, total)
+
+    def _interacciones(self, cantidades, unicas):
+        """
+        (publicación local, usuario) para cada interacción de un lote; con
+        `unicas` se descartan las repetidas (un like por usuario y publicación).
+        """
+        n = len(self.usuarios)
+        publicaciones = np.repeat(np.arange(len(cantidades)), cantidades)
+        usuarios = self.rng.integers(0, n, len(publicaciones))
+        if unicas:
+            pares = np.unique(publicaciones * n + usuarios)
+            publicaciones, usuarios = pares // n, pares % n
+        return publicaciones, usuarios
+
+    def crear_publicaciones(self, total):
+        n = len(self.usuarios)
+        tipo = ContentType.objects.get_for_model(Publicacion)
+        ahora = timezone.now()
+        codigos, pesos = zip(*CATEGORIAS)
+        privacidades, pesos_privacidad = zip(*PRIVACIDADES)
+        opciones = self.opciones
+
+        for inicio in range(0, total, self.lote):
+            cantidad = min(self.lote, total - inicio)
+            autores = _muestrear(self.rng, self.acumulada, cantidad)
+            coordenadas = _coordenada(
+                self.rng, self.centros[self.ciudad[autores]], cantidad
+            )
+            dias = self.rng.uniform(-90, 90, cantidad)
+            capacidades = self.rng.integers(20, 500, cantidad)
+            categorias = self.rng.choice(codigos, cantidad, p=pesos)
+            privacidad = self.rng.choice(privacidades, cantidad, p=pesos_privacidad)
+            canceladas = self.rng.random(cantidad) < 0.03
+            ids = _uuids(self.rng, cantidad)
+
+            likes = self._interacciones(
+                _cola_pesada(self.rng, opciones["likes_promedio"], cantidad, n), True
+            )
+            comentarios = self._interacciones(
+                _cola_pesada(
+                    self.rng, opciones["comentarios_promedio"], cantidad, 10 * n
+                ),
+                False,
+            )
+            inscripciones = self._interacciones(
+                np.minimum(
+                    self.rng.poisson(opciones["inscripciones_promedio"], cantidad),
+                    capacidades,
+                ),
+                True,
+            )
+            me_gusta = np.bincount(likes[0], minlength=cantidad)
+            num_comentarios = np.bincount(comentarios[0], minlength=cantidad)
+
+            publicaciones = []
+            for i in range(cantidad):
+                fecha = ahora + timedelta(days=float(dias[i]))
+                estado = "CAN" if canceladas[i] else ("FIN" if dias[i] < 0 else "VIG")
+                latitud, longitud = coordenadas[i]
+                publicaciones.append(
+                    Publicacion(
+                        id=ids[i],
+                        id_usuario_id=self.usuarios[autores[i]],
+                        titulo=f"Evento {inicio + i}",
+                        descripcion="Evento generado para pruebas de rendimiento.",
+                        categoria=categorias[i],
+                        privacidad=privacidad[i],
+                        estado=estado,
+                        terminos_condiciones="Términos y condiciones.",
+                        capacidad_maxima=int(capacidades[i]),
+                        fecha_evento=fecha,
+                        me_gusta=int(me_gusta[i]),
+                        comentarios=int(num_comentarios[i]),
+                        region=geohash(latitud, longitud),
+                    )
+                )
+            pasadas = dias < 0
+            with transaction.atomic():
+                self._guardar("publicaciones", Publicacion, publicaciones)
+                self._guardar(
+                    "ubicaciones",
+                    UbicacionEvento,
+                    [
+                        UbicacionEvento(
+                            content_type=tipo,
+                            object_id=ids[i],
+                            latitud=Decimal(str(coordenadas[i, 0])),
+                            longitud=Decimal(str(coordenadas[i, 1])),
+                        )
+                        for i in range(cantidad)
+                    ],
+                )
+                self._guardar(
+                    "likes",
+                    LikePublicacion,
+                    [
+                        LikePublicacion(
+                            id_usuario_id=self.usuarios[u], id_publicacion_id=ids[p]
+                        )
+                        for p, u in zip(likes[0].tolist(), likes[1].tolist())
+                    ],
+                )
+                self._guardar(
+                    "comentarios",
+                    ComentarioPublicacion,
+                    [
+                        ComentarioPublicacion(
+                            id_usuario_id=self.usuarios[u],
+                            id_publicacion_id=ids[p],
+                            texto=COMENTARIOS[(p + u) % len(COMENTARIOS)],
+                        )
+                        for p, u in zip(
+                            comentarios[0].tolist(), comentarios[1].tolist()
+                        )
+                    ],
+                )
+                self._guardar(
+                    "inscripciones",
+                    Inscripciones,
+                    [
+                        Inscripciones(
+                            id_usuario_id=self.usuarios[u],
+                            id_publicacion_id=ids[p],
+                            estado_asistencia=(
+                                ("ASI" if (p + u) % 3 else "NOASI")
+                                if pasadas[p]
+                                else ("CAN" if (p + u) % 10 == 0 else "INS")
+                            ),
+                        )
+                        for p, u in zip(
+                            inscripciones[0].tolist(), inscripciones[1].tolist()
+                        )
+                    ],
+                )
+            self._progreso("publicaciones", inicio + cantidad, total)
+
+    def crear_conversaciones(self):
+        n = len(self.usuarios)
+        cantidades = self.rng.poisson(self.opciones["mensajes_promedio"], n)
+        for inicio in range(0, n, self.lote):
+            fin = min(inicio + self.lote, n)
+            with transaction.atomic():
+                self._guardar(
+                    "conversaciones",
+                    Conversacion,
+                    [
+                        Conversacion(
+                            usuario_id=self.usuarios[i],
+                            remitente=MENSAJES[j % len(MENSAJES)][0],
+                            mensaje=MENSAJES[j % len(MENSAJES)][1],
+                        )
+                        for i in range(inicio, fin)
+                        for j in range(int(cantidades[i]))
+                    ],
+                )
+        self._progreso("conversaciones", n, n)
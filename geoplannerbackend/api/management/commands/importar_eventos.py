@@ -0,0 +1,362 @@
+import csv
+import hashlib
+import json
+import re
+import time
+from datetime import datetime, time as dt_time
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import reset_queries, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from api.models import Publicacion, UbicacionEvento, Usuario
+from api.serializers import TAMANO_LOTE
+from api.tendencias import geohash
+
+# Nombres aceptados para cada campo en las propiedades / columnas de origen
+ALIAS = {
+    "id_externo": ("id_externo", "id", "external_id"),
+    "titulo": ("titulo", "nombre", "name", "title"),
+    "descripcion": ("descripcion", "description"),
+    "categoria": ("categoria", "category"),
+    "fecha_evento": ("fecha_evento", "fecha", "date", "start"),
+    "capacidad_maxima": ("capacidad_maxima", "capacidad", "capacity"),
+    "terminos_condiciones": ("terminos_condiciones", "terminos"),
+    "privacidad": ("privacidad",),
+    "latitud": ("latitud", "lat", "latitude"),
+    "longitud": ("longitud", "lon", "lng", "longitude"),
+}
+
+CATEGORIAS = {
+    **{codigo.lower(): codigo for codigo, _ in Publicacion.CATEGORIA_OPCIONES},
+    **{nombre.lower(): codigo for codigo, nombre in Publicacion.CATEGORIA_OPCIONES},
+}
+PRIVACIDADES = {codigo for codigo, _ in Publicacion.PRIVACIDAD_OPCIONES}
+
+TAMANO_LECTURA = 1 << 16
+SEPARADORES = re.compile(r"[\s,]*")
+# Caracteres máximos de una feature del GeoJSON: si no se cierra antes, el
+# archivo está mal formado (evita leerlo entero re-decodificando el buffer)
+MAX_FEATURE = 1 << 24
+# Un error a más de esta distancia del final del buffer no es de un token
+# cortado por el bloque (literal, número o escape \uXXXX) sino de sintaxis
+MARGEN_CORTE = 32
+
+
+class FilaInvalida(Exception):
+    pass
+
+
+def _valor(propiedades, campo):
+    for alias in ALIAS[campo]:
+        valor = propiedades.get(alias)
+        if valor not in (None, ""):
+            return valor
+    return None
+
+
+def _mal_formada(error, buffer):
+    # Una cadena sin cerrar informa la posición de su comienzo: puede ser
+    # solo que el bloque la cortó, y la limita MAX_FEATURE
+    if error.msg.startswith("Unterminated string"):
+        return False
+    return len(buffer) - error.pos > MARGEN_CORTE
+
+
+def features_geojson(archivo, max_feature=MAX_FEATURE):
+    """
+    Recorre las features de un FeatureCollection sin cargar el archivo
+    completo: decodifica cada objeto del arreglo "features" a medida que se lee.
+    Una feature con errores de sintaxis o de más de `max_feature` caracteres
+    detiene la lectura indicando su número.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    posicion = -1
+    while posicion < 0:
+        bloque = archivo.read(TAMANO_LECTURA)
+        if not bloque:
+            raise CommandError("El archivo no contiene un arreglo 'features'.")
+        buffer += bloque
+        posicion = buffer.find('"features"')
+    buffer = buffer[posicion + len('"features"') :]
+
+    # Avanzar hasta el '[' del arreglo
+    while "[" not in buffer:
+        bloque = archivo.read(TAMANO_LECTURA)
+        if not bloque:
+            raise CommandError("El arreglo 'features' está incompleto.")
+        buffer += bloque
+    buffer = buffer[buffer.index("[") + 1 :]
+
+    indice = 0
+    numero = 1
+    while True:
+        indice = SEPARADORES.match(buffer, indice).end()
+        if buffer.startswith("]", indice):
+            return
+        try:
+            feature, indice = decoder.raw_decode(buffer, indice)
+        except json.JSONDecodeError as e:
+            if _mal_formada(e, buffer):
+                raise CommandError(
+                    f"GeoJSON mal formado en la feature {numero}: {e.msg}."
+                )
+            if len(buffer) - indice > max_feature:
+                raise CommandError(
+                    f"La feature {numero} supera {max_feature} caracteres "
+                    "o no está cerrada."
+                )
+            # Feature incompleta: se descarta lo ya leído y se pide otro bloque
+            bloque = archivo.read(TAMANO_LECTURA)
+            if not bloque:
+                raise CommandError("GeoJSON mal formado o incompleto.")
+            buffer = buffer[indice:] + bloque
+            indice = 0
+            continue
+        numero += 1
+        yield feature
+
+
+def features_geojsonseq(archivo):
+    # GeoJSON secuencial: una feature por línea (RFC 8142 permite el separador RS)
+    for linea in archivo:
+        linea = linea.strip().lstrip("\x1e")
+        if linea:
+            yield json.loads(linea)
+
+
+def filas_desde_features(features):
+    for feature in features:
+        propiedades = dict(feature.get("properties") or {})
+        geometria = feature.get("geometry") or {}
+        coordenadas = geometria.get("coordinates")
+        # Un punto mal formado deja la fila sin coordenadas (inválida)
+        if (
+            geometria.get("type") == "Point"
+            and isinstance(coordenadas, list)
+            and len(coordenadas) >= 2
+        ):
+            lon, lat = coordenadas[:2]
+            propiedades.setdefault("longitud", lon)
+            propiedades.setdefault("latitud", lat)
+        if feature.get("id") is not None:
+            propiedades.setdefault("id_externo", feature["id"])
+        yield propiedades
+
+
+def filas_csv(archivo):
+    yield from csv.DictReader(archivo)
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa eventos (Publicacion + UbicacionEvento) desde un archivo GeoJSON, "
+        "GeoJSON secuencial o CSV. Se procesa por bloques con memoria constante, "
+        "cada bloque en su propia transacción. Es reanudable: los eventos cuyo "
+        "id externo ya existe se omiten."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo")
+        parser.add_argument(
+            "--usuario",
+            required=True,
+            help="UUID o nombre_usuario del dueño de los eventos importados.",
+        )
+        parser.add_argument(
+            "--formato", choices=("geojson", "geojsonseq", "csv"), default=None
+        )
+        parser.add_argument("--tamano-bloque", type=int, default=2000)
+        parser.add_argument(
+            "--prefijo-id",
+            default="",
+            help="Prefijo para los ids externos (p. ej. el código de la ciudad).",
+        )
+        parser.add_argument(
+            "--desde-fila",
+            type=int,
+            default=0,
+            help="Omitir sin validar las primeras N filas (reanudar una importación).",
+        )
+        parser.add_argument("--max-errores", type=int, default=20)
+
+    def handle(self, *args, **options):
+        ruta = Path(options["archivo"])
+        if not ruta.is_file():
+            raise CommandError(f"No existe el archivo {ruta}.")
+
+        self.usuario = self._buscar_usuario(options["usuario"])
+        self.prefijo = options["prefijo_id"]
+        self.max_errores = options["max_errores"]
+        self.content_type = ContentType.objects.get_for_model(Publicacion)
+        formato = options["formato"] or self._detectar_formato(ruta)
+
+        totales = {"leidas": 0, "creadas": 0, "duplicadas": 0, "invalidas": 0}
+        inicio = time.perf_counter()
+        with ruta.open(encoding="utf-8-sig", newline="") as archivo:
+            if formato == "csv":
+                filas = filas_csv(archivo)
+            elif formato == "geojsonseq":
+                filas = filas_desde_features(features_geojsonseq(archivo))
+            else:
+                filas = filas_desde_features(features_geojson(archivo))
+
+            bloque = []
+            for numero, fila in enumerate(filas, start=1):
+                if numero <= options["desde_fila"]:
+                    continue
+                bloque.append((numero, fila))
+                if len(bloque) >= options["tamano_bloque"]:
+                    self._procesar_bloque(bloque, totales, inicio)
+                    bloque = []
+            if bloque:
+                self._procesar_bloque(bloque, totales, inicio)
+
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Importación terminada: {totales['leidas']} filas leídas, "
+                f"{totales['creadas']} creadas, {totales['duplicadas']} duplicadas, "
+                f"{totales['invalidas']} inválidas en {duracion:.1f} s "
+                f"({totales['leidas'] / duracion if duracion else 0:.0f} filas/s)."
+            )
+        )
+
+    def _buscar_usuario(self, valor):
+        try:
+            return Usuario.objects.get(id=valor)
+        except (Usuario.DoesNotExist, ValueError, ValidationError):
+            pass
+        try:
+            return Usuario.objects.get(nombre_usuario=valor)
+        except Usuario.DoesNotExist:
+            raise CommandError(f"No existe el usuario {valor}.")
+
+    def _detectar_formato(self, ruta):
+        sufijo = ruta.suffix.lower()
+        if sufijo == ".csv":
+            return "csv"
+        if sufijo in (".geojsonl", ".geojsons", ".jsonl", ".ndjson"):
+            return "geojsonseq"
+        return "geojson"
+
+    def _convertir(self, fila):
+        """Valida una fila y devuelve (id_externo, campos de Publicacion, lat, lon)."""
+        titulo = _valor(fila, "titulo")
+        if not titulo:
+            raise FilaInvalida("falta el título")
+
+        fecha = _valor(fila, "fecha_evento")
+        try:
+            fecha_evento = parse_datetime(str(fecha)) if fecha else None
+            if fecha_evento is None and fecha:
+                dia = parse_date(str(fecha))
+                fecha_evento = datetime.combine(dia, dt_time()) if dia else None
+        except ValueError:  # formato válido pero fecha imposible (2025-02-30)
+            fecha_evento = None
+        if fecha_evento is None:
+            raise FilaInvalida(f"fecha_evento inválida: {fecha!r}")
+        if timezone.is_naive(fecha_evento):
+            fecha_evento = timezone.make_aware(fecha_evento)
+
+        try:
+            capacidad = int(_valor(fila, "capacidad_maxima") or 0)
+        except (TypeError, ValueError):
+            raise FilaInvalida("capacidad_maxima no es un entero")
+        if capacidad < 0:
+            raise FilaInvalida("capacidad_maxima negativa")
+
+        try:
+            lat = Decimal(str(_valor(fila, "latitud"))).quantize(Decimal("0.000001"))
+            lon = Decimal(str(_valor(fila, "longitud"))).quantize(Decimal("0.000001"))
+        except (InvalidOperation, ValueError):
+            raise FilaInvalida("coordenadas inválidas")
+        if not (lat.is_finite() and lon.is_finite()):
+            raise FilaInvalida("coordenadas inválidas")
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise FilaInvalida("coordenadas fuera de rango")
+
+        categoria = CATEGORIAS.get(str(_valor(fila, "categoria") or "").lower(), "OTR")
+        privacidad = str(_valor(fila, "privacidad") or "PUB").upper()
+        if privacidad not in PRIVACIDADES:
+            privacidad = "PUB"
+
+        id_externo = _valor(fila, "id_externo")
+        if id_externo is None:
+            # Sin id en el origen: huella estable para poder deduplicar
+            huella = f"{titulo}|{fecha_evento.isoformat()}|{lat}|{lon}"
+            id_externo = "sha1:" + hashlib.sha1(huella.encode()).hexdigest()
+        id_externo = f"{self.prefijo}{id_externo}"[:100]
+
+        campos = {
+            "titulo": str(titulo)[:200],
+            "descripcion": str(_valor(fila, "descripcion") or ""),
+            "categoria": categoria,
+            "privacidad": privacidad,
+            "terminos_condiciones": str(_valor(fila, "terminos_condiciones") or ""),
+            "capacidad_maxima": capacidad,
+            "fecha_evento": fecha_evento,
+        }
+        return id_externo, campos, lat, lon
+
+    def _procesar_bloque(self, bloque, totales, inicio):
+        validas = {}
+        for numero, fila in bloque:
+            totales["leidas"] += 1
+            try:
+                id_externo, campos, lat, lon = self._convertir(fila)
+            except FilaInvalida as e:
+                totales["invalidas"] += 1
+                if totales["invalidas"] <= self.max_errores:
+                    self.stderr.write(f"Fila {numero}: {e}")
+                continue
+            if id_externo in validas:
+                totales["duplicadas"] += 1
+                continue
+            validas[id_externo] = (campos, lat, lon)
+
+        # Deduplicación contra lo ya importado (una consulta por bloque)
+        existentes = set(
+            Publicacion.todos.filter(id_externo__in=list(validas)).values_list(
+                "id_externo", flat=True
+            )
+        )
+        totales["duplicadas"] += len(existentes)
+
+        publicaciones, ubicaciones = [], []
+        for id_externo, (campos, lat, lon) in validas.items():
+            if id_externo in existentes:
+                continue
+            publicacion = Publicacion(
+                id_usuario=self.usuario,
+                id_externo=id_externo,
+                region=geohash(lat, lon),
+                **campos,
+            )
+            publicaciones.append(publicacion)
+            ubicaciones.append(
+                UbicacionEvento(
+                    content_type=self.content_type,
+                    object_id=publicacion.id,
+                    latitud=lat,
+                    longitud=lon,
+                )
+            )
+
+        with transaction.atomic():
+            Publicacion.objects.bulk_create(publicaciones, batch_size=TAMANO_LOTE)
+            UbicacionEvento.objects.bulk_create(ubicaciones, batch_size=TAMANO_LOTE)
+        totales["creadas"] += len(publicaciones)
+        reset_queries()  # Con DEBUG=True el log de consultas crecería sin límite
+
+        transcurrido = time.perf_counter() - inicio
+        self.stdout.write(
+            f"Fila {bloque[-1][0]}: {totales['creadas']} creadas, "
+            f"{totales['leidas'] / transcurrido:.0f} filas/s"
+        )
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.purga import purgar_pendientes
+
+
+class Command(BaseCommand):
+    help = (
+        "Purga por lotes los usuarios y publicaciones con borrado lógico que "
+        "sigan pendientes (normalmente lo hace una tarea al borrar; el servidor "
+        "también lo reintenta cada PURGA_INTERVALO)."
+    )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        totales = purgar_pendientes()
+        detalle = ", ".join(f"{n} {nombre}" for nombre, n in sorted(totales.items()))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Purga terminada en {time.perf_counter() - inicio:.2f} s: "
+                f"{detalle or 'nada pendiente'}."
+            )
+        )
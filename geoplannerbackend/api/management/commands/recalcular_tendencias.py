@@ -0,0 +1,116 @@
+import math
+import time
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import reset_queries, transaction
+from django.db.models import F
+
+from api.models import (
+    ComentarioPublicacion,
+    Inscripciones,
+    LikePublicacion,
+    Publicacion,
+    UbicacionEvento,
+)
+from api.serializers import TAMANO_LOTE
+from api.tendencias import (
+    PESO_COMENTARIO,
+    PESO_INSCRIPCION,
+    PESO_LIKE,
+    PESO_PUBLICACION,
+    geohash,
+    termino,
+)
+
+# (modelo, campo de fecha, peso, filtro extra)
+INTERACCIONES = (
+    (LikePublicacion, "fecha_like", PESO_LIKE, {}),
+    (ComentarioPublicacion, "fecha_comentario", PESO_COMENTARIO, {}),
+    (
+        Inscripciones,
+        "fecha_creacion",
+        PESO_INSCRIPCION,
+        {"estado_asistencia__in": ("INS", "ASI")},
+    ),
+)
+
+
+def _log_suma(terminos):
+    maximo = max(terminos)
+    return maximo + math.log(sum(math.exp(t - maximo) for t in terminos))
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula desde el historial de likes, comentarios e inscripciones la "
+        "columna de tendencia y la región geohash de las publicaciones. Útil "
+        "tras migrar (las existentes parten del mismo valor) o si cambian los "
+        "pesos o la vida media."
+    )
+
+    def handle(self, *args, **options):
+        content_type = ContentType.objects.get_for_model(Publicacion)
+        total = Publicacion.objects.count()
+        procesadas = 0
+        inicio = time.perf_counter()
+        ids = Publicacion.objects.order_by("id").values_list("id", flat=True)
+        lote = []
+        for publicacion_id in ids.iterator(chunk_size=TAMANO_LOTE):
+            lote.append(publicacion_id)
+            if len(lote) == TAMANO_LOTE:
+                self._recalcular(lote, content_type)
+                procesadas += len(lote)
+                lote = []
+                reset_queries()  # Con DEBUG=True el log de consultas crecería
+                self.stdout.write(f"{procesadas}/{total} publicaciones")
+        if lote:
+            self._recalcular(lote, content_type)
+            procesadas += len(lote)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Tendencias recalculadas: {procesadas} publicaciones en "
+                f"{time.perf_counter() - inicio:.1f} s."
+            )
+        )
+
+    def _recalcular(self, ids, content_type):
+        publicaciones = list(
+            Publicacion.objects.filter(id__in=ids).only(
+                "id", "fecha_creacion", "region", "version"
+            )
+        )
+        terminos = {
+            p.id: [termino(PESO_PUBLICACION, p.fecha_creacion)] for p in publicaciones
+        }
+        for modelo, campo_fecha, peso, filtro in INTERACCIONES:
+            filas = modelo.objects.filter(id_publicacion__in=ids, **filtro).values_list(
+                "id_publicacion", campo_fecha
+            )
+            for publicacion_id, fecha in filas:
+                terminos[publicacion_id].append(termino(peso, fecha))
+
+        regiones = defaultdict(str)
+        ubicaciones = (
+            UbicacionEvento.objects.filter(content_type=content_type, object_id__in=ids)
+            .order_by("-id")
+            .values_list("object_id", "latitud", "longitud")
+        )
+        for publicacion_id, latitud, longitud in ubicaciones:
+            # Orden descendente: queda la primera ubicación por id
+            regiones[publicacion_id] = geohash(latitud, longitud)
+
+        for p in publicaciones:
+            p.tendencia = _log_suma(terminos[p.id])
+            if p.region != regiones[p.id]:
+                # La región se serializa: nueva versión para la cache
+                p.region = regiones[p.id]
+                p.version = F("version") + 1
+        with transaction.atomic():
+            Publicacion.objects.bulk_update(
+                publicaciones,
+                ["tendencia", "region", "version"],
+                batch_size=TAMANO_LOTE,
+            )
@@ -0,0 +1,219 @@
+import math
+import mimetypes
+import re
+import stat
+import time
+from pathlib import Path
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .imagenes import pendiente
+from .models import ImagenPublicacion, Usuario
+
+# Rutas con dirección por contenido (api.imagenes): el contenido nunca cambia
+PREFIJOS_INMUTABLES = ("originales/", "variantes/")
+# Rutas que pueden pertenecer a publicaciones privadas
+PREFIJOS_PUBLICACIONES = ("publicaciones/",) + PREFIJOS_INMUTABLES
+
+HUELLA_EN_RUTA = re.compile(r"^(?:originales|variantes)/[0-9a-f]{2}/([0-9a-f]{64})")
+RANGO = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+UN_ANIO = 365 * 24 * 3600
+
+
+def _duracion_firma():
+    return getattr(settings, "MEDIA_FIRMA_DURACION", 7 * 24 * 3600)
+
+
+def _firma(ruta, expira):
+    return salted_hmac("api.media", f"{ruta}:{expira}").hexdigest()
+
+
+def url_firmada(ruta, request=None):
+    """
+    URL temporal para un archivo de MEDIA_ROOT. La expiración se redondea al
+    día siguiente para que la URL sea estable (y cacheable) durante el día.
+    """
+    dia = 24 * 3600
+    expira = math.ceil((time.time() + _duracion_firma()) / dia) * dia
+    url = (
+        f"{settings.MEDIA_URL}{quote(ruta)}?"
+        f"{urlencode({'expira': expira, 'firma': _firma(ruta, expira)})}"
+    )
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def _expiracion_firma(request, ruta):
+    """Devuelve el timestamp de expiración si la firma es válida, o None."""
+    try:
+        expira = int(request.GET.get("expira", ""))
+    except ValueError:
+        return None
+    firma = request.GET.get("firma", "")
+    if expira < time.time() or not constant_time_compare(firma, _firma(ruta, expira)):
+        return None
+    return expira
+
+
+def es_privado(ruta):
+    """
+    Un archivo es privado si solo lo usan publicaciones no públicas. Las
+    fotos de perfil y los archivos sin referencias se consideran públicos.
+    """
+    if not ruta.startswith(PREFIJOS_PUBLICACIONES):
+        return False
+    coincidencia = HUELLA_EN_RUTA.match(ruta)
+    if coincidencia:
+        huella = coincidencia.group(1)
+        if Usuario.objects.filter(foto_perfil_huella=huella).exists():
+            return False
+        imagenes = ImagenPublicacion.objects.filter(huella=huella)
+    else:
+        imagenes = ImagenPublicacion.objects.filter(imagen=ruta)
+    privacidades = set(imagenes.values_list("publicacion__privacidad", flat=True))
+    return bool(privacidades) and "PUB" not in privacidades
+
+
+def _rango(request, tamano, etag, modificado):
+    """
+    Interpreta la cabecera Range. Devuelve (inicio, fin) inclusivo, None para
+    responder el archivo completo o False si el rango es insatisfacible.
+    """
+    coincidencia = RANGO.match(request.META.get("HTTP_RANGE", "").strip())
+    if not coincidencia:
+        # Sin Range, con varios rangos o con otra unidad: archivo completo
+        return None
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != modificado:
+        return None
+
+    inicio, fin = coincidencia.groups()
+    if not inicio:
+        if not fin or int(fin) == 0:
+            return False
+        return max(0, tamano - int(fin)), tamano - 1
+    inicio = int(inicio)
+    fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    if inicio >= tamano or inicio > fin:
+        return False
+    return inicio, fin
+
+
+class _Tramo:
+    """
+    Vista de solo lectura de un tramo del archivo. No expone fileno(): el
+    servidor WSGI lo envía leyendo por bloques en lugar de usar sendfile
+    desde la posición actual hasta el final del archivo.
+    """
+
+    def __init__(self, archivo, inicio, longitud):
+        self.archivo = archivo
+        self.restante = longitud
+        archivo.seek(inicio)
+
+    def read(self, tamano=-1):
+        if tamano < 0 or tamano > self.restante:
+            tamano = self.restante
+        datos = self.archivo.read(tamano)
+        self.restante -= len(datos)
+        return datos
+
+    def close(self):
+        self.archivo.close()
+
+
+def _cabeceras(response, etag, modificado, cache_control):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(modificado)
+    response["Cache-Control"] = cache_control
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+# Entrega de archivos de MEDIA_ROOT
+@require_safe
+def servir_media(request, ruta):
+    """
+    Sirve un archivo de MEDIA_ROOT con validadores (ETag/Last-Modified),
+    peticiones Range y cache de larga duración para las rutas por contenido.
+    Con MEDIA_ENVIO = "x-accel-redirect" o "x-sendfile" la transferencia la
+    hace el proxy (nginx, Apache, lighttpd) y el worker solo valida permisos.
+    Los archivos de publicaciones privadas requieren una URL firmada; las
+    subidas pendientes de procesar (con EXIF) no se sirven.
+    """
+    try:
+        absoluta = Path(safe_join(settings.MEDIA_ROOT, ruta))
+        estado = absoluta.stat()
+    except (SuspiciousFileOperation, FileNotFoundError, NotADirectoryError):
+        raise Http404("Archivo no encontrado.")
+    if not stat.S_ISREG(estado.st_mode) or pendiente(ruta):
+        raise Http404("Archivo no encontrado.")
+
+    expira = _expiracion_firma(request, ruta)
+    if expira is None and es_privado(ruta):
+        # 404 y no 403: no revelar que el archivo existe
+        raise Http404("Archivo no encontrado.")
+
+    if expira is not None:
+        cache_control = f"private, max-age={max(0, int(expira - time.time()))}"
+    elif ruta.startswith(PREFIJOS_INMUTABLES):
+        cache_control = f"public, max-age={UN_ANIO}, immutable"
+    else:
+        cache_control = "public, no-cache"
+
+    etag = f'"{estado.st_size:x}-{estado.st_mtime_ns:x}"'
+    modificado = int(estado.st_mtime)
+    condicional = get_conditional_response(request, etag=etag, last_modified=modificado)
+    if condicional is not None:
+        return _cabeceras(condicional, etag, modificado, cache_control)
+
+    content_type, codificacion = mimetypes.guess_type(str(absoluta))
+    content_type = content_type or "application/octet-stream"
+
+    envio = getattr(settings, "MEDIA_ENVIO", "django")
+    if envio == "x-accel-redirect":
+        # nginx: location interna que apunta a MEDIA_ROOT; Range lo resuelve nginx
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = getattr(
+            settings, "MEDIA_X_ACCEL_PREFIJO", "/media-interna/"
+        ) + quote(ruta)
+        return _cabeceras(response, etag, modificado, cache_control)
+    if envio == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = str(absoluta)
+        return _cabeceras(response, etag, modificado, cache_control)
+
+    rango = _rango(request, estado.st_size, etag, modificado)
+    if rango is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{estado.st_size}"
+        return _cabeceras(response, etag, modificado, cache_control)
+
+    if request.method == "HEAD":
+        response = HttpResponse(content_type=content_type)
+        response["Content-Length"] = str(estado.st_size)
+    elif rango is None:
+        # FileResponse con el archivo real: el servidor WSGI puede usar
+        # wsgi.file_wrapper / sendfile sin pasar los bytes por Python
+        response = FileResponse(open(absoluta, "rb"), content_type=content_type)
+    else:
+        inicio, fin = rango
+        longitud = fin - inicio + 1
+        response = FileResponse(
+            _Tramo(open(absoluta, "rb"), inicio, longitud),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Length"] = str(longitud)
+        response["Content-Range"] = f"bytes {inicio}-{fin}/{estado.st_size}"
+    if codificacion:
+        response["Content-Encoding"] = codificacion
+    return _cabeceras(response, etag, modificado, cache_control)
@@ -0,0 +1,283 @@
+import bisect
+import contextvars
+import hmac
+import json
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .presupuesto import presupuesto_consultas
+
+logger = logging.getLogger(__name__)
+
+# Límites de los buckets del histograma de latencia, en milisegundos
+LIMITES_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+CUANTILES = (0.5, 0.95, 0.99)
+
+# Medición de la petición en curso (None fuera de una petición)
+_medicion = contextvars.ContextVar("medicion", default=None)
+
+
+class Medicion:
+    """Tiempos acumulados de una petición, en segundos."""
+
+    __slots__ = ("sql_consultas", "sql", "serializacion", "http_llamadas", "http")
+
+    def __init__(self):
+        self.sql_consultas = 0
+        self.sql = 0.0
+        self.serializacion = 0.0
+        self.http_llamadas = 0
+        self.http = 0.0
+
+
+@contextmanager
+def medir(tipo):
+    """
+    Suma al tipo ("serializacion" o "http") de la petición actual el tiempo
+    del bloque. Fuera de una petición no hace nada.
+    """
+    medicion = _medicion.get()
+    if medicion is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(medicion, tipo, getattr(medicion, tipo) + time.perf_counter() - inicio)
+        if tipo == "http":
+            medicion.http_llamadas += 1
+
+
+class Histograma:
+    def __init__(self):
+        self.cuentas = [0] * (len(LIMITES_MS) + 1)  # el último es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, ms):
+        self.cuentas[bisect.bisect_left(LIMITES_MS, ms)] += 1
+        self.suma += ms
+        self.total += 1
+
+    def cuantil(self, q):
+        """Estimación por interpolación lineal dentro del bucket (como Prometheus)."""
+        if not self.total:
+            return 0.0
+        objetivo = q * self.total
+        acumulado = 0
+        for i, cuenta in enumerate(self.cuentas):
+            if acumulado + cuenta >= objetivo and cuenta:
+                if i == len(LIMITES_MS):
+                    return float(LIMITES_MS[-1])
+                inferior = LIMITES_MS[i - 1] if i else 0
+                fraccion = (objetivo - acumulado) / cuenta
+                return inferior + (LIMITES_MS[i] - inferior) * fraccion
+            acumulado += cuenta
+        return float(LIMITES_MS[-1])
+
+
+class Registro:
+    """Métricas por endpoint (método + nombre de la vista) de este proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = {}
+        self.contadores = {}
+
+    def registrar(self, clave, ms, medicion):
+        with self._lock:
+            histograma = self.latencias.get(clave)
+            if histograma is None:
+                histograma = self.latencias[clave] = Histograma()
+                self.contadores[clave] = [0, 0.0, 0.0, 0, 0.0]
+            histograma.observar(ms)
+            contador = self.contadores[clave]
+            contador[0] += medicion.sql_consultas
+            contador[1] += medicion.sql
+            contador[2] += medicion.serializacion
+            contador[3] += medicion.http_llamadas
+            contador[4] += medicion.http
+
+    def reiniciar(self):
+        with self._lock:
+            self.latencias.clear()
+            self.contadores.clear()
+
+    def exportar(self):
+        """Formato de texto de Prometheus (version 0.0.4)."""
+        with self._lock:
+            latencias = {
+                clave: (
+                    list(h.cuentas),
+                    h.suma,
+                    h.total,
+                    [h.cuantil(q) for q in CUANTILES],
+                )
+                for clave, h in self.latencias.items()
+            }
+            contadores = {clave: list(c) for clave, c in self.contadores.items()}
+
+        lineas = [
+            "# HELP geoplanner_peticion_duracion_segundos Latencia por endpoint.",
+            "# TYPE geoplanner_peticion_duracion_segundos histogram",
+        ]
+        for clave, (cuentas, suma, total, _) in sorted(latencias.items()):
+            etiquetas = _etiquetas(clave)
+            acumulado = 0
+            for limite, cuenta in zip(LIMITES_MS + ("+Inf",), cuentas):
+                acumulado += cuenta
+                le = limite if limite == "+Inf" else _num(limite / 1000)
+                lineas.append(
+                    f'geoplanner_peticion_duracion_segundos_bucket{{{etiquetas},le="{le}"}} {acumulado}'
+                )
+            lineas.append(
+                f"geoplanner_peticion_duracion_segundos_sum{{{etiquetas}}} {_num(suma / 1000)}"
+            )
+            lineas.append(
+                f"geoplanner_peticion_duracion_segundos_count{{{etiquetas}}} {total}"
+            )
+
+        lineas += [
+            "# HELP geoplanner_peticion_cuantil_segundos p50/p95/p99 estimados del histograma.",
+            "# TYPE geoplanner_peticion_cuantil_segundos gauge",
+        ]
+        for clave, (_, _, _, valores) in sorted(latencias.items()):
+            for q, valor in zip(CUANTILES, valores):
+                lineas.append(
+                    f'geoplanner_peticion_cuantil_segundos{{{_etiquetas(clave)},cuantil="{q}"}} '
+                    f"{_num(valor / 1000)}"
+                )
+
+        for indice, nombre, descripcion in (
+            (0, "geoplanner_sql_consultas_total", "Consultas SQL ejecutadas."),
+            (1, "geoplanner_sql_segundos_total", "Tiempo en consultas SQL."),
+            (2, "geoplanner_serializacion_segundos_total", "Tiempo serializando."),
+            (3, "geoplanner_http_saliente_llamadas_total", "Llamadas HTTP salientes."),
+            (4, "geoplanner_http_saliente_segundos_total", "Tiempo en HTTP saliente."),
+        ):
+            lineas += [f"# HELP {nombre} {descripcion}", f"# TYPE {nombre} counter"]
+            for clave, valores in sorted(contadores.items()):
+                lineas.append(
+                    f"{nombre}{{{_etiquetas(clave)}}} {_num(valores[indice])}"
+                )
+        return "\n".join(lineas) + "\n"
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(clave):
+    metodo, vista = clave
+    return f'metodo="{_escapar(metodo)}",vista="{_escapar(vista)}"'
+
+
+def _num(valor):
+    return repr(round(float(valor), 6))
+
+
+registro = Registro()
+
+
+def _server_timing(medicion, total):
+    partes = [
+        f'db;dur={medicion.sql * 1000:.1f};desc="{medicion.sql_consultas} consultas"',
+        f"ser;dur={medicion.serializacion * 1000:.1f}",
+    ]
+    if medicion.http_llamadas:
+        partes.append(
+            f'http;dur={medicion.http * 1000:.1f};desc="{medicion.http_llamadas} llamadas"'
+        )
+    partes.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(partes)
+
+
+# Middleware de instrumentación: debe ir primero en MIDDLEWARE
+class InstrumentacionMiddleware:
+    """
+    Mide cada petición: número y duración de las consultas SQL (con
+    execute_wrapper), tiempo de serialización y de llamadas HTTP salientes
+    (bloques medir()), y la duración total. Añade la cabecera Server-Timing,
+    escribe una línea JSON (nivel DEBUG) en el logger api.metricas y alimenta los
+    histogramas por endpoint de /metricas/.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, "METRICAS_SERVER_TIMING", True)
+
+    def __call__(self, request):
+        medicion = Medicion()
+        token = _medicion.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as pila:
+                for alias in connections:
+                    pila.enter_context(
+                        connections[alias].execute_wrapper(self._medir_sql)
+                    )
+                response = self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        total = time.perf_counter() - inicio
+
+        match = getattr(request, "resolver_match", None)
+        # Nombre de la vista (no la ruta) para acotar la cardinalidad
+        vista = (match.view_name or match.route) if match else "sin_ruta"
+        registro.registrar((request.method, vista), total * 1000, medicion)
+        if self.server_timing:
+            response["Server-Timing"] = _server_timing(medicion, total)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                json.dumps(
+                    {
+                        "metodo": request.method,
+                        "vista": vista,
+                        "estado": response.status_code,
+                        "duracion_ms": round(total * 1000, 2),
+                        "sql_consultas": medicion.sql_consultas,
+                        "sql_ms": round(medicion.sql * 1000, 2),
+                        "serializacion_ms": round(medicion.serializacion * 1000, 2),
+                        "http_llamadas": medicion.http_llamadas,
+                        "http_ms": round(medicion.http * 1000, 2),
+                    }
+                )
+            )
+        return response
+
+    @staticmethod
+    def _medir_sql(execute, sql, params, many, context):
+        medicion = _medicion.get()
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if medicion is not None:
+                medicion.sql += time.perf_counter() - inicio
+                medicion.sql_consultas += 1
+
+
+def _autorizado(request):
+    # Personal del admin de Django o el token de Prometheus (Authorization: Bearer)
+    if getattr(request, "user", None) is not None and request.user.is_staff:
+        return True
+    token = getattr(settings, "METRICAS_TOKEN", "")
+    cabecera = request.headers.get("Authorization", "")
+    return bool(token) and hmac.compare_digest(cabecera, f"Bearer {token}")
+
+
+@presupuesto_consultas(0)
+def metricas_view(request):
+    """GET /metricas/: métricas de este proceso en formato Prometheus."""
+    if not _autorizado(request):
+        return HttpResponseForbidden("No autorizado.")
+    return HttpResponse(
+        registro.exportar(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
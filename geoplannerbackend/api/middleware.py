@@ -0,0 +1,187 @@
+import gzip
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard es opcional
+    zstandard = None
+
+
+re_accept_encoding = _lazy_re_compile(r"\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?")
+
+# Tipos de contenido que vale la pena comprimir
+TIPOS_COMPRIMIBLES = (
+    "application/json",
+    "application/geo+json",
+    "text/",
+    "application/javascript",
+    "image/svg+xml",
+)
+
+
+def _compresor_gzip(nivel):
+    # wbits=16+MAX_WBITS genera cabecera y cola gzip
+    compresor = zlib.compressobj(nivel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return (
+        compresor.compress,
+        lambda: compresor.flush(zlib.Z_SYNC_FLUSH),
+        compresor.flush,
+    )
+
+
+def _compresor_brotli(nivel):
+    compresor = brotli.Compressor(quality=nivel)
+    return compresor.process, compresor.flush, compresor.finish
+
+
+def _compresor_zstd(nivel):
+    compresor = zstandard.ZstdCompressor(level=nivel).compressobj()
+    return (
+        compresor.compress,
+        lambda: compresor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+        compresor.flush,
+    )
+
+
+# Codificaciones disponibles en orden de preferencia del servidor
+def codificaciones_disponibles():
+    disponibles = []
+    if zstandard is not None:
+        disponibles.append("zstd")
+    if brotli is not None:
+        disponibles.append("br")
+    disponibles.append("gzip")
+    return disponibles
+
+
+def elegir_codificacion(accept_encoding, disponibles=None):
+    """
+    Negocia la codificación según Accept-Encoding (respetando los valores q).
+    Devuelve None si el cliente no acepta ninguna de las disponibles.
+    """
+    disponibles = disponibles or codificaciones_disponibles()
+    pesos = {}
+    for token, q in re_accept_encoding.findall(accept_encoding or ""):
+        try:
+            pesos[token.lower()] = float(q) if q else 1.0
+        except ValueError:
+            continue
+
+    comodin = pesos.get("*", 0.0)
+    mejor, mejor_peso = None, 0.0
+    for codificacion in disponibles:
+        peso = pesos.get(codificacion, comodin)
+        if peso > mejor_peso:
+            mejor, mejor_peso = codificacion, peso
+    return mejor
+
+
+# Middleware de compresión negociada (zstd, brotli, gzip)
+class CompresionMiddleware:
+    """
+    Comprime las respuestas según el Accept-Encoding del cliente. Las respuestas
+    normales solo se comprimen si superan COMPRESION_TAMANO_MINIMO bytes; las
+    respuestas en streaming se comprimen fragmento a fragmento.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.tamano_minimo = getattr(settings, "COMPRESION_TAMANO_MINIMO", 1024)
+        self.niveles = {
+            "gzip": 6,
+            "br": 4,
+            "zstd": 3,
+            **getattr(settings, "COMPRESION_NIVELES", {}),
+        }
+        self.compresores = {
+            "gzip": _compresor_gzip,
+            "br": _compresor_brotli,
+            "zstd": _compresor_zstd,
+        }
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.procesar(request, response)
+
+    def procesar(self, request, response):
+        if response.has_header("Content-Encoding") or response.status_code < 200:
+            return response
+        if response.status_code in (204, 206, 304) or request.method == "HEAD":
+            return response
+        # Archivos (sendfile o delegados al proxy, ver api.media) se envían tal cual
+        if getattr(response, "file_to_stream", None) is not None:
+            return response
+        if response.has_header("X-Accel-Redirect") or response.has_header("X-Sendfile"):
+            return response
+
+        tipo = response.get("Content-Type", "").split(";")[0].strip().lower()
+        if not tipo.startswith(TIPOS_COMPRIMIBLES):
+            return response
+
+        # Aunque no se comprima, la respuesta depende de Accept-Encoding
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        if not response.streaming and len(response.content) < self.tamano_minimo:
+            return response
+
+        codificacion = elegir_codificacion(request.META.get("HTTP_ACCEPT_ENCODING"))
+        if codificacion is None:
+            return response
+
+        nivel = self.niveles[codificacion]
+        if response.streaming:
+            comprimir_stream = (
+                self._comprimir_stream_async
+                if response.is_async
+                else self._comprimir_stream
+            )
+            response.streaming_content = comprimir_stream(
+                response.streaming_content, codificacion, nivel
+            )
+            del response["Content-Length"]
+        else:
+            comprimido = self._comprimir(response.content, codificacion, nivel)
+            if len(comprimido) >= len(response.content):
+                return response
+            response.content = comprimido
+            response.headers["Content-Length"] = str(len(comprimido))
+
+        # Un ETag fuerte ya no es válido para el cuerpo comprimido
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+
+        response.headers["Content-Encoding"] = codificacion
+        return response
+
+    def _comprimir(self, contenido, codificacion, nivel):
+        if codificacion == "gzip":
+            return gzip.compress(contenido, compresslevel=nivel, mtime=0)
+        comprimir, _, terminar = self.compresores[codificacion](nivel)
+        return comprimir(contenido) + terminar()
+
+    # Cada fragmento se vacía al cliente para no retener datos del stream
+    def _comprimir_stream(self, fragmentos, codificacion, nivel):
+        comprimir, vaciar, terminar = self.compresores[codificacion](nivel)
+        for fragmento in fragmentos:
+            datos = comprimir(fragmento) + vaciar()
+            if datos:
+                yield datos
+        yield terminar()
+
+    async def _comprimir_stream_async(self, fragmentos, codificacion, nivel):
+        comprimir, vaciar, terminar = self.compresores[codificacion](nivel)
+        async for fragmento in fragmentos:
+            datos = comprimir(fragmento) + vaciar()
+            if datos:
+                yield datos
+        yield terminar()
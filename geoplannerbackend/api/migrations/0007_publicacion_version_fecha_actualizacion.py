@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_usuario_rol"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="publicacion",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="publicacion",
+            name="fecha_actualizacion",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:30
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_publicacion_version_fecha_actualizacion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="actividadeagenda",
+            name="fecha_actualizacion",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="conversacion",
+            name="fecha_actualizacion",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="inscripciones",
+            name="fecha_creacion",
+            field=models.DateTimeField(
+                auto_now_add=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="inscripciones",
+            name="fecha_actualizacion",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name="RegistroEliminacion",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("recurso", models.CharField(max_length=50)),
+                ("objeto_id", models.UUIDField()),
+                ("usuario_id", models.UUIDField(blank=True, null=True)),
+                (
+                    "fecha_eliminacion",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["recurso", "fecha_eliminacion"],
+                        name="registro_elim_recurso_fecha",
+                    )
+                ],
+            },
+        ),
+    ]
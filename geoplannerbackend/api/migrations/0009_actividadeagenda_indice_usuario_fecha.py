@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_sincronizacion"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="actividadeagenda",
+            index=models.Index(
+                fields=["id_usuario", "fecha_activiad"], name="agenda_usuario_fecha"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_actividadeagenda_indice_usuario_fecha"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="publicacion",
+            name="id_externo",
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_publicacion_id_externo"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="imagenpublicacion",
+            name="huella",
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="usuario",
+            name="foto_perfil_huella",
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:10
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_huellas_imagenes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SubidaImagen",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("nombre_archivo", models.CharField(max_length=255)),
+                ("tamano_total", models.PositiveBigIntegerField()),
+                ("recibido", models.PositiveBigIntegerField(default=0)),
+                ("sha256", models.CharField(blank=True, max_length=64)),
+                ("fecha_creacion", models.DateTimeField(auto_now_add=True)),
+                (
+                    "fecha_actualizacion",
+                    models.DateTimeField(auto_now=True, db_index=True),
+                ),
+                (
+                    "publicacion",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="subidas",
+                        to="api.publicacion",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,132 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:18
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_subida_imagen"),
+        ("contenttypes", "0002_remove_content_type_name"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EntradaTimeline",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("puntaje", models.FloatField()),
+                ("popularidad", models.FloatField(default=0)),
+                (
+                    "motivo",
+                    models.CharField(
+                        choices=[
+                            ("PRO", "Propia"),
+                            ("SEG", "Seguido"),
+                            ("CER", "Cercanía"),
+                            ("CAT", "Categoría"),
+                        ],
+                        max_length=3,
+                    ),
+                ),
+                ("fecha_creacion", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Seguimiento",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("fecha_creacion", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="usuario",
+            name="num_seguidores",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="ubicacionevento",
+            index=models.Index(
+                fields=["latitud", "longitud"], name="ubicacion_lat_lon"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="usuario",
+            index=models.Index(fields=["latitud", "longitud"], name="usuario_lat_lon"),
+        ),
+        migrations.AddField(
+            model_name="entradatimeline",
+            name="publicacion",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="entradas_timeline",
+                to="api.publicacion",
+            ),
+        ),
+        migrations.AddField(
+            model_name="entradatimeline",
+            name="usuario",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="timeline",
+                to="api.usuario",
+            ),
+        ),
+        migrations.AddField(
+            model_name="seguimiento",
+            name="seguido",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="seguidores",
+                to="api.usuario",
+            ),
+        ),
+        migrations.AddField(
+            model_name="seguimiento",
+            name="seguidor",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="siguiendo",
+                to="api.usuario",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="entradatimeline",
+            index=models.Index(
+                fields=["usuario", "-puntaje"], name="timeline_usuario_puntaje"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="entradatimeline",
+            unique_together={("usuario", "publicacion")},
+        ),
+        migrations.AddIndex(
+            model_name="seguimiento",
+            index=models.Index(
+                fields=["seguido", "seguidor"], name="seguimiento_seguido"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="seguimiento",
+            unique_together={("seguidor", "seguido")},
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:22
+
+import api.tendencias
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0013_timeline"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="publicacion",
+            name="region",
+            field=models.CharField(blank=True, default="", max_length=12),
+        ),
+        migrations.AddField(
+            model_name="publicacion",
+            name="tendencia",
+            field=models.FloatField(default=api.tendencias.tendencia_inicial),
+        ),
+        migrations.AddIndex(
+            model_name="publicacion",
+            index=models.Index(
+                condition=models.Q(("estado", "VIG"), ("privacidad", "PUB")),
+                fields=["-tendencia"],
+                name="tendencia_pub_vig",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="publicacion",
+            index=models.Index(
+                condition=models.Q(("estado", "VIG"), ("privacidad", "PUB")),
+                fields=["region", "-tendencia"],
+                name="tendencia_region_pub_vig",
+            ),
+        ),
+    ]
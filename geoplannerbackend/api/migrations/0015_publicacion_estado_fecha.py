@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_tendencias"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="publicacion",
+            index=models.Index(
+                fields=["estado", "fecha_evento"], name="publicacion_estado_fecha"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_publicacion_estado_fecha"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="publicacion",
+            name="eliminado_en",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="usuario",
+            name="eliminado_en",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
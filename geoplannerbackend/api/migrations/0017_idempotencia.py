@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:51
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0016_borrado_logico"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RespuestaIdempotente",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("cliente", models.CharField(max_length=64)),
+                ("clave", models.CharField(max_length=255)),
+                ("huella", models.CharField(max_length=64)),
+                ("codigo", models.PositiveSmallIntegerField(blank=True, null=True)),
+                ("tipo_contenido", models.CharField(blank=True, max_length=100)),
+                ("contenido", models.BinaryField(blank=True)),
+                ("fecha_creacion", models.DateTimeField(auto_now_add=True)),
+                ("expira", models.DateTimeField(db_index=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("cliente", "clave"), name="idempotencia_cliente_clave"
+                    )
+                ],
+            },
+        ),
+    ]
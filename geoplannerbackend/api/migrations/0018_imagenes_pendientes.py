@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0017_idempotencia"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="imagenpublicacion",
+            name="imagen",
+            field=models.ImageField(upload_to="pendientes/publicaciones/"),
+        ),
+        migrations.AlterField(
+            model_name="usuario",
+            name="foto_perfil",
+            field=models.ImageField(
+                blank=True, null=True, upload_to="pendientes/fotos_perfil/"
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0018_imagenes_pendientes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="entradatimeline",
+            name="timeline_usuario_puntaje",
+        ),
+        migrations.AddIndex(
+            model_name="entradatimeline",
+            index=models.Index(
+                fields=["usuario", "-puntaje", "-publicacion"],
+                name="timeline_usuario_puntaje",
+            ),
+        ),
+    ]
@@ -1,12 +1,20 @@
 from django.db import models
+from django.utils import timezone
 import uuid
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
-
+from .tendencias import tendencia_inicial
 
 # Create your models here.
 
 
+# Borrado lógico: `objects` oculta las filas marcadas como eliminadas mientras
+# api.purga borra sus dependencias en segundo plano; `todos` las incluye
+class NoEliminadosManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(eliminado_en__isnull=True)
+
+
 # Tabla Usuario
 class Usuario(models.Model):
     GENERO_OPCIONES = [
@@ -29,7 +37,12 @@ class Usuario(models.Model):
     apellido = models.CharField(max_length=100)
     fecha_nacimiento = models.DateField()
     genero = models.CharField(max_length=1, choices=GENERO_OPCIONES, default="N")
-    foto_perfil = models.ImageField(upload_to="fotos_perfil/", null=True, blank=True)
+    # Se sube a pendientes/ (no se sirve) hasta que api.imagenes la limpia
+    foto_perfil = models.ImageField(
+        upload_to="pendientes/fotos_perfil/", null=True, blank=True
+    )
+    # SHA-256 del contenido de la foto (variantes por contenido, ver api.imagenes)
+    foto_perfil_huella = models.CharField(max_length=64, blank=True, db_index=True)
     fecha_registro = models.DateTimeField(auto_now_add=True)
     biografia = models.TextField(blank=True)
     latitud = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
@@ -42,6 +55,18 @@ class Usuario(models.Model):
     verificado = models.BooleanField(default=False)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     rol = models.CharField(max_length=10, choices=ROL_OPCIONES, default="USUARIO")
+    # Contador desnormalizado: decide si el fan-out del timeline se hace al leer
+    num_seguidores = models.PositiveIntegerField(default=0)
+    eliminado_en = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = NoEliminadosManager()
+    todos = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Usuarios cercanos a un evento (fan-out del timeline)
+            models.Index(fields=["latitud", "longitud"], name="usuario_lat_lon"),
+        ]
 
     def __str__(self):
         return self.nombre
@@ -56,6 +81,16 @@ class ActividadeAgenda(models.Model):
     descripcion = models.TextField()
     fecha_activiad = models.DateField()
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Consultas por rango de fechas de la agenda de un usuario
+            models.Index(
+                fields=["id_usuario", "fecha_activiad"],
+                name="agenda_usuario_fecha",
+            ),
+        ]
 
 
 # Tabla para crear eventos y publicaciones
@@ -100,10 +135,62 @@ class Publicacion(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     me_gusta = models.IntegerField(default=0)
     comentarios = models.IntegerField(default=0)
+    # Validadores para peticiones condicionales (ETag / Last-Modified)
+    version = models.PositiveIntegerField(default=1)
+    fecha_actualizacion = models.DateTimeField(auto_now=True, db_index=True)
+    # Identificador en el sistema de origen (importaciones masivas)
+    id_externo = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    # Puntaje de tendencia con decaimiento en espacio logarítmico (ver
+    # api.tendencias) y celda geohash de su ubicación para acotarlo por zona
+    tendencia = models.FloatField(default=tendencia_inicial)
+    region = models.CharField(max_length=12, blank=True, default="")
+    eliminado_en = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = NoEliminadosManager()
+    todos = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Eventos vencidos por finalizar (api.eventos.finalizar_eventos)
+            models.Index(
+                fields=["estado", "fecha_evento"], name="publicacion_estado_fecha"
+            ),
+            # Índices parciales: el top-N de tendencias es un recorrido del índice
+            models.Index(
+                fields=["-tendencia"],
+                condition=models.Q(privacidad="PUB", estado="VIG"),
+                name="tendencia_pub_vig",
+            ),
+            models.Index(
+                fields=["region", "-tendencia"],
+                condition=models.Q(privacidad="PUB", estado="VIG"),
+                name="tendencia_region_pub_vig",
+            ),
+        ]
 
     def __str__(self):
         return f"Publicación de {self.id_usuario.nombre_usuario}: {self.titulo}"
 
+    def save(self, *args, **kwargs):
+        # Cada edición incrementa la versión de forma atómica
+        if not self._state.adding:
+            self.version = models.F("version") + 1
+        super().save(*args, **kwargs)
+        if not isinstance(self.version, int):
+            self.refresh_from_db(fields=["version"])
+
+    @classmethod
+    def marcar_modificada(cls, publicacion_id, **cambios):
+        """
+        Incrementa la versión de la publicación junto con otros cambios
+        (por ejemplo contadores con F()) en un único UPDATE.
+        """
+        return cls.objects.filter(id=publicacion_id).update(
+            version=models.F("version") + 1,
+            fecha_actualizacion=timezone.now(),
+            **cambios,
+        )
+
 
 # Tabla donde se almacenan las imagenes de las publicaciones
 class ImagenPublicacion(models.Model):
@@ -111,7 +198,25 @@ class ImagenPublicacion(models.Model):
     publicacion = models.ForeignKey(
         Publicacion, on_delete=models.CASCADE, related_name="imagenes"
     )
-    imagen = models.ImageField(upload_to="publicaciones/")
+    # Se sube a pendientes/ (no se sirve) hasta que api.imagenes la limpia
+    imagen = models.ImageField(upload_to="pendientes/publicaciones/")
+    huella = models.CharField(max_length=64, blank=True, db_index=True)
+
+
+# Subida reanudable de una imagen por fragmentos (ver api.subidas)
+class SubidaImagen(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    publicacion = models.ForeignKey(
+        Publicacion, on_delete=models.CASCADE, related_name="subidas"
+    )
+    nombre_archivo = models.CharField(max_length=255)
+    tamano_total = models.PositiveBigIntegerField()
+    # Bytes confirmados: el siguiente fragmento debe empezar en este offset
+    recibido = models.PositiveBigIntegerField(default=0)
+    # SHA-256 del archivo completo, opcional, verificado al finalizar
+    sha256 = models.CharField(max_length=64, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True, db_index=True)
 
 
 # Tabla de ubicaciones para eventos y publicaciones
@@ -123,6 +228,12 @@ class UbicacionEvento(models.Model):
     latitud = models.DecimalField(max_digits=9, decimal_places=6)
     longitud = models.DecimalField(max_digits=9, decimal_places=6)
 
+    class Meta:
+        indexes = [
+            # Búsquedas por rectángulo de coordenadas
+            models.Index(fields=["latitud", "longitud"], name="ubicacion_lat_lon"),
+        ]
+
 
 # Tabla para inscripciones a eventos
 class Inscripciones(models.Model):
@@ -138,6 +249,8 @@ class Inscripciones(models.Model):
     estado_asistencia = models.CharField(
         choices=ESTADO_ASISTENCIA, max_length=10, default="INS"
     )
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True, db_index=True)
 
 
 # Tabla para likes en publicaciones
@@ -183,9 +296,103 @@ class Conversacion(models.Model):
     )
     mensaje = models.TextField()
     fecha = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ["fecha"]
 
     def _str_(self):
         return f"{self.remitente.capitalize()} - {self.fecha.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+# Relación de seguimiento entre usuarios
+class Seguimiento(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    seguidor = models.ForeignKey(
+        Usuario, on_delete=models.CASCADE, related_name="siguiendo"
+    )
+    seguido = models.ForeignKey(
+        Usuario, on_delete=models.CASCADE, related_name="seguidores"
+    )
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("seguidor", "seguido")
+        indexes = [
+            # Seguidores de un usuario (fan-out al publicar)
+            models.Index(fields=["seguido", "seguidor"], name="seguimiento_seguido"),
+        ]
+
+
+# Feed precalculado de cada usuario (fan-out en escritura, ver api.timeline)
+class EntradaTimeline(models.Model):
+    MOTIVO_OPCIONES = [
+        ("PRO", "Propia"),
+        ("SEG", "Seguido"),
+        ("CER", "Cercanía"),
+        ("CAT", "Categoría"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(
+        Usuario, on_delete=models.CASCADE, related_name="timeline", db_index=False
+    )
+    publicacion = models.ForeignKey(
+        Publicacion, on_delete=models.CASCADE, related_name="entradas_timeline"
+    )
+    # Orden del feed: frescura (horas) + afinidad + popularidad
+    puntaje = models.FloatField()
+    popularidad = models.FloatField(default=0)
+    motivo = models.CharField(choices=MOTIVO_OPCIONES, max_length=3)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("usuario", "publicacion")
+        indexes = [
+            # Lectura del feed: un único recorrido por rango del índice
+            models.Index(
+                fields=["usuario", "-puntaje", "-publicacion"],
+                name="timeline_usuario_puntaje",
+            ),
+        ]
+
+
+# Registro de objetos eliminados, para la sincronización incremental
+class RegistroEliminacion(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    recurso = models.CharField(max_length=50)
+    objeto_id = models.UUIDField()
+    # Dueño del objeto eliminado (None si el recurso es visible para todos)
+    usuario_id = models.UUIDField(null=True, blank=True)
+    fecha_eliminacion = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["recurso", "fecha_eliminacion"],
+                name="registro_elim_recurso_fecha",
+            ),
+        ]
+
+
+# Respuestas a POST con cabecera Idempotency-Key (ver api.idempotencia)
+class RespuestaIdempotente(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # "usuario:<uuid>" o "ip:<dirección>": quién envió la clave
+    cliente = models.CharField(max_length=64)
+    clave = models.CharField(max_length=255)
+    # sha256 de método, ruta y cuerpo: la misma clave con otra petición es un error
+    huella = models.CharField(max_length=64)
+    # None mientras la primera petición está en curso
+    codigo = models.PositiveSmallIntegerField(null=True, blank=True)
+    tipo_contenido = models.CharField(max_length=100, blank=True)
+    contenido = models.BinaryField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    expira = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cliente", "clave"], name="idempotencia_cliente_clave"
+            ),
+        ]
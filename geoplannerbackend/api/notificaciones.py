@@ -0,0 +1,216 @@
+import asyncio
+import json
+import threading
+import uuid
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+ESTADOS_INSCRITOS = ("INS", "ASI")
+
+
+# Los ids llegan como UUID o como texto del request: el nombre del canal
+# siempre usa la forma canónica para que publicador y suscriptor coincidan
+def canal_publicacion(publicacion_id):
+    return f"publicacion:{uuid.UUID(str(publicacion_id))}"
+
+
+def canal_usuario(usuario_id):
+    return f"usuario:{uuid.UUID(str(usuario_id))}"
+
+
+class Suscripcion:
+    """
+    Cola de eventos de una conexión WebSocket. Vive en el event loop de la
+    conexión; los backends le entregan eventos con call_soon_threadsafe.
+
+    - Los eventos con "clave" (contadores) se agrupan durante una ventana:
+      una ráfaga de likes se envía como un único evento con el último valor.
+    - La cola está acotada: si el cliente no consume a tiempo se descartan
+      los eventos más antiguos y se le avisa para que se resincronice.
+    """
+
+    def __init__(self, loop, max_pendientes=None, ventana_ms=None):
+        self.loop = loop
+        self.max_pendientes = max_pendientes or getattr(
+            settings, "NOTIFICACIONES_MAX_PENDIENTES", 100
+        )
+        ventana = (
+            ventana_ms
+            if ventana_ms is not None
+            else getattr(settings, "NOTIFICACIONES_VENTANA_MS", 250)
+        )
+        self.ventana = ventana / 1000
+        self.cola = deque()
+        self.coalescidos = {}
+        self.perdidos = 0
+        self._hay_eventos = asyncio.Event()
+        self._temporizadores = {}
+
+    def entregar(self, evento):
+        # Siempre se ejecuta dentro del event loop de la conexión
+        clave = evento.get("clave")
+        if clave is None:
+            self._encolar(evento)
+            return
+        if clave not in self.coalescidos and self.ventana > 0:
+            self._temporizadores[clave] = self.loop.call_later(
+                self.ventana, self._liberar, clave
+            )
+        self.coalescidos[clave] = evento
+        if self.ventana <= 0:
+            self._liberar(clave)
+
+    def _liberar(self, clave):
+        self._temporizadores.pop(clave, None)
+        evento = self.coalescidos.pop(clave, None)
+        if evento is not None:
+            self._encolar(evento)
+
+    def _encolar(self, evento):
+        if len(self.cola) >= self.max_pendientes:
+            self.cola.popleft()
+            self.perdidos += 1
+        self.cola.append(evento)
+        self._hay_eventos.set()
+
+    async def siguiente(self):
+        while not self.cola:
+            self._hay_eventos.clear()
+            await self._hay_eventos.wait()
+        return self.cola.popleft()
+
+    def cerrar(self):
+        for temporizador in self._temporizadores.values():
+            temporizador.cancel()
+        self._temporizadores.clear()
+
+
+# Backend en memoria: solo entrega a conexiones del mismo proceso
+class BackendMemoria:
+    """
+    Pub/sub dentro del proceso. Sirve para un único servidor ASGI; con
+    varios procesos se necesita un backend compartido con la misma interfaz
+    (configurable en NOTIFICACIONES_BACKEND).
+    """
+
+    def __init__(self):
+        self._suscripciones = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def suscribir(self, canal, suscripcion):
+        with self._lock:
+            self._suscripciones[canal].add(suscripcion)
+
+    def desuscribir(self, canal, suscripcion):
+        with self._lock:
+            suscripciones = self._suscripciones.get(canal)
+            if suscripciones:
+                suscripciones.discard(suscripcion)
+                if not suscripciones:
+                    del self._suscripciones[canal]
+
+    def tiene_suscriptores(self, canal=None):
+        with self._lock:
+            if canal is None:
+                return bool(self._suscripciones)
+            return canal in self._suscripciones
+
+    def publicar(self, canal, evento):
+        with self._lock:
+            suscripciones = list(self._suscripciones.get(canal, ()))
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion.entregar, evento)
+            except RuntimeError:
+                # Event loop cerrado: la conexión ya terminó
+                self.desuscribir(canal, suscripcion)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def obtener_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            ruta = getattr(
+                settings,
+                "NOTIFICACIONES_BACKEND",
+                "api.notificaciones.BackendMemoria",
+            )
+            _backend = import_string(ruta)()
+        return _backend
+
+
+def serializar_evento(evento):
+    return json.dumps(
+        {k: v for k, v in evento.items() if k != "clave"}, cls=DjangoJSONEncoder
+    )
+
+
+def notificar_actividad(publicacion_id, tipo=None, datos=None, en_publicacion=False):
+    """
+    Tras confirmar la transacción:
+    - publica en publicacion:<id> los contadores actualizados (coalescibles),
+    - si hay `datos`, avisa al dueño de la publicación con un evento `tipo`
+      (y también a los suscriptores de la publicación si `en_publicacion`).
+    No consulta la base de datos si no hay nadie suscrito.
+    """
+    transaction.on_commit(
+        lambda: _notificar_actividad(publicacion_id, tipo, datos, en_publicacion)
+    )
+
+
+def _notificar_actividad(publicacion_id, tipo, datos, en_publicacion):
+    from .models import Inscripciones, Publicacion
+
+    backend = obtener_backend()
+    if not backend.tiene_suscriptores():
+        return
+    canal = canal_publicacion(publicacion_id)
+    fila = (
+        Publicacion.objects.filter(id=publicacion_id)
+        .values("id_usuario_id", "me_gusta", "comentarios")
+        .first()
+    )
+    if fila is None:
+        return
+    ahora = timezone.now()
+
+    if backend.tiene_suscriptores(canal):
+        inscritos = Inscripciones.objects.filter(
+            id_publicacion=publicacion_id, estado_asistencia__in=ESTADOS_INSCRITOS
+        ).count()
+        backend.publicar(
+            canal,
+            {
+                "tipo": "contadores",
+                "canal": canal,
+                "datos": {
+                    "publicacion": publicacion_id,
+                    "me_gusta": fila["me_gusta"],
+                    "comentarios": fila["comentarios"],
+                    "inscritos": inscritos,
+                },
+                "fecha": ahora,
+                "clave": f"contadores:{canal}",
+            },
+        )
+        if datos is not None and en_publicacion:
+            backend.publicar(
+                canal, {"tipo": tipo, "canal": canal, "datos": datos, "fecha": ahora}
+            )
+
+    dueno = fila["id_usuario_id"]
+    if datos is not None and str(datos.get("id_usuario")) != str(dueno):
+        canal_dueno = canal_usuario(dueno)
+        backend.publicar(
+            canal_dueno,
+            {"tipo": tipo, "canal": canal_dueno, "datos": datos, "fecha": ahora},
+        )
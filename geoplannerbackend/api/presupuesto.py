@@ -0,0 +1,192 @@
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Presupuesto de consultas SQL por endpoint:
+# - Cada vista declara su máximo con @presupuesto_consultas(n) (funciones y
+#   acciones) o con el atributo `presupuesto_consultas = {"list": n, ...}`
+#   del ViewSet/APIView, por nombre de acción o de método HTTP.
+# - VerificarConsultas registra el SQL de un bloque y falla si se pasa del
+#   máximo o si la misma forma de consulta (mismo SQL con otros valores) se
+#   repite más de CONSULTAS_REPETICIONES_MAX veces: la firma de un N+1.
+# - Los tests lo usan directamente; en desarrollo, PresupuestoConsultasMiddleware
+#   lo aplica a cada petición y registra o falla según CONSULTAS_PRESUPUESTO_MODO.
+# - En las respuestas en streaming cuentan también las consultas que se
+#   hacen al generar el cuerpo.
+# - Las consultas de middlewares (p. ej. api.idempotencia) se hacen dentro de
+#   fuera_de_presupuesto() y no cuentan para el de la vista.
+
+_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+
+_fuera = ContextVar("fuera_de_presupuesto", default=False)
+
+
+class PresupuestoExcedido(AssertionError):
+    pass
+
+
+@contextmanager
+def fuera_de_presupuesto():
+    """Las consultas del bloque no las registra VerificarConsultas."""
+    token = _fuera.set(True)
+    try:
+        yield
+    finally:
+        _fuera.reset(token)
+
+
+def repeticiones_maximas():
+    return getattr(settings, "CONSULTAS_REPETICIONES_MAX", 3)
+
+
+def forma_sql(sql):
+    """SQL sin valores: dos consultas con la misma forma solo difieren en parámetros."""
+    forma = _LITERALES.sub("?", sql.replace("%s", "?"))
+    forma = _LISTAS.sub("(...)", forma)
+    return " ".join(forma.split())
+
+
+def presupuesto_consultas(maximo):
+    """Declara el máximo de consultas de una vista de función o de una acción."""
+
+    def decorar(vista):
+        vista.presupuesto_consultas = maximo
+        return vista
+
+    return decorar
+
+
+def presupuesto_de(vista, metodo):
+    """Máximo declarado para `vista` (la de la URL resuelta) con `metodo`, o None."""
+    maximo = getattr(vista, "presupuesto_consultas", None)
+    if maximo is not None:
+        return maximo
+    clase = getattr(vista, "cls", None)
+    if clase is None:
+        return None
+    # ViewSets: el router guarda {método HTTP: acción} en la vista
+    accion = (getattr(vista, "actions", None) or {}).get(metodo.lower(), metodo.lower())
+    maximo = getattr(getattr(clase, accion, None), "presupuesto_consultas", None)
+    if maximo is not None:
+        return maximo
+    presupuestos = getattr(clase, "presupuesto_consultas", None)
+    if isinstance(presupuestos, dict):
+        return presupuestos.get(accion)
+    return None
+
+
+class VerificarConsultas:
+    """
+    Context manager que registra las consultas de todas las conexiones:
+
+        with VerificarConsultas(maximo=4) as consultas:
+            client.get("/publicaciones/")
+        consultas.total
+
+    Al salir lanza PresupuestoExcedido si se pasó de `maximo` (None = sin
+    límite) o si alguna forma se repitió más de `repeticiones` veces. Con
+    fallar=False solo registra; los problemas quedan en .problemas().
+    """
+
+    def __init__(self, maximo=None, repeticiones=None, fallar=True):
+        self.maximo = maximo
+        self.repeticiones = (
+            repeticiones_maximas() if repeticiones is None else repeticiones
+        )
+        self.fallar = fallar
+        self.consultas = []
+        self._pila = None
+
+    def __call__(self, execute, sql, params, many, context):
+        if not _fuera.get():
+            self.consultas.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._pila = ExitStack()
+        for alias in connections:
+            self._pila.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        self._pila.close()
+        if tipo is None and self.fallar:
+            problemas = self.problemas()
+            if problemas:
+                raise PresupuestoExcedido("\n".join(problemas))
+        return False
+
+    @property
+    def total(self):
+        return len(self.consultas)
+
+    def repetidas(self):
+        """{forma: veces} de las formas repetidas más de lo permitido."""
+        conteo = Counter(forma_sql(sql) for sql in self.consultas)
+        return {
+            forma: veces for forma, veces in conteo.items() if veces > self.repeticiones
+        }
+
+    def problemas(self):
+        problemas = []
+        if self.maximo is not None and self.total > self.maximo:
+            problemas.append(
+                f"{self.total} consultas (presupuesto: {self.maximo}):\n  "
+                + "\n  ".join(self.consultas)
+            )
+        for forma, veces in self.repetidas().items():
+            problemas.append(f"Consulta repetida {veces} veces (¿N+1?): {forma}")
+        return problemas
+
+
+class PresupuestoConsultasMiddleware:
+    """
+    Aplica el presupuesto de la vista a cada petición (solo para desarrollo).
+    CONSULTAS_PRESUPUESTO_MODO: "log" escribe un warning, "error" responde con
+    la excepción; vacío desactiva el middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.modo = getattr(settings, "CONSULTAS_PRESUPUESTO_MODO", "")
+        if self.modo not in ("log", "error"):
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        with VerificarConsultas(fallar=False) as verificacion:
+            response = self.get_response(request)
+        verificacion.maximo = getattr(request, "presupuesto_consultas", None)
+        if response.streaming:
+            # El cuerpo se genera al enviarlo: sus consultas también cuentan
+            response.streaming_content = self._medir_cuerpo(
+                request, response.streaming_content, verificacion
+            )
+        else:
+            self._comprobar(request, verificacion)
+        return response
+
+    def _medir_cuerpo(self, request, contenido, verificacion):
+        with verificacion:
+            yield from contenido
+        self._comprobar(request, verificacion)
+
+    def _comprobar(self, request, verificacion):
+        problemas = verificacion.problemas()
+        if problemas:
+            mensaje = f"{request.method} {request.path}: " + "\n".join(problemas)
+            if self.modo == "error":
+                raise PresupuestoExcedido(mensaje)
+            logger.warning(mensaje)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.presupuesto_consultas = presupuesto_de(view_func, request.method)
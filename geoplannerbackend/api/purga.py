@@ -0,0 +1,291 @@
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import tendencias
+from .escrituras import aplicar_contadores
+from .imagenes import eliminar_imagen
+from .models import (
+    ActividadeAgenda,
+    ComentarioPublicacion,
+    Conversacion,
+    EntradaTimeline,
+    ImagenPublicacion,
+    Inscripciones,
+    LikePublicacion,
+    Publicacion,
+    RegistroEliminacion,
+    Seguimiento,
+    SubidaImagen,
+    UbicacionEvento,
+    Usuario,
+)
+from .serializers import TAMANO_LOTE
+from .subidas import borrar_parcial
+from .tareas import encolar_al_confirmar, programar
+from .timeline import actualizar_popularidad
+from .visibilidad import invalidar_amigos
+
+# Borrado en dos fases:
+# 1. La vista marca eliminado_en (un UPDATE): el objeto desaparece de la API.
+# 2. Una tarea en segundo plano borra las dependencias con DELETE directos por
+#    lotes, sin cargar objetos en memoria ni pasar por el colector de cascada
+#    de Django, en transacciones cortas para no bloquear SQLite. Como no se
+#    emiten señales, aquí se hace lo que harían: lápidas, archivos y contadores.
+
+
+def marcar_usuario(usuario_id):
+    """Oculta al usuario y sus publicaciones; la purga se encola al confirmar."""
+    ahora = timezone.now()
+    Usuario.todos.filter(id=usuario_id).update(eliminado_en=ahora)
+    Publicacion.todos.filter(id_usuario=usuario_id, eliminado_en__isnull=True).update(
+        eliminado_en=ahora
+    )
+    encolar_al_confirmar(purgar_usuario, usuario_id)
+
+
+def marcar_publicacion(publicacion_id):
+    Publicacion.todos.filter(id=publicacion_id).update(
+        eliminado_en=timezone.now(), version=F("version") + 1
+    )
+    encolar_al_confirmar(purgar_publicaciones, [publicacion_id])
+
+
+def _borrar_directo(queryset):
+    return queryset._raw_delete(queryset.db)
+
+
+def _por_lotes(queryset, antes_de_borrar=None, tamano_lote=TAMANO_LOTE):
+    """
+    Borra las filas de `queryset` en lotes de claves primarias, cada uno con
+    un DELETE directo en su propia transacción. `antes_de_borrar(ids)` puede
+    leer lo que haga falta de cada lote antes de borrarlo.
+    """
+    modelo = queryset.model
+    total = 0
+    while True:
+        ids = list(queryset.values_list("pk", flat=True)[:tamano_lote])
+        if not ids:
+            return total
+        with transaction.atomic():
+            if antes_de_borrar is not None:
+                antes_de_borrar(ids)
+            total += _borrar_directo(modelo._base_manager.filter(pk__in=ids))
+
+
+def _lapidas(recurso, filas):
+    """filas: [(objeto_id, usuario_id)] de un recurso sincronizable."""
+    RegistroEliminacion.objects.bulk_create(
+        [
+            RegistroEliminacion(recurso=recurso, objeto_id=objeto_id, usuario_id=dueno)
+            for objeto_id, dueno in filas
+        ],
+        batch_size=TAMANO_LOTE,
+    )
+
+
+def _ubicaciones(modelo, ids):
+    return UbicacionEvento.objects.filter(
+        content_type=ContentType.objects.get_for_model(modelo), object_id__in=ids
+    )
+
+
+def purgar_publicaciones(publicacion_ids):
+    """Borra publicaciones marcadas como eliminadas y todo lo que cuelga de ellas."""
+    totales = Counter()
+    ids = list(
+        Publicacion.todos.filter(
+            id__in=publicacion_ids, eliminado_en__isnull=False
+        ).values_list("id", flat=True)
+    )
+    if not ids:
+        return totales
+
+    def lapidas_inscripciones(lote):
+        _lapidas(
+            "inscripciones",
+            Inscripciones.objects.filter(id__in=lote).values_list(
+                "id", "id_usuario_id"
+            ),
+        )
+
+    archivos = []
+
+    def recordar_archivos(lote):
+        archivos.extend(
+            ImagenPublicacion.objects.filter(id__in=lote).values_list(
+                "imagen", "huella"
+            )
+        )
+
+    def borrar_parciales(lote):
+        for subida_id in lote:
+            borrar_parcial(subida_id)
+
+    totales["likes"] += _por_lotes(
+        LikePublicacion.objects.filter(id_publicacion__in=ids)
+    )
+    totales["comentarios"] += _por_lotes(
+        ComentarioPublicacion.objects.filter(id_publicacion__in=ids)
+    )
+    totales["inscripciones"] += _por_lotes(
+        Inscripciones.objects.filter(id_publicacion__in=ids), lapidas_inscripciones
+    )
+    totales["timeline"] += _por_lotes(
+        EntradaTimeline.objects.filter(publicacion__in=ids)
+    )
+    totales["imagenes"] += _por_lotes(
+        ImagenPublicacion.objects.filter(publicacion__in=ids), recordar_archivos
+    )
+    totales["subidas"] += _por_lotes(
+        SubidaImagen.objects.filter(publicacion__in=ids), borrar_parciales
+    )
+    totales["ubicaciones"] += _por_lotes(_ubicaciones(Publicacion, ids))
+    totales["publicaciones"] += _por_lotes(
+        Publicacion.todos.filter(id__in=ids),
+        lambda lote: _lapidas("publicaciones", [(pub_id, None) for pub_id in lote]),
+    )
+
+    # Los archivos se comparten por contenido: se borran cuando ya no hay filas
+    for nombre, huella in archivos:
+        eliminar_imagen(nombre, huella)
+    return totales
+
+
+def _descontar(modelo, peso, usuario_id, campo_fecha, campo=None):
+    """
+    Borra los likes, comentarios o inscripciones del usuario en publicaciones
+    de otros y descuenta de cada publicación afectada el contador `campo` y
+    el `peso` de tendencia de cada fila a su fecha `campo_fecha` (como al
+    deshacerlas desde la API).
+    """
+    afectadas = set()
+
+    def descontar(lote):
+        conteos = Counter()
+        pesos = Counter()
+        for publicacion_id, fecha in modelo.objects.filter(id__in=lote).values_list(
+            "id_publicacion_id", campo_fecha
+        ):
+            conteos[publicacion_id] += 1
+            pesos[publicacion_id] += tendencias.peso_vigente(peso, fecha)
+        for publicacion_id, cantidad in conteos.items():
+            deltas = {"tendencia": -pesos[publicacion_id]}
+            if campo:
+                deltas[campo] = -cantidad
+            aplicar_contadores(Publicacion, publicacion_id, deltas)
+        afectadas.update(conteos)
+
+    total = _por_lotes(modelo.objects.filter(id_usuario=usuario_id), descontar)
+    for publicacion_id in afectadas:
+        actualizar_popularidad(publicacion_id)
+    return total
+
+
+def purgar_usuario(usuario_id):
+    """Borra un usuario marcado como eliminado con todos sus datos, por lotes."""
+    usuario = Usuario.todos.filter(id=usuario_id, eliminado_en__isnull=False).first()
+    if usuario is None:
+        return Counter()
+
+    totales = Counter()
+    propias = Publicacion.todos.filter(id_usuario=usuario_id).values_list(
+        "id", flat=True
+    )
+    while True:
+        lote = list(propias[:TAMANO_LOTE])
+        if not lote:
+            break
+        # Las creadas después de marcar al usuario también se purgan
+        Publicacion.todos.filter(id__in=lote, eliminado_en__isnull=True).update(
+            eliminado_en=timezone.now()
+        )
+        totales.update(purgar_publicaciones(lote))
+
+    totales["likes"] += _descontar(
+        LikePublicacion, tendencias.PESO_LIKE, usuario_id, "fecha_like", "me_gusta"
+    )
+    totales["comentarios"] += _descontar(
+        ComentarioPublicacion,
+        tendencias.PESO_COMENTARIO,
+        usuario_id,
+        "fecha_comentario",
+        "comentarios",
+    )
+    totales["inscripciones"] += _descontar(
+        Inscripciones, tendencias.PESO_INSCRIPCION, usuario_id, "fecha_creacion"
+    )
+
+    actividades = ActividadeAgenda.objects.filter(id_usuario=usuario_id)
+    totales["actividades"] += _por_lotes(
+        actividades,
+        lambda lote: _borrar_directo(_ubicaciones(ActividadeAgenda, lote)),
+    )
+    totales["conversaciones"] += _por_lotes(
+        Conversacion.objects.filter(usuario=usuario_id)
+    )
+
+    relacionados = set()
+
+    def descontar_seguidores(lote):
+        seguidos = list(
+            Seguimiento.objects.filter(id__in=lote).values_list("seguido_id", flat=True)
+        )
+        Usuario.todos.filter(id__in=seguidos).update(
+            num_seguidores=F("num_seguidores") - 1
+        )
+        relacionados.update(seguidos)
+
+    totales["seguimientos"] += _por_lotes(
+        Seguimiento.objects.filter(seguidor=usuario_id), descontar_seguidores
+    )
+    totales["seguimientos"] += _por_lotes(
+        Seguimiento.objects.filter(seguido=usuario_id),
+        lambda lote: relacionados.update(
+            Seguimiento.objects.filter(id__in=lote).values_list(
+                "seguidor_id", flat=True
+            )
+        ),
+    )
+    invalidar_amigos(relacionados)
+
+    with transaction.atomic():
+        # Lo que otras tareas hayan insertado mientras tanto (fan-out) se
+        # borra junto al usuario para no violar las claves foráneas
+        _borrar_directo(EntradaTimeline.objects.filter(usuario=usuario_id))
+        _borrar_directo(Usuario.todos.filter(id=usuario_id))
+    totales["usuarios"] += 1
+    if usuario.foto_perfil:
+        eliminar_imagen(usuario.foto_perfil.name, usuario.foto_perfil_huella)
+    return totales
+
+
+def purgar_pendientes():
+    """
+    Purga lo que quedó marcado sin purgar (por ejemplo si el proceso se
+    reinició antes de terminar la tarea). Devuelve los totales.
+    """
+    totales = Counter()
+    for usuario_id in Usuario.todos.filter(eliminado_en__isnull=False).values_list(
+        "id", flat=True
+    ):
+        totales.update(purgar_usuario(usuario_id))
+    pendientes = Publicacion.todos.filter(eliminado_en__isnull=False).values_list(
+        "id", flat=True
+    )
+    while True:
+        lote = list(pendientes[:TAMANO_LOTE])
+        if not lote:
+            return totales
+        totales.update(purgar_publicaciones(lote))
+
+
+def iniciar_purga_periodica():
+    """Programa purgar_pendientes cada PURGA_INTERVALO segundos (0 la desactiva)."""
+    intervalo = getattr(settings, "PURGA_INTERVALO", 3600)
+    if intervalo > 0:
+        programar(purgar_pendientes, intervalo)
@@ -0,0 +1,47 @@
+import decimal
+
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+
+from .metricas import medir
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional, sin él se usa el renderer de DRF
+    orjson = None
+
+
+def _por_defecto(obj):
+    # Tipos que orjson no conoce de forma nativa
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if hasattr(obj, "tolist"):  # arrays y escalares de numpy
+        return obj.tolist()
+    if hasattr(obj, "__iter__"):
+        return list(obj)
+    raise TypeError(f"Objeto de tipo {type(obj).__name__} no serializable a JSON")
+
+
+# Renderer JSON rápido basado en orjson (UUID, datetime y date nativos)
+class OrjsonRenderer(JSONRenderer):
+    """
+    Renderer compatible con JSONRenderer de DRF. Si orjson no está instalado,
+    o si el cliente pide indentación (API navegable), delega en el renderer
+    estándar.
+    """
+
+    opciones = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        renderer_context = renderer_context or {}
+        # El tiempo de codificación cuenta como serialización (Server-Timing)
+        with medir("serializacion"):
+            if orjson is None or self.get_indent(accepted_media_type, renderer_context):
+                return super().render(data, accepted_media_type, renderer_context)
+            return orjson.dumps(data, default=_por_defecto, option=self.opciones)
@@ -0,0 +1,103 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+ESCRITURA = "default"
+LECTURA = "lectura"
+
+METODOS_SEGUROS = ("GET", "HEAD", "OPTIONS")
+
+# Separación de lecturas y escrituras:
+# - "lectura" es la réplica (el mismo archivo en solo lectura, otra copia de
+#   SQLite o un PostgreSQL local; ver settings.DATABASES).
+# - Solo las peticiones GET/HEAD/OPTIONS leen de la réplica, y solo hasta su
+#   primera escritura; comandos, tareas y transacciones leen de "default".
+# - Read-your-writes: tras una petición que escribe, el mismo cliente lee de
+#   "default" durante LECTURA_STICKY_SEGUNDOS, el retraso máximo esperado de
+#   la réplica.
+
+# Alias al que van las lecturas en el contexto actual (petición, hilo o tarea)
+_destino = ContextVar("destino_lecturas", default=ESCRITURA)
+_escribio = ContextVar("escribio", default=False)
+
+
+@contextmanager
+def leer_de(alias):
+    """Fuerza el alias de las lecturas del bloque: leer_de(ESCRITURA) para datos frescos."""
+    token = _destino.set(alias)
+    try:
+        yield
+    finally:
+        _destino.reset(token)
+
+
+class LecturaRouter:
+    """
+    Escrituras a "default"; lecturas al alias del contexto (ver
+    LecturaMiddleware). Dentro de una transacción de "default" también se lee
+    de ella, para ver lo que la propia transacción escribió y aún no confirmó.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            LECTURA not in connections.settings
+            or connections[ESCRITURA].in_atomic_block
+        ):
+            return ESCRITURA
+        return _destino.get()
+
+    def db_for_write(self, model, **hints):
+        # Lo que se lea después en la misma petición ya no puede venir de
+        # una réplica que aún no tiene esta escritura
+        _destino.set(ESCRITURA)
+        _escribio.set(True)
+        return ESCRITURA
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # La réplica es una copia de "default"
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == ESCRITURA
+
+
+def _cache():
+    return caches[getattr(settings, "LECTURA_CACHE_ALIAS", "default")]
+
+
+def clave_cliente(request):
+    """
+    Quién debe leer sus propias escrituras. La API no tiene sesión y cada
+    vista recibe el usuario en un campo distinto, así que se usa la IP: los
+    clientes detrás de la misma IP comparten la ventana, que solo hace leer
+    de "default" de más.
+    """
+    return f"escribio:{request.META.get('REMOTE_ADDR', '')}"
+
+
+class LecturaMiddleware:
+    """Decide por petición si sus lecturas van a la réplica (ver LecturaRouter)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.ventana = getattr(settings, "LECTURA_STICKY_SEGUNDOS", 5)
+
+    def __call__(self, request):
+        clave = clave_cliente(request)
+        replica = request.method in METODOS_SEGUROS and not (
+            self.ventana and _cache().get(clave)
+        )
+        token_destino = _destino.set(LECTURA if replica else ESCRITURA)
+        token_escribio = _escribio.set(False)
+        try:
+            response = self.get_response(request)
+            escribio = _escribio.get() or request.method not in METODOS_SEGUROS
+            if escribio and self.ventana:
+                _cache().set(clave, True, timeout=self.ventana)
+        finally:
+            _destino.reset(token_destino)
+            _escribio.reset(token_escribio)
+        return response
@@ -1,4 +1,15 @@
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+from .imagenes import VARIANTES, pendiente, ruta_variante, urls_variantes
+from .media import url_firmada
+from .tendencias import geohash
+from .visibilidad import normalizar_usuario
 from .models import (
     Usuario,
     ActividadeAgenda,
@@ -8,15 +19,131 @@ from .models import (
     LikePublicacion,
     ComentarioPublicacion,
     Conversacion,
+    ImagenPublicacion,
+    SubidaImagen,
+    Seguimiento,
 )
 
+# Tamaño de lote para los INSERT masivos
+TAMANO_LOTE = 500
+
+
+def crear_ubicaciones(pares):
+    """
+    Inserta con bulk_create las ubicaciones de varios objetos.
+    `pares` es una lista de (objeto, [datos de ubicación]).
+    """
+    ubicaciones = []
+    publicaciones = []
+    for objeto, ubicaciones_data in pares:
+        content_type = ContentType.objects.get_for_model(objeto)  # cacheado
+        # Ids en el orden de la entrada: la primera ubicación por id (ver
+        # tendencias.region_publicacion) es la primera que se envió
+        ids = sorted(uuid.uuid4() for _ in ubicaciones_data)
+        nuevas = [
+            UbicacionEvento(
+                id=id_ubicacion,
+                content_type=content_type,
+                object_id=objeto.pk,
+                latitud=ubic_data["latitud"],
+                longitud=ubic_data["longitud"],
+            )
+            for id_ubicacion, ubic_data in zip(ids, ubicaciones_data)
+        ]
+        if nuevas and isinstance(objeto, Publicacion):
+            # Región de tendencias: la de la primera ubicación
+            objeto.region = geohash(nuevas[0].latitud, nuevas[0].longitud)
+            publicaciones.append(objeto)
+        ubicaciones.extend(nuevas)
+    creadas = UbicacionEvento.objects.bulk_create(ubicaciones, batch_size=TAMANO_LOTE)
+    # Un UPDATE con CASE por lote, no uno por publicación ni por región
+    Publicacion.objects.bulk_update(publicaciones, ["region"], batch_size=TAMANO_LOTE)
+    return creadas
+
+
+# Relación por clave primaria que puede resolverse desde objetos precargados
+class RelacionPrecargadaField(serializers.PrimaryKeyRelatedField):
+    def to_internal_value(self, data):
+        precargados = getattr(self.parent, "_precargados", {}).get(self.field_name)
+        if precargados is not None:
+            try:
+                pk = self.get_queryset().model._meta.pk.to_python(data)
+            except DjangoValidationError:
+                self.fail("incorrect_type", data_type=type(data).__name__)
+            if pk in precargados:
+                return precargados[pk]
+        return super().to_internal_value(data)
+
+
+# ListSerializer para crear muchos objetos con sus ubicaciones en una transacción
+class CreacionMasivaListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        # El límite se comprueba antes de validar (y precargar) los elementos
+        maximo = getattr(settings, "CREACION_MASIVA_MAX", 5000)
+        if isinstance(data, list) and len(data) > maximo:
+            raise serializers.ValidationError(
+                {
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        f"Máximo {maximo} elementos por petición."
+                    ]
+                },
+                code="max_length",
+            )
+        # Una consulta por relación para todos los elementos, no una por fila
+        if isinstance(data, list):
+            precargados = {}
+            for nombre, campo in self.child.fields.items():
+                if isinstance(campo, RelacionPrecargadaField) and not campo.read_only:
+                    ids = {
+                        item[nombre]
+                        for item in data
+                        if isinstance(item, dict) and isinstance(item.get(nombre), str)
+                    }
+                    try:
+                        precargados[nombre] = campo.get_queryset().in_bulk(ids)
+                    except DjangoValidationError:
+                        continue  # Hay ids inválidos: se validan uno a uno
+            self.child._precargados = precargados
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        modelo = self.child.Meta.model
+        objetos, pares = [], []
+        for datos in validated_data:
+            ubicaciones_data = datos.pop("ubicaciones", [])
+            objeto = modelo(**datos)
+            objetos.append(objeto)
+            pares.append((objeto, ubicaciones_data))
+
+        # Número fijo de sentencias: un INSERT por lote de cada tabla
+        with transaction.atomic():
+            modelo.objects.bulk_create(objetos, batch_size=TAMANO_LOTE)
+            crear_ubicaciones(pares)
+        return objetos
+
 
 # Serializer para el modelo Usuario
 class UsuarioSerializer(serializers.ModelSerializer):
+    # URLs de las miniaturas WebP (None mientras se procesan)
+    foto_perfil_variantes = serializers.SerializerMethodField()
+
     class Meta:
         model = Usuario
-        fields = "__all__"  # Incluye todos los campos
-        read_only_fields = ("rol",)  # ← Esto evita modificar el rol desde la API
+        exclude = ("eliminado_en",)  # Solo se ven usuarios no eliminados
+        read_only_fields = (
+            "rol",
+            "foto_perfil_huella",
+            "num_seguidores",
+        )  # ← Esto evita modificar el rol desde la API
+
+    def get_foto_perfil_variantes(self, obj):
+        return urls_variantes(obj.foto_perfil_huella)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if pendiente(instance.foto_perfil.name):
+            data["foto_perfil"] = None  # Aún no se sirve (ver api.imagenes)
+        return data
 
     # Para ocultar el password en las respuestas si quieres
     extra_kwargs = {"password_hash": {"write_only": True}}
@@ -32,6 +159,8 @@ class UbicacionEventoSerializer(serializers.ModelSerializer):
 
 # Serializer para el modelo ActividadAgenda
 class ActividadAgendaSerializer(serializers.ModelSerializer):
+    serializer_related_field = RelacionPrecargadaField
+
     # Para crear la actividad con ubicaciones
     ubicaciones = UbicacionEventoSerializer(many=True, required=False, write_only=True)
     # Para listar las ubicaciones asociadas
@@ -43,18 +172,14 @@ class ActividadAgendaSerializer(serializers.ModelSerializer):
         model = ActividadeAgenda
         fields = "__all__"
         read_only_fields = ("id", "fecha_creacion")  # No se pueden modificar
+        list_serializer_class = CreacionMasivaListSerializer
 
     def create(self, validated_data):
         ubicaciones_data = validated_data.pop("ubicaciones", [])
-        actividad = ActividadeAgenda.objects.create(**validated_data)
-
-        # Crear filas en UbicacionEvento
-        for ubic_data in ubicaciones_data:
-            UbicacionEvento.objects.create(
-                content_object=actividad,
-                latitud=ubic_data["latitud"],
-                longitud=ubic_data["longitud"],
-            )
+        with transaction.atomic():
+            actividad = ActividadeAgenda.objects.create(**validated_data)
+            # Crear filas en UbicacionEvento
+            crear_ubicaciones([(actividad, ubicaciones_data)])
 
         return actividad
 
@@ -82,8 +207,78 @@ class ComentarioPublicacionSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "fecha_comentario")
 
 
+# Serializer para seguimientos entre usuarios
+class SeguimientoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Seguimiento
+        fields = "__all__"
+        read_only_fields = ("id", "fecha_creacion")
+
+    def validate(self, data):
+        if data["seguidor"] == data["seguido"]:
+            raise serializers.ValidationError(
+                "Un usuario no puede seguirse a sí mismo."
+            )
+        return data
+
+
+# Serializer para las imágenes de una publicación
+class ImagenPublicacionSerializer(serializers.ModelSerializer):
+    # URLs de las variantes WebP (None mientras se procesan)
+    variantes = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImagenPublicacion
+        fields = "__all__"
+        read_only_fields = ("id", "huella")
+
+    def get_variantes(self, obj):
+        return urls_variantes(obj.huella)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if pendiente(instance.imagen.name):
+            data["imagen"] = None  # Aún no se sirve (ver api.imagenes)
+        elif instance.publicacion.privacidad != "PUB":
+            # Publicaciones no públicas: /media/ solo las sirve con URL firmada
+            request = self.context.get("request")
+            data["imagen"] = url_firmada(instance.imagen.name, request)
+            if instance.huella:
+                data["variantes"] = {
+                    nombre: url_firmada(ruta_variante(instance.huella, nombre), request)
+                    for nombre in VARIANTES
+                }
+        return data
+
+
+# Serializer para iniciar una subida reanudable por fragmentos
+class SubidaImagenSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SubidaImagen
+        fields = "__all__"
+        read_only_fields = ("id", "recibido", "fecha_creacion", "fecha_actualizacion")
+
+    def validate_tamano_total(self, value):
+        maximo = getattr(settings, "SUBIDAS_TAMANO_MAXIMO", 100 * 1024 * 1024)
+        if not 0 < value <= maximo:
+            raise serializers.ValidationError(
+                f"El tamaño debe estar entre 1 y {maximo} bytes."
+            )
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if value and (
+            len(value) != 64 or any(c not in "0123456789abcdef" for c in value)
+        ):
+            raise serializers.ValidationError("sha256 debe ser un hash hexadecimal.")
+        return value
+
+
 # Serializer para el modelo Publicacion
 class PublicacionSerializer(serializers.ModelSerializer):
+    serializer_related_field = RelacionPrecargadaField
+
     # Para crear publicación con ubicaciones
     ubicaciones = UbicacionEventoSerializer(many=True, required=False, write_only=True)
     # Mostrar ubicaciones al listar
@@ -92,36 +287,48 @@ class PublicacionSerializer(serializers.ModelSerializer):
     )
     likes = LikePublicacionSerializer(many=True, read_only=True)
     comentarios_publicacion = ComentarioPublicacionSerializer(many=True, read_only=True)
+    imagenes = ImagenPublicacionSerializer(many=True, read_only=True)
     ya_dio_like = serializers.SerializerMethodField()
 
     class Meta:
         model = Publicacion
-        fields = "__all__"
+        # La tendencia cambia sin incrementar la versión (no va en la cache)
+        exclude = ("tendencia", "eliminado_en")
         extra_fields = ["ya_dio_like"]
         read_only_fields = (
             "id",
             "fecha_creacion",
+            "region",
         )
+        list_serializer_class = CreacionMasivaListSerializer
 
     def get_ya_dio_like(self, obj):
-        usuario_id = self.context.get("usuario_id")
-        if usuario_id:
-            return LikePublicacion.objects.filter(
-                id_usuario=usuario_id, id_publicacion=obj.id
-            ).exists()
-        return False
+        usuario_id = normalizar_usuario(self.context.get("usuario_id"))
+        if usuario_id is None:
+            return False
+        # Con many=True el hijo es el mismo serializer para todas las filas:
+        # una sola consulta para la lista en lugar de un exists() por fila
+        con_like = getattr(self, "_con_like", None)
+        if con_like is None or obj.id not in con_like[0]:
+            ids = {obj.id}
+            if isinstance(self.parent, serializers.ListSerializer):
+                ids.update(p.id for p in self.parent.instance or ())
+            con_like = self._con_like = (
+                ids,
+                set(
+                    LikePublicacion.objects.filter(
+                        id_usuario=usuario_id, id_publicacion__in=ids
+                    ).values_list("id_publicacion_id", flat=True)
+                ),
+            )
+        return obj.id in con_like[1]
 
     def create(self, validated_data):
         ubicaciones_data = validated_data.pop("ubicaciones", [])
-        publicacion = Publicacion.objects.create(**validated_data)
-
-        # Crear filas en UbicacionEvento
-        for ubic_data in ubicaciones_data:
-            UbicacionEvento.objects.create(
-                content_object=publicacion,
-                latitud=ubic_data["latitud"],
-                longitud=ubic_data["longitud"],
-            )
+        with transaction.atomic():
+            publicacion = Publicacion.objects.create(**validated_data)
+            # Crear filas en UbicacionEvento
+            crear_ubicaciones([(publicacion, ubicaciones_data)])
 
         return publicacion
 
@@ -152,4 +359,4 @@ class InscripcionSerializer(serializers.ModelSerializer):
 class ConversacionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Conversacion
-        fields = "_all_"
+        fields = "__all__"
@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .imagenes import eliminar_imagen
+from .models import (
+    ActividadeAgenda,
+    Conversacion,
+    ImagenPublicacion,
+    Inscripciones,
+    Publicacion,
+    Seguimiento,
+)
+from .sincronizacion import registrar_eliminacion
+from .visibilidad import actualizar_amigos
+
+
+# Lápidas para la sincronización incremental de los clientes móviles
+@receiver(post_delete, sender=Publicacion)
+@receiver(post_delete, sender=ActividadeAgenda)
+@receiver(post_delete, sender=Inscripciones)
+@receiver(post_delete, sender=Conversacion)
+def registrar_lapida(sender, instance, **kwargs):
+    registrar_eliminacion(instance)
+
+
+# Archivos de imágenes de publicaciones (incluye el borrado en cascada)
+@receiver(post_delete, sender=ImagenPublicacion)
+def borrar_archivo_imagen(sender, instance, **kwargs):
+    nombre, huella = instance.imagen.name, instance.huella
+    transaction.on_commit(lambda: eliminar_imagen(nombre, huella))
+
+
+# Conjuntos de amigos en cache: se reescriben al confirmar cada cambio
+@receiver(post_save, sender=Seguimiento)
+@receiver(post_delete, sender=Seguimiento)
+def actualizar_cache_amigos(sender, instance, created=True, **kwargs):
+    if not created:
+        return  # Editar un seguimiento no cambia quién sigue a quién
+    seguidor, seguido = instance.seguidor_id, instance.seguido_id
+    transaction.on_commit(lambda: actualizar_amigos(seguidor, seguido))
@@ -0,0 +1,130 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from . import cache_publicaciones
+from .models import (
+    ActividadeAgenda,
+    Conversacion,
+    Inscripciones,
+    Publicacion,
+    RegistroEliminacion,
+)
+from .serializers import (
+    ActividadAgendaSerializer,
+    ConversacionSerializer,
+    InscripcionSerializer,
+    PublicacionSerializer,
+)
+from .visibilidad import filtro_visibles
+
+# Margen para no perder filas guardadas justo antes de leer el cursor
+MARGEN_CURSOR = timedelta(seconds=2)
+
+# Recursos que se pueden sincronizar:
+# nombre -> (modelo, serializer, campo del dueño, campo de fecha de creación)
+RECURSOS = {
+    "publicaciones": (Publicacion, PublicacionSerializer, None, "fecha_creacion"),
+    "actividades": (
+        ActividadeAgenda,
+        ActividadAgendaSerializer,
+        "id_usuario_id",
+        "fecha_creacion",
+    ),
+    "inscripciones": (
+        Inscripciones,
+        InscripcionSerializer,
+        "id_usuario_id",
+        "fecha_creacion",
+    ),
+    "conversaciones": (Conversacion, ConversacionSerializer, "usuario_id", "fecha"),
+}
+
+
+def recurso_de(modelo):
+    for nombre, (modelo_recurso, _, campo_usuario, _) in RECURSOS.items():
+        if modelo is modelo_recurso:
+            return nombre, campo_usuario
+    return None, None
+
+
+def registrar_eliminacion(instance):
+    """Guarda la lápida de un objeto sincronizable que se acaba de borrar."""
+    nombre, campo_usuario = recurso_de(type(instance))
+    if nombre is None:
+        return None
+    return RegistroEliminacion.objects.create(
+        recurso=nombre,
+        objeto_id=instance.pk,
+        usuario_id=getattr(instance, campo_usuario) if campo_usuario else None,
+    )
+
+
+def _serializar_publicaciones(filas, usuario_id):
+    def serializar(ids):
+        objetos = Publicacion.objects.filter(id__in=ids).prefetch_related(
+            "ubicacion", "likes", "comentarios_publicacion", "imagenes"
+        )
+        return PublicacionSerializer(objetos, many=True).data
+
+    fragmentos = cache_publicaciones.obtener_fragmentos(filas, serializar)
+    return cache_publicaciones.aplicar_ya_dio_like(fragmentos, usuario_id)
+
+
+def cambios_desde(usuario_id, cursor=None, recursos=None):
+    """
+    Devuelve los objetos creados, actualizados y eliminados de cada recurso
+    desde `cursor` (None = sincronización completa) junto al nuevo cursor.
+    Cada consulta usa el índice de fecha_actualizacion o de fecha_eliminacion.
+    """
+    # Un cursor sin zona horaria se interpreta en la zona del servidor
+    if cursor is not None and timezone.is_naive(cursor):
+        cursor = timezone.make_aware(cursor)
+    nuevo_cursor = timezone.now() - MARGEN_CURSOR
+    respuesta = {"cursor": nuevo_cursor.isoformat()}
+
+    for nombre in recursos or RECURSOS:
+        modelo, serializer_class, campo_usuario, campo_creacion = RECURSOS[nombre]
+
+        queryset = modelo.objects.all()
+        eliminados = RegistroEliminacion.objects.filter(recurso=nombre)
+        if campo_usuario:
+            queryset = queryset.filter(**{campo_usuario: usuario_id})
+            eliminados = eliminados.filter(usuario_id=usuario_id)
+        if cursor is not None:
+            queryset = queryset.filter(fecha_actualizacion__gt=cursor)
+            eliminados = eliminados.filter(fecha_eliminacion__gt=cursor)
+        queryset = queryset.order_by("fecha_actualizacion")
+
+        if modelo is Publicacion:
+            queryset = queryset.filter(filtro_visibles(usuario_id))
+            filas = list(queryset.values_list("id", "version", campo_creacion))
+            creados = {
+                str(pub_id)
+                for pub_id, _, creacion in filas
+                if cursor is None or creacion > cursor
+            }
+            datos = _serializar_publicaciones(
+                [(pub_id, version) for pub_id, version, _ in filas], usuario_id
+            )
+            es_creado = [str(d["id"]) in creados for d in datos]
+        else:
+            if modelo is ActividadeAgenda:
+                queryset = queryset.prefetch_related("ubicacion")
+            objetos = list(queryset)
+            datos = serializer_class(objetos, many=True).data
+            es_creado = [
+                cursor is None or getattr(obj, campo_creacion) > cursor
+                for obj in objetos
+            ]
+
+        respuesta[nombre] = {
+            "creados": [d for d, creado in zip(datos, es_creado) if creado],
+            "actualizados": [d for d, creado in zip(datos, es_creado) if not creado],
+            "eliminados": [
+                str(objeto_id)
+                for objeto_id in eliminados.values_list("objeto_id", flat=True)
+            ],
+        }
+
+    return respuesta
@@ -0,0 +1,250 @@
+import hashlib
+import os
+import shutil
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .imagenes import PREFIJO_PENDIENTES, procesar_imagen_publicacion
+from .models import ImagenPublicacion, Publicacion, SubidaImagen
+from .serializers import ImagenPublicacionSerializer, SubidaImagenSerializer
+from .tareas import encolar_al_confirmar
+
+# Tamaño de lectura del cuerpo: memoria constante por petición
+TAMANO_LECTURA = 64 * 1024
+
+
+def directorio_subidas():
+    return Path(
+        getattr(
+            settings, "SUBIDAS_DIRECTORIO", settings.BASE_DIR / "subidas_temporales"
+        )
+    )
+
+
+def ruta_parcial(subida_id):
+    return directorio_subidas() / f"{subida_id}.part"
+
+
+def tamano_fragmento_maximo():
+    return getattr(settings, "SUBIDAS_TAMANO_FRAGMENTO", 8 * 1024 * 1024)
+
+
+def borrar_parcial(subida_id):
+    try:
+        os.remove(ruta_parcial(subida_id))
+    except FileNotFoundError:
+        pass
+
+
+def limpiar_expiradas():
+    """Elimina las subidas abandonadas y sus archivos parciales."""
+    limite = timezone.now() - timedelta(
+        seconds=getattr(settings, "SUBIDAS_EXPIRACION", 24 * 3600)
+    )
+    expiradas = SubidaImagen.objects.filter(fecha_actualizacion__lt=limite)
+    ids = list(expiradas.values_list("id", flat=True))
+    for subida_id in ids:
+        borrar_parcial(subida_id)
+    SubidaImagen.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def _checksum(request):
+    # Formato "sha256 <hex>", similar a la cabecera Upload-Checksum de tus
+    valor = request.headers.get("Upload-Checksum", "")
+    algoritmo, _, esperado = valor.partition(" ")
+    if algoritmo.lower() != "sha256" or len(esperado.strip()) != 64:
+        return None
+    return esperado.strip().lower()
+
+
+def _sha256_archivo(ruta):
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        while bloque := f.read(TAMANO_LECTURA):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def _error(mensaje, codigo=status.HTTP_400_BAD_REQUEST, **extra):
+    return Response({"error": mensaje, **extra}, status=codigo)
+
+
+# Subidas reanudables por fragmentos:
+#   POST   /subidas/                  -> inicia (publicacion, nombre_archivo, tamano_total, sha256)
+#   GET    /subidas/<id>/             -> estado; "recibido" es el offset para reanudar
+#   PUT    /subidas/<id>/fragmento/   -> agrega un fragmento (Upload-Offset, Upload-Checksum)
+#   POST   /subidas/<id>/finalizar/   -> verifica y crea la ImagenPublicacion
+#   DELETE /subidas/<id>/             -> cancela
+class SubidaImagenViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    queryset = SubidaImagen.objects.all()
+    serializer_class = SubidaImagenSerializer
+    lookup_field = "id"
+
+    def create(self, request, *args, **kwargs):
+        limpiar_expiradas()
+        response = super().create(request, *args, **kwargs)
+        response.data["tamano_fragmento"] = tamano_fragmento_maximo()
+        return response
+
+    def perform_create(self, serializer):
+        subida = serializer.save()
+        directorio_subidas().mkdir(parents=True, exist_ok=True)
+        ruta_parcial(subida.id).touch()
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        response["Upload-Offset"] = str(response.data["recibido"])
+        response["Cache-Control"] = "no-store"
+        return response
+
+    def perform_destroy(self, instance):
+        subida_id = instance.id
+        instance.delete()
+        borrar_parcial(subida_id)
+
+    @action(detail=True, methods=["put", "patch"], url_path="fragmento")
+    def fragmento(self, request, id=None):
+        """
+        Escribe el cuerpo crudo de la petición en el offset indicado. El
+        fragmento se lee por bloques (sin cargarlo en memoria) y solo se
+        confirma si su SHA-256 coincide con la cabecera Upload-Checksum.
+        """
+        subida = self.get_object()
+        try:
+            offset = int(request.headers["Upload-Offset"])
+            longitud = int(request.headers["Content-Length"])
+        except (KeyError, ValueError):
+            return _error("Se requieren las cabeceras Upload-Offset y Content-Length.")
+        esperado = _checksum(request)
+        if esperado is None:
+            return _error("Se requiere la cabecera Upload-Checksum: sha256 <hex>.")
+
+        if offset != subida.recibido:
+            # El cliente debe reanudar desde lo ya confirmado
+            return _error(
+                "Offset incorrecto.",
+                status.HTTP_409_CONFLICT,
+                recibido=subida.recibido,
+            )
+        if not 0 < longitud <= tamano_fragmento_maximo():
+            return _error(
+                f"El fragmento debe tener entre 1 y {tamano_fragmento_maximo()} bytes."
+            )
+        if offset + longitud > subida.tamano_total:
+            return _error("El fragmento excede el tamaño declarado.")
+
+        # El cuerpo se recibe en un archivo propio de esta petición; solo se
+        # copia al .part después de confirmar el offset con la fila bloqueada
+        temporal = directorio_subidas() / f"{subida.id}.{uuid.uuid4().hex}.frag"
+        try:
+            sha = hashlib.sha256()
+            escritos = 0
+            with open(temporal, "wb") as destino:
+                while escritos < longitud:
+                    bloque = request.stream.read(
+                        min(TAMANO_LECTURA, longitud - escritos)
+                    )
+                    if not bloque:
+                        break
+                    destino.write(bloque)
+                    sha.update(bloque)
+                    escritos += len(bloque)
+            if escritos != longitud or sha.hexdigest() != esperado:
+                # Fragmento incompleto o corrupto: se descarta
+                return _error(
+                    "El fragmento llegó incompleto o su checksum no coincide.",
+                    recibido=subida.recibido,
+                )
+
+            # select_for_update (o BEGIN IMMEDIATE en SQLite) serializa los
+            # fragmentos de la subida: dos PUT al mismo offset no pueden
+            # escribir el .part a la vez
+            with transaction.atomic():
+                recibido = (
+                    SubidaImagen.objects.select_for_update()
+                    .filter(id=subida.id)
+                    .values_list("recibido", flat=True)
+                    .first()
+                )
+                if recibido is None:
+                    return _error("La subida ya no existe.", status.HTTP_404_NOT_FOUND)
+                if recibido != offset:
+                    return _error(
+                        "Offset incorrecto.",
+                        status.HTTP_409_CONFLICT,
+                        recibido=recibido,
+                    )
+                with open(ruta_parcial(subida.id), "r+b") as parcial, open(
+                    temporal, "rb"
+                ) as origen:
+                    parcial.seek(offset)
+                    shutil.copyfileobj(origen, parcial, TAMANO_LECTURA)
+                    parcial.truncate(offset + longitud)
+                SubidaImagen.objects.filter(id=subida.id).update(
+                    recibido=offset + longitud, fecha_actualizacion=timezone.now()
+                )
+        finally:
+            temporal.unlink(missing_ok=True)
+        return Response(
+            {"recibido": offset + longitud, "tamano_total": subida.tamano_total},
+            headers={"Upload-Offset": str(offset + longitud)},
+        )
+
+    @action(detail=True, methods=["post"], url_path="finalizar")
+    def finalizar(self, request, id=None):
+        subida = self.get_object()
+        subida_id = subida.id
+        if subida.recibido != subida.tamano_total:
+            return _error(
+                "La subida no está completa.",
+                status.HTTP_409_CONFLICT,
+                recibido=subida.recibido,
+            )
+        ruta = ruta_parcial(subida_id)
+        if subida.sha256 and _sha256_archivo(ruta) != subida.sha256:
+            return _error("El SHA-256 del archivo completo no coincide.")
+        try:
+            with Image.open(ruta) as imagen:
+                imagen.verify()
+        except (UnidentifiedImageError, OSError):
+            return _error("El archivo no es una imagen válida.")
+
+        with transaction.atomic():
+            # Borrar la sesión primero evita crear la imagen dos veces si
+            # llegan dos peticiones de finalizar a la vez
+            borradas, _ = SubidaImagen.objects.filter(id=subida_id).delete()
+            if not borradas:
+                return _error("La subida ya fue finalizada.", status.HTTP_409_CONFLICT)
+            with open(ruta, "rb") as f:
+                nombre = default_storage.save(
+                    f"{PREFIJO_PENDIENTES}publicaciones/{Path(subida.nombre_archivo).name}",
+                    File(f),
+                )
+            imagen = ImagenPublicacion.objects.create(
+                publicacion_id=subida.publicacion_id, imagen=nombre
+            )
+            Publicacion.marcar_modificada(subida.publicacion_id)
+            encolar_al_confirmar(procesar_imagen_publicacion, imagen.pk, nombre)
+        borrar_parcial(subida_id)
+
+        serializer = ImagenPublicacionSerializer(
+            imagen, context=self.get_serializer_context()
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
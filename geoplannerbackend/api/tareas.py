@@ -0,0 +1,105 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_lock = threading.Lock()
+_pendientes = set()
+
+
+def _obtener_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, "TAREAS_MAX_HILOS", 2),
+                thread_name_prefix="geoplanner-tarea",
+            )
+        return _pool
+
+
+def _ejecutar(funcion, args, kwargs):
+    close_old_connections()
+    try:
+        return funcion(*args, **kwargs)
+    except Exception:
+        logger.exception("Error en la tarea en segundo plano %s", funcion.__name__)
+        raise
+    finally:
+        # Los hilos del pool no pasan por el ciclo de request de Django
+        connections.close_all()
+
+
+def encolar(funcion, *args, **kwargs):
+    """
+    Ejecuta `funcion` en el pool de hilos en segundo plano. Con
+    TAREAS_SINCRONAS = True (tests, scripts) se ejecuta en el momento.
+    """
+    if getattr(settings, "TAREAS_SINCRONAS", False):
+        return funcion(*args, **kwargs)
+    futuro = _obtener_pool().submit(_ejecutar, funcion, args, kwargs)
+    with _lock:
+        _pendientes.add(futuro)
+    futuro.add_done_callback(_terminada)
+    return futuro
+
+
+def _terminada(futuro):
+    with _lock:
+        _pendientes.discard(futuro)
+
+
+def esperar(timeout=None):
+    """Espera a que terminen las tareas encoladas (comandos de benchmark, tests)."""
+    with _lock:
+        futuros = list(_pendientes)
+    wait(futuros, timeout=timeout)
+
+
+def encolar_al_confirmar(funcion, *args, **kwargs):
+    """Encola la tarea cuando la transacción actual se confirme."""
+    transaction.on_commit(lambda: encolar(funcion, *args, **kwargs))
+
+
+_periodicas = {}
+
+
+def programar(funcion, intervalo, nombre=None):
+    """
+    Ejecuta `funcion` cada `intervalo` segundos en un hilo daemon del proceso
+    (la primera vez tras el primer intervalo). Volver a programar el mismo
+    nombre no crea otro hilo. Devuelve el Event que la detiene.
+    """
+    nombre = nombre or funcion.__name__
+    with _lock:
+        if nombre in _periodicas:
+            return _periodicas[nombre]
+        detener = _periodicas[nombre] = threading.Event()
+    threading.Thread(
+        target=_repetir,
+        args=(funcion, intervalo, detener),
+        name=f"geoplanner-{nombre}",
+        daemon=True,
+    ).start()
+    return detener
+
+
+def _repetir(funcion, intervalo, detener):
+    while not detener.wait(intervalo):
+        try:
+            _ejecutar(funcion, (), {})
+        except Exception:
+            pass  # Ya registrado en _ejecutar; se reintenta en el siguiente ciclo
+
+
+def detener_programadas():
+    with _lock:
+        eventos = list(_periodicas.values())
+        _periodicas.clear()
+    for detener in eventos:
+        detener.set()
@@ -0,0 +1,163 @@
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Abs, Exp, Greatest, Least, Ln
+from django.utils import timezone
+
+# El puntaje de tendencia se guarda en espacio logarítmico:
+#   tendencia = ln(Σ peso_i · e^(λ·t_i))   con t_i en horas desde EPOCA
+# Como todas las publicaciones decaen al mismo ritmo (e^(-λ·ahora)), ordenar por
+# la columna equivale a ordenar por el puntaje decaído actual, sin recalcular
+# nada al leer. Cada interacción suma su término con un UPDATE atómico.
+EPOCA = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+PESO_PUBLICACION = 1.0  # punto de partida: las nuevas compiten desde el inicio
+PESO_LIKE = 1.0
+PESO_COMENTARIO = 2.0
+PESO_INSCRIPCION = 3.0
+
+# Al restar más de lo acumulado (por ejemplo tras mucho decaimiento) el
+# puntaje no puede ser ln(0): queda en ln(MINIMO) sobre el valor anterior
+MINIMO = 1e-9
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def vida_media_horas():
+    return getattr(settings, "TENDENCIAS_VIDA_MEDIA_HORAS", 24)
+
+
+def precision_region():
+    return getattr(settings, "TENDENCIAS_PRECISION_GEOHASH", 5)
+
+
+def tasa_decaimiento():
+    return math.log(2) / vida_media_horas()
+
+
+def _horas(fecha):
+    return (fecha - EPOCA).total_seconds() / 3600
+
+
+def termino(peso, fecha=None):
+    """ln(peso) + λ·t: aporte de una interacción de `peso` ocurrida en `fecha`."""
+    return math.log(peso) + tasa_decaimiento() * _horas(fecha or timezone.now())
+
+
+def tendencia_inicial():
+    # Default del campo: también se aplica en bulk_create (importar_eventos)
+    return termino(PESO_PUBLICACION)
+
+
+def puntaje_actual(tendencia, ahora=None):
+    """Interacciones ponderadas equivalentes a día de hoy (para mostrar)."""
+    return math.exp(tendencia - tasa_decaimiento() * _horas(ahora or timezone.now()))
+
+
+def peso_vigente(peso, fecha):
+    """
+    Peso que hoy equivale a una interacción de `peso` ocurrida en `fecha`:
+    restar(peso_vigente(p, f)) deshace el mismo término que restar(p, f), y
+    a diferencia de este se puede acumular con otros en api.escrituras.
+    """
+    return math.exp(termino(peso, fecha) - termino(1))
+
+
+def sumar(peso):
+    """
+    Expresión para .update(tendencia=sumar(PESO_LIKE)): log-sum-exp estable
+    max(a, b) + ln(1 + e^-|a - b|), evaluado por la base de datos.
+    """
+    actual = F("tendencia")
+    nuevo = Value(termino(peso), output_field=FloatField())
+    return Greatest(actual, nuevo) + Ln(1 + Exp(-Abs(actual - nuevo)))
+
+
+def restar(peso, fecha=None):
+    """
+    Inversa de sumar() al deshacer una interacción: a + ln(1 - e^(b - a)).
+    `fecha` es la de la interacción original: restar el término de ahora a
+    una interacción antigua descontaría de más.
+    """
+    actual = F("tendencia")
+    nuevo = Value(termino(peso, fecha), output_field=FloatField())
+    return actual + Ln(Greatest(1 - Exp(Least(nuevo - actual, 0.0)), MINIMO))
+
+
+def geohash(latitud, longitud, precision=None):
+    """Codifica una coordenada como geohash (celdas de ~5 km con precisión 5)."""
+    precision = precision or precision_region()
+    rangos = [[-90.0, 90.0], [-180.0, 180.0]]
+    valores = (float(latitud), float(longitud))
+    caracteres, bits, valor, eje = [], 0, 0, 1  # se empieza por la longitud
+    while len(caracteres) < precision:
+        rango = rangos[eje]
+        medio = (rango[0] + rango[1]) / 2
+        valor <<= 1
+        if valores[eje] >= medio:
+            valor |= 1
+            rango[0] = medio
+        else:
+            rango[1] = medio
+        eje ^= 1
+        bits += 1
+        if bits == 5:
+            caracteres.append(_BASE32[valor])
+            bits = valor = 0
+    return "".join(caracteres)
+
+
+def es_geohash(texto):
+    return 0 < len(texto) <= 12 and all(c in _BASE32 for c in texto.lower())
+
+
+def filtro_region(region):
+    """
+    Filtro de Publicacion para una región geohash. Con la precisión guardada
+    es una igualdad (recorrido del índice region/-tendencia); un prefijo más
+    corto abarca varias celdas y requiere ordenar las publicaciones de esas celdas.
+    """
+    region = region.lower()
+    if len(region) >= precision_region():
+        return {"region": region[: precision_region()]}
+    return {"region__startswith": region}
+
+
+def region_publicacion(publicacion_id):
+    """Región de la primera ubicación de la publicación ("" si no tiene)."""
+    from django.contrib.contenttypes.models import ContentType
+
+    from .models import Publicacion, UbicacionEvento
+
+    ubicacion = (
+        UbicacionEvento.objects.filter(
+            content_type=ContentType.objects.get_for_model(Publicacion),
+            object_id=publicacion_id,
+        )
+        .order_by("id")
+        .values("latitud", "longitud")
+        .first()
+    )
+    if ubicacion is None:
+        return ""
+    return geohash(ubicacion["latitud"], ubicacion["longitud"])
+
+
+def mas_tendencia(limite=20, region=None):
+    """
+    [(id, version, tendencia)] de las publicaciones públicas vigentes con más
+    tendencia. Lee las primeras `limite` entradas del índice parcial, sin
+    importar el tamaño de la tabla.
+    """
+    from .models import Publicacion
+
+    publicaciones = Publicacion.objects.filter(privacidad="PUB", estado="VIG")
+    if region:
+        publicaciones = publicaciones.filter(**filtro_region(region))
+    return list(
+        publicaciones.order_by("-tendencia").values_list("id", "version", "tendencia")[
+            :limite
+        ]
+    )
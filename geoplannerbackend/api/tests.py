@@ -1,3 +1,1784 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import hashlib
+import itertools
+import json
+import logging
+import shutil
+import tempfile
+import threading
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+from urllib.parse import urlsplit
 
-# Create your tests here.
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve
+from django.utils import timezone
+from PIL import Image
+
+from .models import (
+    ActividadeAgenda,
+    ComentarioPublicacion,
+    Conversacion,
+    EntradaTimeline,
+    ImagenPublicacion,
+    Inscripciones,
+    LikePublicacion,
+    Publicacion,
+    RegistroEliminacion,
+    RespuestaIdempotente,
+    Seguimiento,
+    SubidaImagen,
+    UbicacionEvento,
+    Usuario,
+)
+from . import cache_publicaciones, limites, tendencias
+from .calendario import calendario_usuario
+from .escrituras import ColaEscrituras
+from .eventos import finalizar_eventos
+from .idempotencia import purgar_expiradas
+from .management.commands.importar_eventos import TAMANO_LECTURA, features_geojson
+from .imagenes import PREFIJO_PENDIENTES, procesar_imagen_publicacion
+from .middleware import elegir_codificacion
+from .notificaciones import (
+    BackendMemoria,
+    Suscripcion,
+    canal_publicacion,
+    canal_usuario,
+)
+from .presupuesto import (
+    PresupuestoExcedido,
+    VerificarConsultas,
+    forma_sql,
+    presupuesto_de,
+)
+from .purga import (
+    marcar_publicacion,
+    marcar_usuario,
+    purgar_publicaciones,
+    purgar_usuario,
+)
+from .routers import ESCRITURA, LECTURA, LecturaMiddleware, LecturaRouter, leer_de
+from .serializers import crear_ubicaciones
+from .subidas import SubidaImagenViewSet, ruta_parcial
+from .timeline import clave_construido, construir_timeline
+from .visibilidad import amigos_de
+from .websocket import aplicacion_websocket
+
+logger = logging.getLogger(__name__)
+
+LATITUD, LONGITUD = 10.6427, -71.6125
+
+
+def crear_usuario(nombre):
+    return Usuario.objects.create(
+        nombre_usuario=nombre,
+        email=f"{nombre}@geoplanner.test",
+        password_hash="clave",
+        nombre=nombre,
+        apellido="Prueba",
+        fecha_nacimiento=date(2000, 1, 1),
+    )
+
+
+def crear_publicacion(usuario, **campos):
+    return Publicacion.objects.create(
+        **{
+            "id_usuario": usuario,
+            "titulo": "Evento",
+            "descripcion": "Descripción",
+            "categoria": "OTRO",
+            "estado": "VIG",
+            "terminos_condiciones": "-",
+            "capacidad_maxima": 50,
+            "fecha_evento": timezone.now() + timedelta(days=3),
+            **campos,
+        }
+    )
+
+
+class VerificarConsultasTests(TestCase):
+    def test_forma_sql_ignora_valores(self):
+        self.assertEqual(
+            forma_sql("SELECT * FROM t WHERE id = %s AND n > 3 AND x IN (%s, %s)"),
+            forma_sql("SELECT * FROM t WHERE id = %s AND n > 10 AND x IN (%s)"),
+        )
+        self.assertNotEqual(
+            forma_sql("SELECT * FROM api_usuario WHERE id = %s"),
+            forma_sql("SELECT * FROM api_publicacion WHERE id = %s"),
+        )
+
+    def test_falla_al_pasarse_del_maximo(self):
+        with self.assertRaises(PresupuestoExcedido):
+            with VerificarConsultas(maximo=1):
+                Usuario.objects.count()
+                Publicacion.objects.count()
+
+    def test_detecta_n_mas_1(self):
+        usuarios = [crear_usuario(f"u{i}") for i in range(5)]
+        with self.assertRaisesMessage(PresupuestoExcedido, "N+1"):
+            with VerificarConsultas():
+                for usuario in usuarios:
+                    Usuario.objects.filter(id=usuario.id).exists()
+
+    def test_presupuesto_por_accion(self):
+        vista = resolve("/publicaciones/").func
+        self.assertIsNotNone(presupuesto_de(vista, "GET"))
+        self.assertIsNotNone(presupuesto_de(resolve("/estadisticas/").func, "GET"))
+
+
+@override_settings(METRICAS_TOKEN="token-pruebas")
+class PresupuestoEndpointsTests(TestCase):
+    """
+    Cada endpoint público declara su presupuesto de consultas; aquí se
+    verifica que lo cumple y que el número de consultas no crece al
+    multiplicar los datos (likes, comentarios, amigos, publicaciones...).
+    """
+
+    def setUp(self):
+        self.yo = crear_usuario("yo")
+        self.creados = 0
+        self.crear_datos(2)
+        self.publicacion = Publicacion.objects.filter(privacidad="PUB").first()
+
+    def crear_datos(self, cantidad):
+        tipo = ContentType.objects.get_for_model(Publicacion)
+        tipo_actividad = ContentType.objects.get_for_model(ActividadeAgenda)
+        for _ in range(cantidad):
+            self.creados += 1
+            amigo = crear_usuario(f"amigo{self.creados}")
+            Seguimiento.objects.create(seguidor=self.yo, seguido=amigo)
+            Seguimiento.objects.create(seguidor=amigo, seguido=self.yo)
+            for privacidad in ("PUB", "AMI"):
+                publicacion = Publicacion.objects.create(
+                    id_usuario=amigo,
+                    titulo="Evento",
+                    descripcion="Descripción",
+                    categoria="OTRO",
+                    privacidad=privacidad,
+                    estado="VIG",
+                    terminos_condiciones="-",
+                    capacidad_maxima=50,
+                    fecha_evento=timezone.now() + timedelta(days=3),
+                    region="d6nyd",
+                )
+                UbicacionEvento.objects.create(
+                    content_type=tipo,
+                    object_id=publicacion.id,
+                    latitud=LATITUD,
+                    longitud=LONGITUD,
+                )
+                ImagenPublicacion.objects.create(
+                    publicacion=publicacion, imagen="publicaciones/prueba.jpg"
+                )
+                for usuario in (self.yo, amigo):
+                    LikePublicacion.objects.create(
+                        id_usuario=usuario, id_publicacion=publicacion
+                    )
+                    ComentarioPublicacion.objects.create(
+                        id_usuario=usuario, id_publicacion=publicacion, texto="Hola"
+                    )
+                Inscripciones.objects.create(
+                    id_usuario=self.yo, id_publicacion=publicacion
+                )
+            actividad = ActividadeAgenda.objects.create(
+                id_usuario=self.yo,
+                titulo="Actividad",
+                descripcion="-",
+                fecha_activiad=date.today(),
+            )
+            UbicacionEvento.objects.create(
+                content_type=tipo_actividad,
+                object_id=actividad.id,
+                latitud=LATITUD,
+                longitud=LONGITUD,
+            )
+            Conversacion.objects.create(
+                usuario=self.yo, remitente="usuario", mensaje="Hola"
+            )
+
+    def consultas(self, metodo, url, **kwargs):
+        # Caches vacías: se mide el peor caso (sin fragmentos ni amigos)
+        for alias in caches:
+            caches[alias].clear()
+        maximo = presupuesto_de(resolve(urlsplit(url).path).func, metodo)
+        self.assertIsNotNone(maximo, f"{metodo} {url} no declara presupuesto")
+        with VerificarConsultas(maximo) as verificacion:
+            respuesta = getattr(self.client, metodo.lower())(url, **kwargs)
+            if respuesta.streaming:
+                b"".join(respuesta.streaming_content)
+        self.assertLess(respuesta.status_code, 400, f"{metodo} {url}")
+        logger.debug("%s %s: %s/%s consultas", metodo, url, verificacion.total, maximo)
+        return verificacion.total
+
+    def assertConstante(self, url, metodo="GET", preparar=None, **kwargs):
+        """Mismo número de consultas con 2 y con 12 filas por tabla."""
+        if preparar is not None:
+            preparar()
+        antes = self.consultas(metodo, url, **kwargs)
+        self.crear_datos(10)
+        if preparar is not None:
+            preparar()
+        despues = self.consultas(metodo, url, **kwargs)
+        self.assertEqual(
+            antes, despues, f"{metodo} {url}: {antes} consultas -> {despues}"
+        )
+
+    def test_usuarios(self):
+        self.assertConstante("/usuarios/")
+        self.assertConstante(f"/usuarios/{self.yo.id}/")
+
+    def test_actividades(self):
+        self.assertConstante(f"/actividades/?usuario={self.yo.id}")
+        self.assertConstante(
+            f"/actividades/itinerario/?usuario={self.yo.id}&fecha={date.today()}"
+        )
+
+    def test_publicaciones(self):
+        self.assertConstante(f"/publicaciones/?usuario_id={self.yo.id}")
+        self.assertConstante(
+            f"/publicaciones/{self.publicacion.id}/?usuario_id={self.yo.id}"
+        )
+
+    def test_publicaciones_para_ti(self):
+        def reconstruir():
+            EntradaTimeline.objects.filter(usuario=self.yo).delete()
+            construir_timeline(self.yo)
+
+        self.assertConstante(
+            f"/publicaciones/para-ti/?usuario_id={self.yo.id}", preparar=reconstruir
+        )
+        # Primera visita: el timeline se construye dentro de la petición
+        EntradaTimeline.objects.filter(usuario=self.yo).delete()
+        caches["default"].delete(clave_construido(self.yo.id))
+        self.consultas("GET", f"/publicaciones/para-ti/?usuario_id={self.yo.id}")
+
+    def test_publicaciones_cercanas(self):
+        self.assertConstante(
+            f"/publicaciones/cercanas/?lat={LATITUD}&lon={LONGITUD}"
+            f"&usuario_id={self.yo.id}"
+        )
+
+    def test_publicaciones_tendencias(self):
+        self.assertConstante("/publicaciones/tendencias/?region=d6nyd")
+
+    def test_ubicaciones(self):
+        self.assertConstante("/ubicaciones/")
+
+    def test_inscripciones(self):
+        self.assertConstante("/inscripciones/")
+
+    def test_likes_y_comentarios(self):
+        self.assertConstante("/likes/")
+        self.assertConstante("/comentarios/")
+
+    def test_imagenes(self):
+        self.assertConstante("/imagenes/")
+
+    def test_seguimientos(self):
+        self.assertConstante(f"/seguimientos/?seguido={self.yo.id}")
+        self.assertConstante(f"/seguimientos/amigos/?usuario={self.yo.id}")
+
+    def test_sincronizacion(self):
+        self.assertConstante(f"/sync/?usuario_id={self.yo.id}")
+
+    def test_calendario(self):
+        self.assertConstante(f"/calendario/{self.yo.id}.ics")
+
+    @mock.patch("api.views.obtener_direccion", lambda lat, lon: f"{lat}, {lon}")
+    def test_estadisticas(self):
+        self.assertConstante("/estadisticas/")
+
+    def test_metricas(self):
+        self.assertConstante("/metricas/", HTTP_AUTHORIZATION="Bearer token-pruebas")
+
+    def test_login(self):
+        self.assertConstante(
+            "/login/",
+            "POST",
+            data={"nombre_usuario": "yo", "password": "clave"},
+            content_type="application/json",
+        )
+
+    def test_dar_like_y_comentar(self):
+        datos = {
+            "id_usuario": str(self.yo.id),
+            "id_publicacion": str(self.publicacion.id),
+        }
+
+        def quitar_like():
+            LikePublicacion.objects.filter(
+                id_usuario=self.yo, id_publicacion=self.publicacion
+            ).delete()
+
+        self.assertConstante(
+            "/likes/",
+            "POST",
+            preparar=quitar_like,
+            data=datos,
+            content_type="application/json",
+        )
+        self.assertConstante(
+            "/comentarios/",
+            "POST",
+            data={**datos, "texto": "Nos vemos"},
+            content_type="application/json",
+        )
+
+    def test_seguir(self):
+        seguidor = crear_usuario("nuevo")
+
+        def dejar_de_seguir():
+            Seguimiento.objects.filter(seguidor=seguidor).delete()
+
+        self.assertConstante(
+            "/seguimientos/",
+            "POST",
+            preparar=dejar_de_seguir,
+            data={"seguidor": str(seguidor.id), "seguido": str(self.yo.id)},
+            content_type="application/json",
+        )
+
+
+@override_settings(LECTURA_STICKY_SEGUNDOS=5)
+class LecturaRouterTests(SimpleTestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.router = LecturaRouter()
+        self.factory = RequestFactory()
+
+    def peticion(self, metodo="get", ip="10.0.0.1", escribir=False):
+        """Hace la petición y devuelve a qué alias fueron sus lecturas."""
+        destinos = []
+
+        def vista(request):
+            destinos.append(self.router.db_for_read(Usuario))
+            if escribir:
+                self.router.db_for_write(Usuario)
+                destinos.append(self.router.db_for_read(Usuario))
+            return HttpResponse()
+
+        request = getattr(self.factory, metodo)("/", REMOTE_ADDR=ip)
+        LecturaMiddleware(vista)(request)
+        return destinos
+
+    def test_fuera_de_peticion_lee_de_default(self):
+        self.assertEqual(self.router.db_for_read(Usuario), ESCRITURA)
+        self.assertEqual(self.router.db_for_write(Usuario), ESCRITURA)
+
+    def test_get_lee_de_la_replica(self):
+        self.assertEqual(self.peticion(), [LECTURA])
+        self.assertEqual(self.peticion("head"), [LECTURA])
+
+    def test_escrituras_leen_de_default(self):
+        for metodo in ("post", "put", "patch", "delete"):
+            self.assertEqual(self.peticion(metodo, ip=metodo), [ESCRITURA])
+
+    def test_tras_escribir_se_lee_de_default(self):
+        self.assertEqual(self.peticion(escribir=True), [LECTURA, ESCRITURA])
+
+    def test_read_your_writes(self):
+        self.peticion("post")
+        self.assertEqual(self.peticion(), [ESCRITURA])
+        # Otro cliente sigue leyendo de la réplica
+        self.assertEqual(self.peticion(ip="10.0.0.2"), [LECTURA])
+
+    def test_get_que_escribe_tambien_fija_al_cliente(self):
+        self.peticion(escribir=True)
+        self.assertEqual(self.peticion(), [ESCRITURA])
+
+    @override_settings(LECTURA_STICKY_SEGUNDOS=0)
+    def test_sin_ventana(self):
+        self.peticion("post")
+        self.assertEqual(self.peticion(), [LECTURA])
+
+    def test_ventana_expira(self):
+        with mock.patch("django.core.cache.backends.locmem.time.time") as reloj:
+            reloj.return_value = 1000
+            self.peticion("post")
+            reloj.return_value = 1004
+            self.assertEqual(self.peticion(), [ESCRITURA])
+            reloj.return_value = 1006
+            self.assertEqual(self.peticion(), [LECTURA])
+
+    def test_transaccion_lee_de_default(self):
+        with leer_de(LECTURA):
+            with mock.patch.object(connections[ESCRITURA], "in_atomic_block", True):
+                self.assertEqual(self.router.db_for_read(Usuario), ESCRITURA)
+            self.assertEqual(self.router.db_for_read(Usuario), LECTURA)
+
+    def test_el_contexto_no_escapa_de_la_peticion(self):
+        self.peticion()
+        self.assertEqual(self.router.db_for_read(Usuario), ESCRITURA)
+
+    def test_migraciones_solo_en_default(self):
+        self.assertTrue(self.router.allow_migrate(ESCRITURA, "api"))
+        self.assertFalse(self.router.allow_migrate(LECTURA, "api"))
+
+
+@override_settings(
+    LIMITES_ACTIVOS=True,
+    LIMITES_CACHE_ALIAS="default",
+    LIMITES_CUBETAS={"ip": (10, 0.1), "usuario": (2, 0.01)},
+)
+class LimitesTests(TestCase):
+    def setUp(self):
+        limites.reiniciar()
+        self.yo = crear_usuario("yo")
+        self.publicaciones = [
+            Publicacion.objects.create(
+                id_usuario=self.yo,
+                titulo=f"Evento {i}",
+                descripcion="-",
+                terminos_condiciones="-",
+                capacidad_maxima=10,
+                fecha_evento=timezone.now() + timedelta(days=1),
+            )
+            for i in range(3)
+        ]
+
+    def tearDown(self):
+        limites.reiniciar()
+
+    def test_cubeta(self):
+        estado, espera = limites.cubeta(None, 100.0, 4, capacidad=5, tasa=1)
+        self.assertEqual((estado, espera), ((1, 100.0), 0))
+        # Sin tokens suficientes: cuánto falta para tener el costo
+        estado, espera = limites.cubeta(estado, 100.5, 4, capacidad=5, tasa=1)
+        self.assertEqual((estado, espera), ((1.5, 100.5), 2.5))
+        # Se rellena con el tiempo sin pasar de la capacidad
+        estado, espera = limites.cubeta(estado, 200.0, 0, capacidad=5, tasa=1)
+        self.assertEqual(estado, (5, 200.0))
+
+    def test_almacen_cache(self):
+        almacen = limites.AlmacenCache(caches["default"])
+        esperas = [limites.consumir("prueba", 1, 3, 0.01, almacen) for _ in range(4)]
+        self.assertEqual(esperas[:3], [0, 0, 0])
+        self.assertGreater(esperas[3], 0)
+        self.assertIsNone(caches["default"].get("prueba:lock"))
+
+    def test_login_limitado_por_ip_con_retry_after(self):
+        datos = {"nombre_usuario": "yo", "password": "clave"}
+        for _ in range(2):
+            respuesta = self.client.post(
+                "/login/", datos, content_type="application/json"
+            )
+            self.assertEqual(respuesta.status_code, 200)
+        respuesta = self.client.post("/login/", datos, content_type="application/json")
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertEqual(respuesta["Retry-After"], "50")
+        # Otra IP tiene su propia cubeta
+        respuesta = self.client.post(
+            "/login/", datos, content_type="application/json", REMOTE_ADDR="10.0.0.9"
+        )
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_likes_limitados_por_usuario_desde_cualquier_ip(self):
+        estados = [
+            self.client.post(
+                "/likes/",
+                {"id_usuario": str(self.yo.id), "id_publicacion": str(p.id)},
+                content_type="application/json",
+                REMOTE_ADDR=f"10.0.0.{i}",
+            ).status_code
+            for i, p in enumerate(self.publicaciones)
+        ]
+        self.assertEqual(estados, [201, 201, 429])
+
+    def test_rechazo_devuelve_tokens_de_las_otras_cubetas(self):
+        for publicacion in self.publicaciones:
+            self.client.post(
+                "/likes/",
+                {"id_usuario": str(self.yo.id), "id_publicacion": str(publicacion.id)},
+                content_type="application/json",
+            )
+        # 2 likes permitidos y uno rechazado por usuario: la IP gastó 2
+        espera = limites.consumir("limite:ip:127.0.0.1", 8, 10, 0.1)
+        self.assertEqual(espera, 0)
+
+    @override_settings(LIMITES_CUBETAS={"usuario": (15, 0.01)})
+    @mock.patch("api.views.requests.post")
+    def test_chatbot_cuesta_mas(self, post):
+        post.return_value.json.return_value = {
+            "candidates": [{"content": {"parts": [{"text": "Hola"}]}}]
+        }
+        estados = [
+            self.client.post(
+                "/chatbot/",
+                {"usuario_id": str(self.yo.id), "mensaje": "Hola"},
+                content_type="application/json",
+            ).status_code
+            for _ in range(2)
+        ]
+        self.assertEqual(estados[1], 429)
+        self.assertEqual(post.call_count, 1)
+
+    def test_vistas_sin_costo_no_se_limitan(self):
+        for _ in range(20):
+            self.assertEqual(self.client.get("/usuarios/").status_code, 200)
+
+
+class IdempotenciaTests(TestCase):
+    def setUp(self):
+        self.yo = crear_usuario("yo")
+        self.publicacion = Publicacion.objects.create(
+            id_usuario=self.yo,
+            titulo="Evento",
+            descripcion="-",
+            terminos_condiciones="-",
+            capacidad_maxima=10,
+            fecha_evento=timezone.now() + timedelta(days=1),
+        )
+
+    def comentar(self, texto="Hola", clave="clave-1", usuario=None):
+        return self.client.post(
+            "/comentarios/",
+            {
+                "id_usuario": str((usuario or self.yo).id),
+                "id_publicacion": str(self.publicacion.id),
+                "texto": texto,
+            },
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY=clave,
+        )
+
+    def test_reintento_repite_la_respuesta_con_una_consulta(self):
+        primera = self.comentar()
+        self.assertEqual(primera.status_code, 201)
+        with self.assertNumQueries(1):
+            reintento = self.comentar()
+        self.assertEqual(reintento.status_code, 201)
+        self.assertEqual(reintento["Idempotent-Replayed"], "true")
+        self.assertEqual(reintento.json(), primera.json())
+        self.assertEqual(ComentarioPublicacion.objects.count(), 1)
+        self.publicacion.refresh_from_db()
+        self.assertEqual(self.publicacion.comentarios, 1)
+
+    def test_misma_clave_con_otra_peticion(self):
+        self.comentar()
+        self.assertEqual(self.comentar(texto="Otro").status_code, 422)
+        self.assertEqual(ComentarioPublicacion.objects.count(), 1)
+
+    def test_claves_por_usuario(self):
+        self.comentar()
+        self.assertEqual(self.comentar(usuario=crear_usuario("otro")).status_code, 201)
+        self.assertEqual(ComentarioPublicacion.objects.count(), 2)
+
+    def test_sin_cabecera_no_se_guarda(self):
+        for _ in range(2):
+            self.comentar(clave="")
+        self.assertEqual(ComentarioPublicacion.objects.count(), 2)
+        self.assertFalse(RespuestaIdempotente.objects.exists())
+
+    def test_clave_vencida_se_vuelve_a_ejecutar(self):
+        self.comentar()
+        RespuestaIdempotente.objects.update(expira=timezone.now())
+        self.assertNotIn("Idempotent-Replayed", self.comentar())
+        self.assertEqual(ComentarioPublicacion.objects.count(), 2)
+
+    @override_settings(IDEMPOTENCIA_ESPERA=5)
+    def test_duplicado_concurrente_espera_a_la_original(self):
+        primera = self.comentar()
+        # La original sigue en curso hasta la primera espera del duplicado
+        RespuestaIdempotente.objects.update(codigo=None)
+
+        def terminar(segundos):
+            RespuestaIdempotente.objects.update(codigo=201)
+
+        with mock.patch("api.idempotencia.time.sleep", side_effect=terminar) as sleep:
+            reintento = self.comentar()
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(reintento.json(), primera.json())
+        self.assertEqual(ComentarioPublicacion.objects.count(), 1)
+
+    def test_original_en_curso(self):
+        self.comentar()
+        RespuestaIdempotente.objects.update(codigo=None)
+        # La espera del duplicado se agota sin que la original termine
+        with mock.patch(
+            "api.idempotencia.time.monotonic", side_effect=itertools.count(0, 100)
+        ):
+            self.assertEqual(self.comentar().status_code, 409)
+
+    def test_reserva_abandonada_libera_la_clave(self):
+        self.comentar()
+        RespuestaIdempotente.objects.update(
+            codigo=None, fecha_creacion=timezone.now() - timedelta(seconds=31)
+        )
+        response = self.comentar()
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(RespuestaIdempotente.objects.get().codigo, 201)
+
+    @mock.patch("api.views.requests.post")
+    def test_chatbot_no_repite_la_llamada(self, post):
+        post.return_value.json.return_value = {
+            "candidates": [{"content": {"parts": [{"text": "Hola"}]}}]
+        }
+        for _ in range(2):
+            respuesta = self.client.post(
+                "/chatbot/",
+                {"usuario_id": str(self.yo.id), "mensaje": "Hola"},
+                content_type="application/json",
+                HTTP_IDEMPOTENCY_KEY="mensaje-1",
+            )
+            self.assertEqual(respuesta.json(), {"respuesta": "Hola"})
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(Conversacion.objects.count(), 2)
+
+    def test_limpieza(self):
+        self.comentar()
+        self.comentar(clave="clave-2")
+        RespuestaIdempotente.objects.filter(clave="clave-1").update(
+            expira=timezone.now()
+        )
+        self.assertEqual(purgar_expiradas(), 1)
+
+    def test_no_cuenta_para_el_presupuesto_de_la_vista(self):
+        with VerificarConsultas() as sin_clave:
+            self.comentar(clave="")
+        with VerificarConsultas() as con_clave:
+            self.comentar(texto="Otro")
+        self.assertEqual(sin_clave.total, con_clave.total)
+
+
+class SincronizacionTests(TestCase):
+    def setUp(self):
+        self.yo = crear_usuario("yo")
+        self.actividad = ActividadeAgenda.objects.create(
+            id_usuario=self.yo,
+            titulo="Actividad",
+            descripcion="-",
+            fecha_activiad=date.today(),
+        )
+
+    def sync(self, **params):
+        return self.client.get("/sync/", {"usuario_id": str(self.yo.id), **params})
+
+    def test_primera_sincronizacion_y_lapidas(self):
+        datos = self.sync(recursos="actividades").json()
+        self.assertEqual(len(datos["actividades"]["creados"]), 1)
+        cursor = datos["cursor"]
+        actividad_id = str(self.actividad.id)
+        self.actividad.delete()
+        datos = self.sync(recursos="actividades", cursor=cursor).json()
+        self.assertEqual(datos["actividades"]["creados"], [])
+        self.assertEqual(datos["actividades"]["eliminados"], [actividad_id])
+
+    def test_cursor_sin_zona_horaria(self):
+        respuesta = self.sync(cursor="2020-01-01T00:00:00", recursos="actividades")
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.json()["actividades"]["creados"]), 1)
+
+    def test_cursor_invalido(self):
+        for cursor in ("ayer", "2025-02-30T00:00:00"):
+            self.assertEqual(self.sync(cursor=cursor).status_code, 400)
+
+    def test_usuario_invalido(self):
+        respuesta = self.client.get("/sync/", {"usuario_id": "abc"})
+        self.assertEqual(respuesta.status_code, 404)
+
+    def test_recurso_desconocido(self):
+        self.assertEqual(self.sync(recursos="otros").status_code, 400)
+
+
+class ImportarEventosTests(TestCase):
+    def importar(self, nombre, contenido):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        ruta = Path(directorio) / nombre
+        ruta.write_text(contenido, encoding="utf-8")
+        salida, errores = StringIO(), StringIO()
+        call_command(
+            "importar_eventos", str(ruta), usuario="yo", stdout=salida, stderr=errores
+        )
+        return salida.getvalue(), errores.getvalue()
+
+    def setUp(self):
+        crear_usuario("yo")
+
+    def test_filas_invalidas_no_detienen_la_importacion(self):
+        salida, errores = self.importar(
+            "eventos.csv",
+            "id,titulo,fecha,lat,lon\n"
+            "1,A,2025-03-01,10,-71\n"
+            "2,B,2025-02-30,10,-71\n"
+            "3,C,2025-03-01,NaN,-71\n"
+            "4,D,2025-03-01,100,-71\n"
+            "5,,2025-03-01,10,-71\n"
+            "1,A,2025-03-01,10,-71\n",
+        )
+        self.assertIn("1 creadas, 1 duplicadas, 4 inválidas", salida)
+        self.assertIn("Fila 2: fecha_evento inválida", errores)
+        self.assertEqual(Publicacion.objects.get().id_externo, "1")
+
+    def test_geojson_reanudable(self):
+        features = [
+            {
+                "type": "Feature",
+                "id": i,
+                "geometry": {"type": "Point", "coordinates": [-71.6, 10.6]},
+                "properties": {"titulo": f"Evento {i}", "fecha": "2025-03-01"},
+            }
+            for i in range(3)
+        ]
+        features.append(
+            {"type": "Feature", "geometry": {"type": "Point", "coordinates": [1]}}
+        )
+        contenido = json.dumps({"type": "FeatureCollection", "features": features})
+        salida, _ = self.importar("eventos.geojson", contenido)
+        self.assertIn("3 creadas, 0 duplicadas, 1 inválidas", salida)
+        salida, _ = self.importar("eventos.geojson", contenido)
+        self.assertIn("0 creadas, 3 duplicadas", salida)
+        self.assertEqual(UbicacionEvento.objects.count(), 3)
+
+    def test_features_cortadas_entre_bloques(self):
+        features = [
+            {
+                "id": i,
+                "properties": {"titulo": "é\\u" * (i % 50), "valor": -1.25e-7 * i},
+                "geometry": {"coordinates": [True, None, 12345678901234567890]},
+            }
+            for i in range(2000)
+        ]
+        contenido = json.dumps({"features": features})
+        self.assertGreater(len(contenido), 3 * TAMANO_LECTURA)
+        self.assertEqual(list(features_geojson(StringIO(contenido))), features)
+
+    def test_feature_mal_formada_falla_sin_leer_todo(self):
+        validas = ",".join(json.dumps({"id": i}) for i in range(20000))
+        casos = (
+            ('{"features": [{"id": 1}, {"id" 2}, ' + validas + "]}", "feature 2"),
+            ('{"features": [{"id": "' + "x" * 500_000, "feature 1 supera"),
+        )
+        for contenido, mensaje in casos:
+            with self.subTest(mensaje=mensaje):
+                archivo = StringIO(contenido)
+                with self.assertRaisesMessage(CommandError, mensaje):
+                    list(features_geojson(archivo, max_feature=200_000))
+                self.assertLess(archivo.tell(), len(contenido))
+
+
+class ItinerarioTests(TestCase):
+    def setUp(self):
+        self.usuario = crear_usuario("viajero")
+        tipo = ContentType.objects.get_for_model(ActividadeAgenda)
+        for titulo, lat, lon in (("A", 0, 0), ("C", 0, 2), ("B", 0, 1)):
+            actividad = ActividadeAgenda.objects.create(
+                id_usuario=self.usuario,
+                titulo=titulo,
+                descripcion="",
+                fecha_activiad=date(2025, 3, 1),
+            )
+            UbicacionEvento.objects.create(
+                content_type=tipo, object_id=actividad.id, latitud=lat, longitud=lon
+            )
+
+    def itinerario(self, **params):
+        return self.client.get("/actividades/itinerario/", params)
+
+    def test_orden_de_menor_distancia(self):
+        response = self.itinerario(
+            usuario=self.usuario.id, fecha="2025-03-01", lat=0, lon=-1
+        )
+        self.assertEqual(response.status_code, 200)
+        titulos = [a["titulo"] for a in response.json()["recorrido"]]
+        self.assertEqual(titulos, ["A", "B", "C"])
+
+    def test_parametros_invalidos_responden_400(self):
+        for params in (
+            {"usuario": self.usuario.id, "fecha": "2025-02-30"},
+            {"usuario": self.usuario.id, "fecha": "marzo"},
+            {"usuario": "abc", "fecha": "2025-03-01"},
+            {"usuario": self.usuario.id, "fecha": "2025-03-01", "lat": "x", "lon": 1},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.itinerario(**params).status_code, 400)
+
+
+class BatchTests(TestCase):
+    def setUp(self):
+        self.usuario = crear_usuario("lotes")
+
+    def lote(self, subs, **opciones):
+        return self.client.post(
+            "/batch/", {"requests": subs, **opciones}, content_type="application/json"
+        )
+
+    def actividad(self, titulo):
+        return {
+            "method": "POST",
+            "path": "/actividades/",
+            "body": {
+                "id_usuario": str(self.usuario.id),
+                "titulo": titulo,
+                "descripcion": "Actividad",
+                "fecha_activiad": "2025-03-01",
+            },
+        }
+
+    def test_respuestas_en_orden(self):
+        response = self.lote(
+            [
+                self.actividad("A"),
+                {"method": "GET", "path": f"/actividades/?usuario={self.usuario.id}"},
+                {"path": "/no-existe/"},
+                {"path": "/actividades/", "headers": ["X-Uno"]},
+            ]
+        )
+        self.assertEqual(response.status_code, 200)
+        estados = [r["status"] for r in response.json()["responses"]]
+        self.assertEqual(estados, [201, 200, 404, 400])
+        self.assertEqual(response.json()["responses"][1]["body"][0]["titulo"], "A")
+
+    def test_atomico_revierte_si_una_falla(self):
+        invalida = self.actividad("B")
+        invalida["body"]["fecha_activiad"] = "2025-02-30"
+        response = self.lote([self.actividad("A"), invalida], atomic=True)
+        estados = [r["status"] for r in response.json()["responses"]]
+        self.assertEqual(estados, [424, 400])
+        self.assertFalse(ActividadeAgenda.objects.exists())
+
+    def test_excepcion_de_una_subpeticion_no_tumba_el_lote(self):
+        with mock.patch(
+            "api.views.ActividadAgendaViewSet.list", side_effect=RuntimeError
+        ), self.assertLogs("api.batch", "ERROR"):
+            response = self.lote(
+                [self.actividad("A"), {"path": "/actividades/"}], atomic=True
+            )
+        self.assertEqual(response.status_code, 200)
+        estados = [r["status"] for r in response.json()["responses"]]
+        self.assertEqual(estados, [424, 500])
+        self.assertFalse(ActividadeAgenda.objects.exists())
+
+    def test_cuerpo_que_no_es_objeto(self):
+        for cuerpo in ([self.actividad("A")], "lote", 3):
+            with self.subTest(cuerpo=cuerpo):
+                response = self.client.post(
+                    "/batch/", cuerpo, content_type="application/json"
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_subpeticiones_con_idempotency_key(self):
+        sub = {**self.actividad("A"), "headers": {"Idempotency-Key": "lote-1"}}
+        primera = self.lote([sub]).json()["responses"][0]
+        repetida = self.lote([sub]).json()["responses"][0]
+        self.assertEqual(repetida["status"], 201)
+        self.assertEqual(repetida["body"], primera["body"])
+        self.assertEqual(repetida["headers"]["Idempotent-Replayed"], "true")
+        self.assertEqual(ActividadeAgenda.objects.count(), 1)
+
+    @override_settings(LIMITES_CUBETAS={"ip": (10, 0.1)})
+    def test_subpeticiones_gastan_tokens_del_limite(self):
+        limites.reiniciar()
+        self.addCleanup(limites.reiniciar)
+        login = {
+            "method": "POST",
+            "path": "/login/",
+            "body": {"nombre_usuario": "lotes", "password": "clave"},
+        }
+        response = self.lote([login] * 3)
+        estados = [r["status"] for r in response.json()["responses"]]
+        self.assertEqual(estados, [200, 200, 429])
+
+
+class SubidasTests(TestCase):
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        ajustes = override_settings(SUBIDAS_DIRECTORIO=Path(directorio))
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        publicacion = crear_publicacion(crear_usuario("subidas"))
+        self.subida = self.client.post(
+            "/subidas/",
+            {
+                "publicacion": publicacion.id,
+                "nombre_archivo": "foto.jpg",
+                "tamano_total": 8,
+            },
+        ).json()
+
+    def enviar(self, offset, datos):
+        return self.client.put(
+            f"/subidas/{self.subida['id']}/fragmento/",
+            datos,
+            content_type="application/octet-stream",
+            headers={
+                "Upload-Offset": str(offset),
+                "Upload-Checksum": f"sha256 {hashlib.sha256(datos).hexdigest()}",
+            },
+        )
+
+    def test_fragmentos_y_reanudacion(self):
+        self.assertEqual(self.enviar(0, b"abcd").json()["recibido"], 4)
+        response = self.enviar(0, b"zzzz")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["recibido"], 4)
+        self.assertEqual(self.enviar(4, b"efgh").json()["recibido"], 8)
+        self.assertEqual(ruta_parcial(self.subida["id"]).read_bytes(), b"abcdefgh")
+
+    def test_fragmento_concurrente_no_escribe_el_archivo(self):
+        # El segundo PUT leyó la subida antes de que el primero la confirmara
+        vieja = SubidaImagen.objects.get(id=self.subida["id"])
+        self.enviar(0, b"abcd")
+        with mock.patch.object(SubidaImagenViewSet, "get_object", return_value=vieja):
+            response = self.enviar(0, b"zzzz")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(ruta_parcial(self.subida["id"]).read_bytes(), b"abcd")
+        self.assertEqual(
+            list(ruta_parcial(self.subida["id"]).parent.glob("*.frag")), []
+        )
+
+
+class CreacionMasivaTests(TestCase):
+    def setUp(self):
+        self.usuario = crear_usuario("masivo")
+        # El ContentType de las ubicaciones queda en la cache de Django
+        ContentType.objects.get_for_model(ActividadeAgenda)
+
+    def actividades(self, cantidad):
+        return [
+            {
+                "id_usuario": str(self.usuario.id),
+                "titulo": f"Actividad {i}",
+                "descripcion": "Actividad",
+                "fecha_activiad": "2025-03-01",
+                "ubicaciones": [{"latitud": LATITUD, "longitud": LONGITUD}],
+            }
+            for i in range(cantidad)
+        ]
+
+    def test_crea_todo_en_pocas_consultas(self):
+        with self.assertNumQueries(5):
+            response = self.client.post(
+                "/actividades/masivo/",
+                self.actividades(20),
+                content_type="application/json",
+            )
+        self.assertEqual(response.json()["creados"], 20)
+        self.assertEqual(UbicacionEvento.objects.count(), 20)
+
+    def test_region_de_la_primera_ubicacion_en_un_update(self):
+        ContentType.objects.get_for_model(Publicacion)
+        publicaciones = [crear_publicacion(self.usuario) for _ in range(3)]
+        pares = [
+            (
+                publicacion,
+                [
+                    {"latitud": 10 * i, "longitud": 10 * i}
+                    for i in range(indice, indice + 5)
+                ],
+            )
+            for indice, publicacion in enumerate(publicaciones)
+        ]
+        with self.assertNumQueries(2):
+            crear_ubicaciones(pares)
+        for indice, publicacion in enumerate(publicaciones):
+            publicacion.refresh_from_db()
+            esperada = tendencias.geohash(10 * indice, 10 * indice)
+            self.assertEqual(publicacion.region, esperada)
+            self.assertEqual(tendencias.region_publicacion(publicacion.id), esperada)
+
+    @override_settings(CREACION_MASIVA_MAX=3)
+    def test_limite_antes_de_validar(self):
+        with self.assertNumQueries(0):
+            response = self.client.post(
+                "/actividades/masivo/",
+                self.actividades(4),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Máximo 3", response.json()["non_field_errors"][0])
+
+
+class ImagenesPendientesTests(TestCase):
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        ajustes = override_settings(MEDIA_ROOT=directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.publicacion = crear_publicacion(crear_usuario("fotos"), privacidad="PUB")
+
+    def subir(self, contenido):
+        return ImagenPublicacion.objects.create(
+            publicacion=self.publicacion, imagen=ContentFile(contenido, "foto.jpg")
+        )
+
+    def jpeg_con_exif(self):
+        exif = Image.Exif()
+        exif[0x010F] = "Camara"
+        buffer = BytesIO()
+        Image.new("RGB", (40, 30), "red").save(buffer, "JPEG", exif=exif)
+        return buffer.getvalue()
+
+    def test_original_no_se_sirve_hasta_quitar_exif(self):
+        imagen = self.subir(self.jpeg_con_exif())
+        subida = imagen.imagen.name
+        self.assertTrue(subida.startswith(PREFIJO_PENDIENTES))
+        self.assertEqual(self.client.get(f"/media/{subida}").status_code, 404)
+
+        huella = procesar_imagen_publicacion(imagen.pk, subida)
+        imagen.refresh_from_db()
+        self.assertEqual(imagen.huella, huella)
+        self.assertFalse(default_storage.exists(subida))
+        response = self.client.get(f"/media/{imagen.imagen.name}")
+        self.assertEqual(response.status_code, 200)
+        limpia = Image.open(BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(dict(limpia.getexif()), {})
+
+    def test_archivo_invalido_se_descarta(self):
+        imagen = self.subir(b"no es una imagen")
+        subida = imagen.imagen.name
+        with self.assertLogs("api.imagenes", "WARNING"):
+            self.assertIsNone(procesar_imagen_publicacion(imagen.pk, subida))
+        self.assertFalse(ImagenPublicacion.objects.filter(pk=imagen.pk).exists())
+        self.assertFalse(default_storage.exists(subida))
+
+    def test_bomba_de_descompresion_se_descarta(self):
+        imagen = self.subir(self.jpeg_con_exif())
+        subida = imagen.imagen.name
+        # 40x30 píxeles superan el doble del máximo: DecompressionBombError
+        with mock.patch.object(Image, "MAX_IMAGE_PIXELS", 100), self.assertLogs(
+            "api.imagenes", "WARNING"
+        ):
+            self.assertIsNone(procesar_imagen_publicacion(imagen.pk, subida))
+        self.assertFalse(ImagenPublicacion.objects.filter(pk=imagen.pk).exists())
+        self.assertFalse(default_storage.exists(subida))
+
+
+class ColaEscriturasTests(TestCase):
+    def test_fila_invalida_no_descarta_el_lote(self):
+        usuario = crear_usuario("cola")
+        publicacion = crear_publicacion(usuario)
+        LikePublicacion.objects.create(id_usuario=usuario, id_publicacion=publicacion)
+        # Intervalo largo: el hilo escritor no llega a vaciar durante el test
+        cola = ColaEscrituras(intervalo=60, maximo=1000)
+        cola.insertar(LikePublicacion(id_usuario=usuario, id_publicacion=publicacion))
+        cola.insertar(Conversacion(usuario=usuario, remitente="bot", mensaje="Hola"))
+        cola.incrementar(Publicacion, publicacion.id, comentarios=1)
+        with self.assertLogs("api.escrituras", "WARNING") as registros:
+            self.assertEqual(cola.vaciar(), 3)
+        self.assertIn("descartada en LikePublicacion", "\n".join(registros.output))
+        self.assertEqual(Conversacion.objects.get().mensaje, "Hola")
+        publicacion.refresh_from_db()
+        self.assertEqual(publicacion.comentarios, 1)
+        self.assertEqual(LikePublicacion.objects.count(), 1)
+
+
+class PurgaTests(TestCase):
+    def setUp(self):
+        self.autor = crear_usuario("autor")
+        self.publicacion = crear_publicacion(self.autor)
+        self.inicial = self.publicacion.tendencia
+
+    def interactuar(self, usuario):
+        datos = {
+            "id_usuario": str(usuario.id),
+            "id_publicacion": str(self.publicacion.id),
+        }
+        for ruta, extra in (("/likes/", {}), ("/comentarios/", {"texto": "Hola"})):
+            response = self.client.post(
+                ruta, {**datos, **extra}, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 201)
+        Inscripciones.objects.create(
+            id_usuario=usuario, id_publicacion=self.publicacion
+        )
+        Publicacion.objects.filter(id=self.publicacion.id).update(
+            tendencia=tendencias.sumar(tendencias.PESO_INSCRIPCION)
+        )
+
+    def test_purgar_usuario_descuenta_contadores_y_tendencia(self):
+        visitante = crear_usuario("visitante")
+        otro = crear_usuario("otro")
+        self.interactuar(visitante)
+        self.interactuar(otro)
+        publicacion = Publicacion.objects.get(id=self.publicacion.id)
+        con_dos = publicacion.tendencia
+
+        marcar_usuario(visitante.id)
+        totales = purgar_usuario(visitante.id)
+
+        self.assertEqual(
+            (totales["likes"], totales["comentarios"], totales["inscripciones"]),
+            (1, 1, 1),
+        )
+        self.assertFalse(Usuario.todos.filter(id=visitante.id).exists())
+        publicacion = Publicacion.objects.get(id=self.publicacion.id)
+        self.assertEqual((publicacion.me_gusta, publicacion.comentarios), (1, 1))
+        self.assertLess(publicacion.tendencia, con_dos)
+        self.assertGreater(publicacion.tendencia, self.inicial)
+        marcar_usuario(otro.id)
+        purgar_usuario(otro.id)
+        publicacion = Publicacion.objects.get(id=self.publicacion.id)
+        self.assertAlmostEqual(publicacion.tendencia, self.inicial, places=4)
+
+    def test_purgar_publicacion(self):
+        self.interactuar(crear_usuario("visitante"))
+        marcar_publicacion(self.publicacion.id)
+        self.assertEqual(
+            self.client.get(f"/publicaciones/{self.publicacion.id}/").status_code, 404
+        )
+        totales = purgar_publicaciones([self.publicacion.id])
+        self.assertEqual(totales["publicaciones"], 1)
+        self.assertFalse(LikePublicacion.objects.exists())
+        self.assertTrue(
+            RegistroEliminacion.objects.filter(objeto_id=self.publicacion.id).exists()
+        )
+
+
+class ParaTiTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def para_ti(self, usuario):
+        return self.client.get(f"/publicaciones/para-ti/?usuario_id={usuario.id}")
+
+    def test_timeline_vacio_se_construye_una_vez(self):
+        usuario = crear_usuario("nuevo")
+        with mock.patch(
+            "api.views.construir_timeline", wraps=construir_timeline
+        ) as construir:
+            for _ in range(3):
+                response = self.para_ti(usuario)
+                self.assertEqual(response.json()["resultados"], [])
+        self.assertEqual(construir.call_count, 1)
+
+    def test_primera_visita_incluye_publicaciones_propias(self):
+        usuario = crear_usuario("autor")
+        publicacion = crear_publicacion(usuario, privacidad="PUB")
+        EntradaTimeline.objects.filter(usuario=usuario).delete()
+        resultados = self.para_ti(usuario).json()["resultados"]
+        self.assertEqual([r["id"] for r in resultados], [str(publicacion.id)])
+
+    def test_paginas_con_puntajes_iguales(self):
+        usuario = crear_usuario("lector")
+        ids = {str(crear_publicacion(usuario).id) for _ in range(5)}
+        construir_timeline(usuario)
+        EntradaTimeline.objects.filter(usuario=usuario).update(puntaje=100.0)
+        vistos, antes = [], ""
+        while True:
+            respuesta = self.client.get(
+                "/publicaciones/para-ti/",
+                {"usuario_id": usuario.id, "limite": 2, "antes": antes},
+            ).json()
+            vistos += [r["id"] for r in respuesta["resultados"]]
+            antes = respuesta["siguiente"]
+            if antes is None:
+                break
+        self.assertEqual(len(vistos), 5)
+        self.assertEqual(set(vistos), ids)
+
+    def test_cursor_invalido(self):
+        usuario = crear_usuario("lector")
+        for antes in ("abc", "1.5_no-es-uuid", "nan"):
+            with self.subTest(antes=antes):
+                response = self.client.get(
+                    "/publicaciones/para-ti/",
+                    {"usuario_id": usuario.id, "antes": antes},
+                )
+                self.assertEqual(response.status_code, 400)
+
+
+class VisibilidadTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.autor = crear_usuario("autor")
+        self.amigo = crear_usuario("amigo")
+        self.seguidor = crear_usuario("seguidor")
+        Seguimiento.objects.create(seguidor=self.autor, seguido=self.amigo)
+        Seguimiento.objects.create(seguidor=self.amigo, seguido=self.autor)
+        Seguimiento.objects.create(seguidor=self.seguidor, seguido=self.autor)
+        self.ids = {}
+        for privacidad in ("PUB", "AMI", "PRI"):
+            publicacion = crear_publicacion(self.autor, privacidad=privacidad)
+            UbicacionEvento.objects.create(
+                content_object=publicacion, latitud=40.4, longitud=-3.7
+            )
+            self.ids[privacidad] = str(publicacion.id)
+
+    def visibles(self, usuario):
+        """Ids vistos por `usuario` en el listado, para_ti y cercanas."""
+        consulta = f"usuario_id={usuario.id}"
+        vistas = {
+            "list": self.client.get(f"/publicaciones/?{consulta}").json(),
+            "para_ti": self.client.get(f"/publicaciones/para-ti/?{consulta}").json()[
+                "resultados"
+            ],
+            "cercanas": self.client.get(
+                f"/publicaciones/cercanas/?{consulta}&lat=40.4&lon=-3.7"
+            ).json()["resultados"],
+        }
+        return {accion: {r["id"] for r in datos} for accion, datos in vistas.items()}
+
+    def test_privadas_y_de_amigos_ocultas_a_quien_no_es_amigo(self):
+        for accion, ids in self.visibles(self.seguidor).items():
+            with self.subTest(accion=accion):
+                self.assertEqual(ids, {self.ids["PUB"]})
+        for privacidad in ("AMI", "PRI"):
+            response = self.client.get(
+                f"/publicaciones/{self.ids[privacidad]}/?usuario_id={self.seguidor.id}"
+            )
+            self.assertEqual(response.status_code, 404)
+
+    def test_amigos_ven_las_de_amigos(self):
+        for accion, ids in self.visibles(self.amigo).items():
+            with self.subTest(accion=accion):
+                self.assertEqual(ids, {self.ids["PUB"], self.ids["AMI"]})
+        response = self.client.get(
+            f"/publicaciones/{self.ids['AMI']}/?usuario_id={self.amigo.id}"
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_editar_y_borrar_sin_usuario_id(self):
+        ruta = f"/publicaciones/{self.ids['PRI']}/"
+        response = self.client.patch(
+            ruta, {"titulo": "Nuevo"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.delete(ruta).status_code, 204)
+
+    def test_cache_de_amigos_sigue_los_seguimientos(self):
+        self.assertEqual(amigos_de(self.seguidor.id), frozenset())
+        with self.captureOnCommitCallbacks(execute=True):
+            vuelta = Seguimiento.objects.create(
+                seguidor=self.autor, seguido=self.seguidor
+            )
+        self.assertEqual(amigos_de(self.seguidor.id), {self.autor.id})
+        self.assertIn(self.seguidor.id, amigos_de(self.autor.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            vuelta.delete()
+        self.assertEqual(amigos_de(self.seguidor.id), frozenset())
+        self.assertNotIn(self.seguidor.id, amigos_de(self.autor.id))
+
+
+class CondicionalTests(TestCase):
+    def setUp(self):
+        self.usuario = crear_usuario("condicional")
+        self.publicacion = crear_publicacion(self.usuario, privacidad="PUB")
+
+    def test_detalle_304_hasta_que_cambia(self):
+        ruta = f"/publicaciones/{self.publicacion.id}/"
+        primera = self.client.get(ruta)
+        self.assertEqual(primera.status_code, 200)
+        etag = primera["ETag"]
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.client.get(ruta, HTTP_IF_NONE_MATCH=etag).status_code, 304
+            )
+        self.client.post(
+            "/likes/",
+            {
+                "id_usuario": str(self.usuario.id),
+                "id_publicacion": str(self.publicacion.id),
+            },
+            content_type="application/json",
+        )
+        cambiada = self.client.get(ruta, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cambiada.status_code, 200)
+        self.assertNotEqual(cambiada["ETag"], etag)
+        self.assertEqual(cambiada.json()["me_gusta"], 1)
+
+    def test_listado_304_y_borrados(self):
+        ruta = "/publicaciones/"
+        etag = self.client.get(ruta)["ETag"]
+        self.assertEqual(
+            self.client.get(ruta, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        crear_publicacion(self.usuario, privacidad="PUB")
+        self.assertEqual(
+            self.client.get(ruta, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+
+class MediaTests(TestCase):
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        ajustes = override_settings(MEDIA_ROOT=directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        default_storage.save("fotos_perfil/archivo.bin", ContentFile(b"0123456789"))
+
+    def pedir(self, **cabeceras):
+        return self.client.get("/media/fotos_perfil/archivo.bin", **cabeceras)
+
+    def contenido(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_rangos(self):
+        completo = self.pedir()
+        self.assertEqual(completo.status_code, 200)
+        self.assertEqual(completo["Accept-Ranges"], "bytes")
+        self.assertEqual(self.contenido(completo), b"0123456789")
+
+        parcial = self.pedir(HTTP_RANGE="bytes=2-5")
+        self.assertEqual(parcial.status_code, 206)
+        self.assertEqual(parcial["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(self.contenido(parcial), b"2345")
+
+        final = self.pedir(HTTP_RANGE="bytes=-3")
+        self.assertEqual(self.contenido(final), b"789")
+
+        fuera = self.pedir(HTTP_RANGE="bytes=20-")
+        self.assertEqual(fuera.status_code, 416)
+        self.assertEqual(fuera["Content-Range"], "bytes */10")
+
+    def test_validadores(self):
+        etag = self.pedir()["ETag"]
+        self.assertEqual(self.pedir(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # If-Range con un validador viejo: archivo completo
+        viejo = self.pedir(HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE='"otro"')
+        self.assertEqual(viejo.status_code, 200)
+        self.assertEqual(
+            self.pedir(HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE=etag).status_code, 206
+        )
+
+    def test_rutas_invalidas(self):
+        for ruta in (
+            "/media/no-existe.bin",
+            "/media/../settings.py",
+            "/media/fotos_perfil/",
+        ):
+            with self.subTest(ruta=ruta):
+                self.assertEqual(self.client.get(ruta).status_code, 404)
+
+
+class TendenciasTests(TestCase):
+    def setUp(self):
+        self.usuario = crear_usuario("tendencias")
+        self.tranquila = crear_publicacion(self.usuario, privacidad="PUB")
+        self.popular = crear_publicacion(self.usuario, privacidad="PUB")
+        self.privada = crear_publicacion(self.usuario, privacidad="PRI")
+
+    def like(self, usuario, publicacion):
+        return self.client.post(
+            "/likes/",
+            {"id_usuario": str(usuario.id), "id_publicacion": str(publicacion.id)},
+            content_type="application/json",
+        )
+
+    def test_orden_por_actividad_reciente(self):
+        for nombre in ("a", "b"):
+            usuario = crear_usuario(nombre)
+            self.like(usuario, self.popular)
+            self.like(usuario, self.privada)
+        resultados = self.client.get("/publicaciones/tendencias/").json()["resultados"]
+        ids = [r["id"] for r in resultados]
+        self.assertEqual(ids, [str(self.popular.id), str(self.tranquila.id)])
+        self.assertAlmostEqual(resultados[0]["tendencia"], 3, places=2)
+
+    def test_quitar_like_resta_su_peso(self):
+        inicial = self.popular.tendencia
+        self.like(self.usuario, self.popular)
+        like = LikePublicacion.objects.get()
+        self.client.delete(f"/likes/{like.id}/")
+        self.popular.refresh_from_db()
+        self.assertAlmostEqual(self.popular.tendencia, inicial, places=4)
+
+    def test_quitar_like_antiguo_resta_su_termino_original(self):
+        # Publicada hace dos vidas medias y con un like de una hora después:
+        # quitarlo debe dejar solo el aporte de la publicación, no el mínimo
+        publicada = timezone.now() - timedelta(hours=2 * tendencias.vida_media_horas())
+        self.like(self.usuario, self.popular)
+        like = LikePublicacion.objects.get()
+        LikePublicacion.objects.filter(id=like.id).update(
+            fecha_like=publicada + timedelta(hours=1)
+        )
+        inicial = tendencias.termino(tendencias.PESO_PUBLICACION, publicada)
+        Publicacion.objects.filter(id=self.popular.id).update(tendencia=inicial)
+        Publicacion.objects.filter(id=self.popular.id).update(
+            tendencia=tendencias.sumar(
+                tendencias.peso_vigente(
+                    tendencias.PESO_LIKE, publicada + timedelta(hours=1)
+                )
+            )
+        )
+        self.client.delete(f"/likes/{like.id}/")
+        self.popular.refresh_from_db()
+        self.assertAlmostEqual(
+            tendencias.puntaje_actual(self.popular.tendencia),
+            tendencias.puntaje_actual(inicial),
+            places=4,
+        )
+
+    def test_region_invalida(self):
+        response = self.client.get("/publicaciones/tendencias/?region=a!")
+        self.assertEqual(response.status_code, 400)
+
+
+class FinalizarEventosTests(TestCase):
+    def setUp(self):
+        self.usuario = crear_usuario("eventos")
+        self.asistente = crear_usuario("asistente")
+        ayer = timezone.now() - timedelta(days=1)
+        self.vencidas = [
+            crear_publicacion(self.usuario, fecha_evento=ayer - timedelta(hours=i))
+            for i in range(5)
+        ]
+        self.futura = crear_publicacion(self.usuario)
+        self.cancelada = crear_publicacion(
+            self.usuario, estado="CAN", fecha_evento=ayer
+        )
+        for publicacion in (self.vencidas[0], self.futura, self.cancelada):
+            Inscripciones.objects.create(
+                id_usuario=self.asistente, id_publicacion=publicacion
+            )
+        Inscripciones.objects.create(
+            id_usuario=self.usuario,
+            id_publicacion=self.vencidas[0],
+            estado_asistencia="ASI",
+        )
+
+    def estados(self):
+        return dict(Publicacion.objects.values_list("id", "estado"))
+
+    def test_solo_vigentes_vencidas_por_lotes(self):
+        versiones = dict(Publicacion.objects.values_list("id", "version"))
+        totales = finalizar_eventos(tamano_lote=2)
+        self.assertEqual(totales, {"publicaciones": 5, "inscripciones": 1, "lotes": 3})
+        estados = self.estados()
+        for publicacion in self.vencidas:
+            self.assertEqual(estados[publicacion.id], "FIN")
+            self.assertEqual(
+                Publicacion.objects.get(id=publicacion.id).version,
+                versiones[publicacion.id] + 1,
+            )
+        self.assertEqual(estados[self.futura.id], "VIG")
+        self.assertEqual(estados[self.cancelada.id], "CAN")
+        asistencia = dict(
+            Inscripciones.objects.filter(id_publicacion=self.vencidas[0]).values_list(
+                "id_usuario__nombre_usuario", "estado_asistencia"
+            )
+        )
+        self.assertEqual(asistencia, {"asistente": "NOASI", "eventos": "ASI"})
+        self.assertEqual(
+            set(
+                Inscripciones.objects.exclude(
+                    id_publicacion=self.vencidas[0]
+                ).values_list("estado_asistencia", flat=True)
+            ),
+            {"INS"},
+        )
+
+    def test_segunda_ejecucion_no_hace_nada(self):
+        finalizar_eventos(tamano_lote=2)
+        estados = self.estados()
+        self.assertEqual(
+            finalizar_eventos(tamano_lote=2),
+            {"publicaciones": 0, "inscripciones": 0, "lotes": 0},
+        )
+        self.assertEqual(self.estados(), estados)
+
+
+class SuscripcionTests(SimpleTestCase):
+    async def test_agrupa_eventos_con_clave(self):
+        suscripcion = Suscripcion(asyncio.get_running_loop(), ventana_ms=20)
+        for me_gusta in range(3):
+            suscripcion.entregar(
+                {"tipo": "contadores", "clave": "c", "datos": me_gusta}
+            )
+        suscripcion.entregar({"tipo": "like"})
+        self.assertEqual(await suscripcion.siguiente(), {"tipo": "like"})
+        agrupado = await asyncio.wait_for(suscripcion.siguiente(), 1)
+        self.assertEqual(agrupado["datos"], 2)
+        self.assertFalse(suscripcion.cola)
+
+    async def test_cola_llena_descarta_los_mas_antiguos(self):
+        suscripcion = Suscripcion(
+            asyncio.get_running_loop(), max_pendientes=2, ventana_ms=0
+        )
+        for numero in range(5):
+            suscripcion.entregar({"tipo": "like", "datos": numero})
+        self.assertEqual([e["datos"] for e in suscripcion.cola], [3, 4])
+        self.assertEqual(suscripcion.perdidos, 3)
+
+    async def test_cerrar_cancela_los_pendientes(self):
+        suscripcion = Suscripcion(asyncio.get_running_loop(), ventana_ms=10)
+        suscripcion.entregar({"tipo": "contadores", "clave": "c"})
+        suscripcion.cerrar()
+        await asyncio.sleep(0.03)
+        self.assertFalse(suscripcion.cola)
+
+
+@override_settings(TAREAS_SINCRONAS=True)
+class NotificacionesTests(TestCase):
+    def setUp(self):
+        self.backend = BackendMemoria()
+        parche = mock.patch("api.notificaciones._backend", self.backend)
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.autor = crear_usuario("autor")
+        self.publicacion = crear_publicacion(self.autor)
+
+    def recibir(self, suscripcion):
+        return self.loop.run_until_complete(
+            asyncio.wait_for(suscripcion.siguiente(), 1)
+        )
+
+    def test_publicar_desde_otro_hilo(self):
+        suscripcion = Suscripcion(self.loop, ventana_ms=0)
+        self.backend.suscribir("canal", suscripcion)
+        hilo = threading.Thread(
+            target=self.backend.publicar, args=("canal", {"tipo": "prueba"})
+        )
+        hilo.start()
+        hilo.join()
+        self.assertEqual(self.recibir(suscripcion), {"tipo": "prueba"})
+        self.backend.desuscribir("canal", suscripcion)
+        self.assertFalse(self.backend.tiene_suscriptores())
+
+    def test_like_notifica_contadores_y_al_dueno(self):
+        en_publicacion = Suscripcion(self.loop, ventana_ms=0)
+        al_dueno = Suscripcion(self.loop, ventana_ms=0)
+        self.backend.suscribir(canal_publicacion(self.publicacion.id), en_publicacion)
+        self.backend.suscribir(canal_usuario(self.autor.id), al_dueno)
+        fan = crear_usuario("fan")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/likes/",
+                {"id_usuario": str(fan.id), "id_publicacion": str(self.publicacion.id)},
+                content_type="application/json",
+            )
+        contadores = self.recibir(en_publicacion)
+        self.assertEqual(contadores["tipo"], "contadores")
+        self.assertEqual(contadores["datos"]["me_gusta"], 1)
+        like = self.recibir(al_dueno)
+        self.assertEqual(like["tipo"], "like")
+        self.assertEqual(like["datos"]["id_usuario"], fan.id)
+
+    def test_websocket_recibe_eventos_y_se_desuscribe_al_cerrar(self):
+        entrada, salida = asyncio.Queue(), asyncio.Queue()
+        canal = canal_publicacion(self.publicacion.id)
+        scope = {
+            "type": "websocket",
+            "path": "/ws/notificaciones/",
+            "query_string": f"publicacion={self.publicacion.id}".encode(),
+        }
+
+        async def conversar():
+            conexion = asyncio.ensure_future(
+                aplicacion_websocket(scope, entrada.get, salida.put)
+            )
+            await entrada.put({"type": "websocket.connect"})
+            self.assertEqual((await salida.get())["type"], "websocket.accept")
+            self.assertTrue(self.backend.tiene_suscriptores(canal))
+            self.backend.publicar(canal, {"tipo": "like", "canal": canal})
+            enviado = await asyncio.wait_for(salida.get(), 1)
+            await entrada.put({"type": "websocket.disconnect"})
+            await asyncio.wait_for(conexion, 1)
+            return json.loads(enviado["text"])
+
+        self.assertEqual(
+            self.loop.run_until_complete(conversar()), {"tipo": "like", "canal": canal}
+        )
+        self.assertFalse(self.backend.tiene_suscriptores())
+
+
+class CachePublicacionesTests(TestCase):
+    def setUp(self):
+        caches["publicaciones"].clear()
+        self.autor = crear_usuario("autor")
+        self.publicacion = crear_publicacion(self.autor, privacidad="PUB")
+        self.ruta = f"/publicaciones/{self.publicacion.id}/"
+
+    def test_nueva_version_invalida_el_fragmento(self):
+        self.assertEqual(self.client.get(self.ruta).json()["titulo"], "Evento")
+        # Sin cambiar la versión se sigue sirviendo el fragmento guardado
+        Publicacion.objects.filter(id=self.publicacion.id).update(titulo="Nuevo")
+        self.assertEqual(self.client.get(self.ruta).json()["titulo"], "Evento")
+        Publicacion.marcar_modificada(self.publicacion.id)
+        self.assertEqual(self.client.get(self.ruta).json()["titulo"], "Nuevo")
+
+    def test_ya_dio_like_por_usuario(self):
+        fan, otro = crear_usuario("fan"), crear_usuario("otro")
+        LikePublicacion.objects.create(id_usuario=fan, id_publicacion=self.publicacion)
+        Publicacion.marcar_modificada(self.publicacion.id)
+        for usuario, esperado in ((fan, True), (otro, False), (fan, True)):
+            with self.subTest(usuario=usuario.nombre_usuario):
+                for ruta in (self.ruta, "/publicaciones/"):
+                    data = self.client.get(ruta, {"usuario_id": usuario.id}).json()
+                    if isinstance(data, list):
+                        data = data[0]
+                    self.assertIs(data["ya_dio_like"], esperado)
+        self.publicacion.refresh_from_db()
+        fragmento = caches["publicaciones"].get(
+            cache_publicaciones.clave_publicacion(
+                self.publicacion.id, self.publicacion.version
+            )
+        )
+        self.assertNotIn("ya_dio_like", fragmento)
+
+    def test_contadores_de_aciertos_y_fallos(self):
+        self.client.get(self.ruta)
+        self.assertEqual(
+            cache_publicaciones.estadisticas(),
+            {"aciertos": 0, "fallos": 1, "tasa_aciertos": 0.0},
+        )
+        self.client.get(self.ruta)
+        self.client.get("/publicaciones/")
+        self.assertEqual(
+            cache_publicaciones.estadisticas(),
+            {"aciertos": 2, "fallos": 1, "tasa_aciertos": 0.6667},
+        )
+
+
+class CalendarioTests(TestCase):
+    def setUp(self):
+        # Tipos de contenido en cache, como en un proceso que ya sirvió peticiones
+        ContentType.objects.get_for_models(ActividadeAgenda, Publicacion)
+        self.yo = crear_usuario("agenda")
+        self.hoy = date.today()
+        self.actividades = [
+            ActividadeAgenda.objects.create(
+                id_usuario=self.yo,
+                titulo=f"Día {dias}",
+                descripcion="-",
+                fecha_activiad=self.hoy + timedelta(days=dias),
+            )
+            for dias in (1, -1, 0)
+        ]
+        ActividadeAgenda.objects.create(
+            id_usuario=crear_usuario("otro"),
+            titulo="Ajena",
+            descripcion="-",
+            fecha_activiad=self.hoy,
+        )
+        self.ruta = f"/calendario/{self.yo.id}.ics"
+
+    def ics(self, **cabeceras):
+        response = self.client.get(self.ruta, **cabeceras)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_filtros_por_rango(self):
+        response = self.client.get(
+            "/actividades/",
+            {
+                "usuario": self.yo.id,
+                "desde": self.hoy,
+                "hasta": self.hoy + timedelta(days=1),
+            },
+        )
+        self.assertEqual([a["titulo"] for a in response.json()], ["Día 0", "Día 1"])
+        response = self.client.get(
+            "/actividades/", {"usuario": self.yo.id, "hasta": self.hoy}
+        )
+        self.assertEqual([a["titulo"] for a in response.json()], ["Día -1", "Día 0"])
+        for parametro in ("desde", "hasta"):
+            response = self.client.get("/actividades/", {parametro: "2025-02-30"})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(parametro, response.json())
+
+    def test_cuerpo_ics(self):
+        actividad = self.actividades[0]
+        actividad.titulo = "Cena, amigos; casa"
+        actividad.save()
+        UbicacionEvento.objects.create(
+            content_object=actividad, latitud=40.4, longitud=-3.7
+        )
+        inscrita = crear_publicacion(crear_usuario("autor"), titulo="Concierto")
+        cancelada = crear_publicacion(inscrita.id_usuario, titulo="Cancelada")
+        Inscripciones.objects.create(id_usuario=self.yo, id_publicacion=inscrita)
+        Inscripciones.objects.create(
+            id_usuario=self.yo, id_publicacion=cancelada, estado_asistencia="CAN"
+        )
+
+        response, cuerpo = self.ics()
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        self.assertTrue(cuerpo.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertTrue(cuerpo.endswith("END:VCALENDAR\r\n"))
+        self.assertEqual(cuerpo.count("BEGIN:VEVENT"), 4)
+        self.assertIn("SUMMARY:Cena\\, amigos\\; casa\r\n", cuerpo)
+        self.assertIn("GEO:40.400000;-3.700000\r\n", cuerpo)
+        self.assertIn(f"UID:publicacion-{inscrita.id}@geoplanner", cuerpo)
+        self.assertNotIn("Cancelada", cuerpo)
+        self.assertNotIn("Ajena", cuerpo)
+        fechas = [
+            linea.split(":")[1]
+            for linea in cuerpo.split("\r\n")
+            if linea.startswith("DTSTART;VALUE=DATE")
+        ]
+        self.assertEqual(fechas, sorted(fechas))
+
+    def test_304_hasta_editar_una_ubicacion(self):
+        ubicacion = UbicacionEvento.objects.create(
+            content_object=self.actividades[0], latitud=40.4, longitud=-3.7
+        )
+        etag = self.ics()[0]["ETag"]
+        self.assertEqual(
+            self.client.get(self.ruta, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        self.client.patch(
+            f"/ubicaciones/{ubicacion.id}/",
+            {"latitud": "41.000000"},
+            content_type="application/json",
+        )
+        response, cuerpo = self.ics(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("GEO:41.000000;-3.700000", cuerpo)
+
+    @override_settings(CONSULTAS_PRESUPUESTO_MODO="log")
+    def test_presupuesto_incluye_el_cuerpo(self):
+        # Los validadores caben en 3 consultas; el cuerpo no
+        with mock.patch.object(calendario_usuario, "presupuesto_consultas", 3):
+            with self.assertLogs("api.presupuesto", "WARNING"):
+                self.ics()
+
+
+class MetricasTests(TestCase):
+    def test_server_timing(self):
+        publicacion = crear_publicacion(crear_usuario("metricas"), privacidad="PUB")
+        response = self.client.get(f"/publicaciones/{publicacion.id}/")
+        self.assertIn("db;dur=", response["Server-Timing"])
+
+
+class CompresionTests(TestCase):
+    def test_elegir_codificacion(self):
+        disponibles = ["zstd", "br", "gzip"]
+        casos = (
+            ("gzip, br", "br"),
+            ("gzip;q=1, br;q=0.5", "gzip"),
+            ("br;q=0, gzip;q=0.1", "gzip"),
+            ("*", "zstd"),
+            ("*;q=0.5, zstd;q=0", "br"),
+            ("identity", None),
+            ("", None),
+            ("gzip;q=abc", "gzip"),
+        )
+        for cabecera, esperada in casos:
+            with self.subTest(cabecera=cabecera):
+                self.assertEqual(elegir_codificacion(cabecera, disponibles), esperada)
+        self.assertEqual(elegir_codificacion("br, zstd", ["gzip"]), None)
+
+    def test_etag_fuerte_pasa_a_debil_al_comprimir(self):
+        usuario = crear_usuario("compresion")
+        for _ in range(6):
+            crear_publicacion(usuario, privacidad="PUB")
+        response = self.client.get("/publicaciones/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(
+            json.loads(gzip.decompress(response.content)),
+            self.client.get("/publicaciones/").json(),
+        )
+        # El ETag débil sigue sirviendo para revalidar
+        revalidada = self.client.get(
+            "/publicaciones/",
+            HTTP_ACCEPT_ENCODING="gzip",
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(revalidada.status_code, 304)
@@ -0,0 +1,466 @@
+import math
+import uuid
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .itinerario import RADIO_TIERRA_KM
+from .models import (
+    EntradaTimeline,
+    Inscripciones,
+    LikePublicacion,
+    Publicacion,
+    Seguimiento,
+    UbicacionEvento,
+    Usuario,
+)
+from .serializers import TAMANO_LOTE
+from .visibilidad import amigos_de, filtro_visibles
+
+# El puntaje se mide en horas: una publicación de un usuario seguido equivale
+# a una publicación sin afinidad creada BONO_SEGUIDO horas después. Como la
+# frescura ya está en el puntaje, el orden no necesita recalcularse al leer.
+BONO_PROPIA = 48.0
+BONO_SEGUIDO = 48.0
+BONO_CERCANIA = 24.0  # a distancia 0; baja linealmente hasta TIMELINE_RADIO_KM
+BONO_CATEGORIA = 6.0  # por log(1 + interacciones previas con la categoría)
+MAX_BONO_CATEGORIA = 18.0
+BONO_POPULARIDAD = 4.0  # por log(1 + likes + comentarios)
+
+KM_POR_GRADO = 111.32
+
+
+def _config(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def max_entradas():
+    return _config("TIMELINE_MAX_ENTRADAS", 500)
+
+
+def umbral_fanout():
+    return _config("TIMELINE_UMBRAL_FANOUT", 5000)
+
+
+def frescura(fecha):
+    return fecha.timestamp() / 3600
+
+
+def popularidad(me_gusta, comentarios):
+    return BONO_POPULARIDAD * math.log1p(max(0, me_gusta + comentarios))
+
+
+def distancias_km(lat, lon, latitudes, longitudes):
+    lat1, lon1 = np.radians(float(lat)), np.radians(float(lon))
+    lat2 = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon2 = np.radians(np.asarray(longitudes, dtype=np.float64))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def rectangulo(lat, lon, radio_km):
+    """Filtro por rectángulo (usa los índices de latitud/longitud)."""
+    dlat = radio_km / KM_POR_GRADO
+    dlon = radio_km / (KM_POR_GRADO * max(math.cos(math.radians(float(lat))), 0.01))
+    return {
+        "latitud__range": (float(lat) - dlat, float(lat) + dlat),
+        "longitud__range": (float(lon) - dlon, float(lon) + dlon),
+    }
+
+
+def _bono_cercania(distancias, radio):
+    return np.clip(BONO_CERCANIA * (1 - distancias / radio), 0.0, BONO_CERCANIA)
+
+
+def _afinidad_categoria(usuario_ids, categoria):
+    """Interacciones (likes + inscripciones) de cada usuario con la categoría."""
+    afinidad = {}
+    for inicio in range(0, len(usuario_ids), TAMANO_LOTE):
+        lote = usuario_ids[inicio : inicio + TAMANO_LOTE]
+        for modelo in (LikePublicacion, Inscripciones):
+            conteos = (
+                modelo.objects.filter(
+                    id_usuario__in=lote, id_publicacion__categoria=categoria
+                )
+                .values_list("id_usuario")
+                .annotate(n=Count("id"))
+            )
+            for usuario_id, n in conteos:
+                afinidad[usuario_id] = afinidad.get(usuario_id, 0) + n
+    return {
+        usuario_id: min(BONO_CATEGORIA * math.log1p(n), MAX_BONO_CATEGORIA)
+        for usuario_id, n in afinidad.items()
+    }
+
+
+def _insertar(destinatarios, publicacion, base, pop):
+    """`destinatarios`: {usuario_id: (bono, motivo)}. Inserta y recorta."""
+    entradas = [
+        EntradaTimeline(
+            usuario_id=usuario_id,
+            publicacion_id=publicacion,
+            puntaje=base + bono + pop,
+            popularidad=pop,
+            motivo=motivo,
+        )
+        for usuario_id, (bono, motivo) in destinatarios.items()
+    ]
+    with transaction.atomic():
+        EntradaTimeline.objects.bulk_create(
+            entradas, batch_size=TAMANO_LOTE, ignore_conflicts=True
+        )
+    recortar(list(destinatarios))
+
+
+def recortar(usuario_ids):
+    """
+    Mantiene cada timeline en TIMELINE_MAX_ENTRADAS. Para no borrar en cada
+    inserción solo se recortan los que superan el máximo más un margen.
+    """
+    limite = max_entradas() + _config("TIMELINE_MARGEN_RECORTE", 50)
+    for inicio in range(0, len(usuario_ids), TAMANO_LOTE):
+        excedidos = (
+            EntradaTimeline.objects.filter(
+                usuario_id__in=usuario_ids[inicio : inicio + TAMANO_LOTE]
+            )
+            .values_list("usuario_id")
+            .annotate(n=Count("id"))
+            .filter(n__gt=limite)
+        )
+        for usuario_id, _ in excedidos:
+            recortar_usuario(usuario_id)
+
+
+def recortar_usuario(usuario_id):
+    umbral = list(
+        EntradaTimeline.objects.filter(usuario_id=usuario_id)
+        .order_by("-puntaje")
+        .values_list("puntaje", flat=True)[max_entradas() - 1 : max_entradas()]
+    )
+    if umbral:
+        EntradaTimeline.objects.filter(
+            usuario_id=usuario_id, puntaje__lt=umbral[0]
+        ).delete()
+
+
+def distribuir_publicacion(publicacion_id):
+    """
+    Tarea en segundo plano al crear una publicación: la agrega al timeline
+    del autor, de sus seguidores (si no es un autor con demasiados seguidores,
+    ver leer_timeline) y de los usuarios cercanos al evento. Las de amigos
+    ("AMI") solo llegan a los amigos del autor y las privadas solo al autor.
+    """
+    publicacion = (
+        Publicacion.objects.filter(id=publicacion_id)
+        .select_related("id_usuario")
+        .first()
+    )
+    if publicacion is None:
+        return 0
+    autor = publicacion.id_usuario
+    destinatarios = {autor.id: (BONO_PROPIA, "PRO")}
+
+    if publicacion.privacidad == "AMI":
+        for amigo_id in amigos_de(autor.id):
+            destinatarios.setdefault(amigo_id, (BONO_SEGUIDO, "SEG"))
+
+    # Solo las publicaciones públicas se distribuyen a seguidores y cercanos
+    if publicacion.privacidad == "PUB":
+        if autor.num_seguidores <= umbral_fanout():
+            seguidores = Seguimiento.objects.filter(
+                seguido=autor, seguidor__eliminado_en__isnull=True
+            ).values_list("seguidor_id", flat=True)
+            for seguidor_id in seguidores.iterator(chunk_size=2000):
+                destinatarios.setdefault(seguidor_id, (BONO_SEGUIDO, "SEG"))
+
+        ubicacion = (
+            UbicacionEvento.objects.filter(
+                content_type=ContentType.objects.get_for_model(Publicacion),
+                object_id=publicacion.id,
+            )
+            .values("latitud", "longitud")
+            .first()
+        )
+        if ubicacion:
+            radio = _config("TIMELINE_RADIO_KM", 25)
+            cercanos = list(
+                Usuario.objects.filter(
+                    **rectangulo(ubicacion["latitud"], ubicacion["longitud"], radio)
+                ).values_list("id", "latitud", "longitud")[
+                    : _config("TIMELINE_MAX_CERCANOS", 2000)
+                ]
+            )
+            if cercanos:
+                ids, lats, lons = zip(*cercanos)
+                bonos = _bono_cercania(
+                    distancias_km(
+                        ubicacion["latitud"], ubicacion["longitud"], lats, lons
+                    ),
+                    radio,
+                )
+                for usuario_id, bono in zip(ids, bonos):
+                    if bono <= 0:
+                        continue
+                    previo, motivo = destinatarios.get(usuario_id, (0.0, "CER"))
+                    destinatarios[usuario_id] = (previo + float(bono), motivo)
+
+        afinidad = _afinidad_categoria(list(destinatarios), publicacion.categoria)
+        for usuario_id, bono in afinidad.items():
+            previo, motivo = destinatarios[usuario_id]
+            destinatarios[usuario_id] = (previo + bono, motivo)
+
+    _insertar(
+        destinatarios,
+        publicacion.id,
+        frescura(publicacion.fecha_creacion),
+        popularidad(publicacion.me_gusta, publicacion.comentarios),
+    )
+    return len(destinatarios)
+
+
+def distribuir_publicaciones(publicacion_ids):
+    for publicacion_id in publicacion_ids:
+        distribuir_publicacion(publicacion_id)
+
+
+def actualizar_popularidad(publicacion_id):
+    """Reajusta el puntaje de la publicación en todos los timelines (un UPDATE)."""
+    fila = (
+        Publicacion.objects.filter(id=publicacion_id)
+        .values("me_gusta", "comentarios")
+        .first()
+    )
+    if fila is None:
+        return
+    nueva = popularidad(fila["me_gusta"], fila["comentarios"])
+    EntradaTimeline.objects.filter(publicacion_id=publicacion_id).update(
+        puntaje=F("puntaje") - F("popularidad") + nueva, popularidad=nueva
+    )
+
+
+def agregar_de_autor(usuario_id, autor_id, limite=20):
+    """Al seguir a alguien se agregan sus publicaciones recientes al timeline."""
+    desde = timezone.now() - timedelta(days=_config("TIMELINE_VENTANA_DIAS", 30))
+    publicaciones = (
+        Publicacion.objects.filter(id_usuario=autor_id, fecha_creacion__gte=desde)
+        .filter(filtro_visibles(usuario_id))
+        .order_by("-fecha_creacion")[:limite]
+    )
+    entradas = [
+        EntradaTimeline(
+            usuario_id=usuario_id,
+            publicacion_id=p.id,
+            puntaje=frescura(p.fecha_creacion)
+            + BONO_SEGUIDO
+            + popularidad(p.me_gusta, p.comentarios),
+            popularidad=popularidad(p.me_gusta, p.comentarios),
+            motivo="SEG",
+        )
+        for p in publicaciones
+    ]
+    EntradaTimeline.objects.bulk_create(entradas, ignore_conflicts=True)
+    recortar([usuario_id])
+
+
+def quitar_de_autor(usuario_id, autor_id):
+    EntradaTimeline.objects.filter(
+        usuario_id=usuario_id, publicacion__id_usuario=autor_id, motivo="SEG"
+    ).delete()
+
+
+def _cache():
+    return caches[getattr(settings, "TIMELINE_CACHE_ALIAS", "default")]
+
+
+def clave_construido(usuario_id):
+    return f"timeline:construido:{usuario_id}"
+
+
+def timeline_construido(usuario_id):
+    """Si el timeline del usuario ya se construyó alguna vez (aunque esté vacío)."""
+    return bool(_cache().get(clave_construido(usuario_id)))
+
+
+def construir_timeline(usuario):
+    """
+    Construye desde cero el timeline de un usuario con las publicaciones de
+    los últimos TIMELINE_VENTANA_DIAS días (propias, seguidos y cercanas).
+    """
+    desde = timezone.now() - timedelta(days=_config("TIMELINE_VENTANA_DIAS", 30))
+    candidatos = {}
+
+    propias = Publicacion.objects.filter(
+        id_usuario=usuario.id, fecha_creacion__gte=desde
+    )
+    for p in propias.values(
+        "id", "categoria", "fecha_creacion", "me_gusta", "comentarios"
+    ):
+        candidatos[p["id"]] = (p, BONO_PROPIA, "PRO")
+
+    # Los autores con muchos seguidores se mezclan al leer (leer_timeline)
+    seguidos = Seguimiento.objects.filter(
+        seguidor=usuario.id, seguido__num_seguidores__lte=umbral_fanout()
+    ).values("seguido_id")
+    de_seguidos = (
+        Publicacion.objects.filter(id_usuario__in=seguidos, fecha_creacion__gte=desde)
+        .filter(filtro_visibles(usuario.id))
+        .order_by("-fecha_creacion")[: max_entradas()]
+    )
+    for p in de_seguidos.values(
+        "id", "categoria", "fecha_creacion", "me_gusta", "comentarios"
+    ):
+        candidatos.setdefault(p["id"], (p, BONO_SEGUIDO, "SEG"))
+
+    if usuario.latitud is not None and usuario.longitud is not None:
+        radio = _config("TIMELINE_RADIO_KM", 25)
+        cercanas = list(
+            UbicacionEvento.objects.filter(
+                content_type=ContentType.objects.get_for_model(Publicacion),
+                **rectangulo(usuario.latitud, usuario.longitud, radio),
+            ).values_list("object_id", "latitud", "longitud")[
+                : _config("TIMELINE_MAX_CERCANOS", 2000)
+            ]
+        )
+        if cercanas:
+            ids, lats, lons = zip(*cercanas)
+            bonos = dict(
+                zip(
+                    ids,
+                    _bono_cercania(
+                        distancias_km(usuario.latitud, usuario.longitud, lats, lons),
+                        radio,
+                    ),
+                )
+            )
+            publicaciones = Publicacion.objects.filter(
+                id__in=[i for i, b in bonos.items() if b > 0],
+                privacidad="PUB",
+                fecha_creacion__gte=desde,
+            ).values("id", "categoria", "fecha_creacion", "me_gusta", "comentarios")
+            for p in publicaciones:
+                previo = candidatos.get(p["id"])
+                bono = float(bonos[p["id"]])
+                if previo:
+                    candidatos[p["id"]] = (p, previo[1] + bono, previo[2])
+                else:
+                    candidatos[p["id"]] = (p, bono, "CER")
+
+    if not candidatos:
+        _cache().set(clave_construido(usuario.id), True, timeout=None)
+        return 0
+    categorias = {p["categoria"] for p, _, _ in candidatos.values()}
+    afinidad = {
+        categoria: _afinidad_categoria([usuario.id], categoria).get(usuario.id, 0.0)
+        for categoria in categorias
+    }
+    entradas = []
+    for p, bono, motivo in candidatos.values():
+        pop = popularidad(p["me_gusta"], p["comentarios"])
+        entradas.append(
+            EntradaTimeline(
+                usuario_id=usuario.id,
+                publicacion_id=p["id"],
+                puntaje=frescura(p["fecha_creacion"])
+                + bono
+                + afinidad[p["categoria"]]
+                + pop,
+                popularidad=pop,
+                motivo=motivo,
+            )
+        )
+    # Solo se guardan las mejores TIMELINE_MAX_ENTRADAS
+    entradas.sort(key=lambda e: e.puntaje, reverse=True)
+    with transaction.atomic():
+        EntradaTimeline.objects.filter(usuario_id=usuario.id).delete()
+        EntradaTimeline.objects.bulk_create(
+            entradas[: max_entradas()], batch_size=TAMANO_LOTE
+        )
+    _cache().set(clave_construido(usuario.id), True, timeout=None)
+    return min(len(entradas), max_entradas())
+
+
+def cursor_timeline(fila):
+    """Cursor de la página siguiente: "<puntaje>_<publicación>" de la última fila."""
+    publicacion_id, _, puntaje = fila
+    return f"{puntaje!r}_{publicacion_id}"
+
+
+def leer_cursor(texto):
+    """
+    (puntaje, publicación) del cursor; ValueError si no es válido. Un número
+    solo (cursores anteriores) equivale a empezar después de ese puntaje.
+    """
+    puntaje, _, publicacion_id = str(texto).partition("_")
+    puntaje = float(puntaje)
+    if not math.isfinite(puntaje):
+        raise ValueError(texto)
+    return puntaje, uuid.UUID(publicacion_id) if publicacion_id else None
+
+
+def _despues_de(puntaje, publicacion_id, antes):
+    # Orden del feed: (-puntaje, -publicación); la publicación desempata
+    if antes[1] is None:
+        return puntaje < antes[0]
+    return (puntaje, publicacion_id) < antes
+
+
+def leer_timeline(usuario, limite=20, antes=None):
+    """
+    Devuelve [(publicacion_id, version, puntaje)] ordenado por puntaje y, a
+    igual puntaje, por publicación (`antes`: ver leer_cursor):
+    - un recorrido por rango del índice (usuario, -puntaje, -publicacion) del
+      timeline,
+    - más las publicaciones recientes de los autores seguidos con demasiados
+      seguidores, que no se distribuyen al escribir y se mezclan aquí.
+    Se filtra por visibilidad al leer: la privacidad o la amistad pueden haber
+    cambiado desde que la entrada se distribuyó.
+    """
+    visibles = filtro_visibles(usuario.id, "publicacion__")
+    entradas = EntradaTimeline.objects.filter(
+        visibles, usuario_id=usuario.id, publicacion__eliminado_en__isnull=True
+    )
+    if antes is not None:
+        puntaje, publicacion_id = antes
+        siguientes = Q(puntaje__lt=puntaje)
+        if publicacion_id is not None:
+            siguientes |= Q(puntaje=puntaje, publicacion_id__lt=publicacion_id)
+        entradas = entradas.filter(siguientes)
+    filas = list(
+        entradas.order_by("-puntaje", "-publicacion_id").values_list(
+            "publicacion_id", "publicacion__version", "puntaje"
+        )[:limite]
+    )
+
+    desde = timezone.now() - timedelta(days=_config("TIMELINE_VENTANA_DIAS", 30))
+    populares = Seguimiento.objects.filter(
+        seguidor=usuario.id, seguido__num_seguidores__gt=umbral_fanout()
+    ).values("seguido_id")
+    recientes = (
+        Publicacion.objects.filter(id_usuario__in=populares, fecha_creacion__gte=desde)
+        .filter(filtro_visibles(usuario.id))
+        .order_by("-fecha_creacion")[:limite]
+    )
+    vistos = {fila[0] for fila in filas}
+    for p in recientes.values(
+        "id", "version", "fecha_creacion", "me_gusta", "comentarios"
+    ):
+        puntaje = (
+            frescura(p["fecha_creacion"])
+            + BONO_SEGUIDO
+            + popularidad(p["me_gusta"], p["comentarios"])
+        )
+        if p["id"] not in vistos and (
+            antes is None or _despues_de(puntaje, p["id"], antes)
+        ):
+            filas.append((p["id"], p["version"], puntaje))
+    filas.sort(key=lambda fila: (fila[2], fila[0]), reverse=True)
+    return filas[:limite]
@@ -1,5 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .batch import BatchView
+from .calendario import calendario_usuario
+from .metricas import metricas_view
+from .subidas import SubidaImagenViewSet
 from .views import (
     UsuarioViewSet,
     ActividadAgendaViewSet,
@@ -9,8 +13,11 @@ from .views import (
     InscripcionViewSet,
     LikePublicacionViewSet,
     ComentarioPublicacionViewSet,
+    ImagenPublicacionViewSet,
+    SeguimientoViewSet,
     chatbot_view,
     estadisticas_admin,
+    SincronizacionView,
 )
 
 router = DefaultRouter()
@@ -21,10 +28,21 @@ router.register(r"ubicaciones", UbicacionEventoViewSet, basename="ubicacion")
 router.register(r"inscripciones", InscripcionViewSet, basename="inscripcion")
 router.register(r"likes", LikePublicacionViewSet, basename="likes")
 router.register(r"comentarios", ComentarioPublicacionViewSet, basename="comentarios")
+router.register(r"imagenes", ImagenPublicacionViewSet, basename="imagen")
+router.register(r"seguimientos", SeguimientoViewSet, basename="seguimiento")
+router.register(r"subidas", SubidaImagenViewSet, basename="subida")
 
 urlpatterns = [
     path("", include(router.urls)),
     path("login/", LoginView.as_view(), name="login"),
     path("chatbot/", chatbot_view, name="chatbot"),
     path("estadisticas/", estadisticas_admin, name="estadisticas_admin"),
+    path("sync/", SincronizacionView.as_view(), name="sincronizacion"),
+    path("batch/", BatchView.as_view(), name="batch"),
+    path("metricas/", metricas_view, name="metricas"),
+    path(
+        "calendario/<uuid:usuario_id>.ics",
+        calendario_usuario,
+        name="calendario_usuario",
+    ),
 ]
@@ -1,7 +1,10 @@
 from rest_framework import viewsets, status, mixins
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.db import models
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
 import requests
 from .models import (
     Usuario,
@@ -12,6 +15,9 @@ from .models import (
     LikePublicacion,
     ComentarioPublicacion,
     Conversacion,
+    ImagenPublicacion,
+    Seguimiento,
+    EntradaTimeline,
 )
 from .serializers import (
     UsuarioSerializer,
@@ -22,15 +28,57 @@ from .serializers import (
     InscripcionSerializer,
     LikePublicacionSerializer,
     ComentarioPublicacionSerializer,
+    ImagenPublicacionSerializer,
+    SeguimientoSerializer,
 )
-from rest_framework.decorators import api_view
+from rest_framework.decorators import action, api_view
+from .condicional import CondicionalMixin
+from .cache_publicaciones import CachePublicacionesMixin
+from . import cache_publicaciones
+from .sincronizacion import RECURSOS, cambios_desde
+from .itinerario import matriz_haversine, optimizar_ruta
+from .imagenes import (
+    eliminar_imagen,
+    procesar_imagen,
+    procesar_imagen_publicacion,
+    urls_variantes,
+)
+from .tareas import encolar_al_confirmar
+from .metricas import medir
+from .presupuesto import presupuesto_consultas
+from .limites import costo_limite
+from .purga import marcar_publicacion, marcar_usuario
+from .notificaciones import notificar_actividad
+from . import escrituras, tendencias
+from .visibilidad import amigos_de, filtro_visibles, normalizar_usuario
+from .timeline import (
+    actualizar_popularidad,
+    agregar_de_autor,
+    construir_timeline,
+    cursor_timeline,
+    distancias_km,
+    distribuir_publicaciones,
+    leer_cursor,
+    leer_timeline,
+    quitar_de_autor,
+    rectangulo,
+    timeline_construido,
+)
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
 from geopy import Nominatim
 from functools import lru_cache
 import numpy as np
 from sklearn.linear_model import LinearRegression
 from django.db.models import Count
+from django.db.models.functions import ExtractMonth
+
+import logging
+import time
 
-import os
+logger = logging.getLogger(__name__)
 
 
 # Vista para el modelo Usuario
@@ -38,6 +86,8 @@ class UsuarioViewSet(viewsets.ModelViewSet):
     queryset = Usuario.objects.all()
     serializer_class = UsuarioSerializer
     lookup_field = "id"  # Para que los endpoints usen UUID en lugar de pk
+    presupuesto_consultas = {"list": 1, "retrieve": 1}
+    costo_limite = {"create": 20}
 
     def create(self, request, *args, **kwargs):
         nombre_usuario = request.data.get("nombre_usuario")
@@ -50,8 +100,8 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Validar si ya existe el email
-        if Usuario.objects.filter(email=email).exists():
+        # Validar si ya existe el email (también en cuentas pendientes de purga)
+        if Usuario.todos.filter(email=email).exists():
             return Response(
                 {"error": "El correo electrónico ya está registrado."},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -60,30 +110,173 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         # Si pasa las validaciones, crear el usuario normalmente
         return super().create(request, *args, **kwargs)
 
+    def perform_create(self, serializer):
+        usuario = serializer.save()
+        self._procesar_foto(usuario)
+
     def perform_destroy(self, instance):
-        # Eliminar imagen de perfil de la BDD al borrar usuario
-        if instance.foto_perfil and os.path.isfile(instance.foto_perfil.path):
-            os.remove(instance.foto_perfil.path)
-        instance.delete()
+        # Borrado lógico inmediato; sus datos y su foto (con variantes) se
+        # purgan en segundo plano por lotes (ver api.purga)
+        marcar_usuario(instance.id)
 
     def perform_update(self, serializer):
-        # Eliminar imagen anterior si se sube una nueva
+        # Eliminar imagen anterior (y sus variantes) si se sube una nueva
         instance = self.get_object()
+        nombre, huella = instance.foto_perfil.name, instance.foto_perfil_huella
         new_image = self.request.FILES.get("foto_perfil")
-        if (
-            new_image
-            and instance.foto_perfil
-            and os.path.isfile(instance.foto_perfil.path)
-        ):
-            os.remove(instance.foto_perfil.path)
-        serializer.save()
+        if new_image:
+            usuario = serializer.save(foto_perfil_huella="")
+            if nombre:
+                eliminar_imagen(nombre, huella)
+            self._procesar_foto(usuario)
+        else:
+            serializer.save()
+
+    def _procesar_foto(self, usuario):
+        # Miniaturas, WebP y limpieza de EXIF en segundo plano
+        if usuario.foto_perfil:
+            encolar_al_confirmar(
+                procesar_imagen,
+                Usuario,
+                usuario.pk,
+                "foto_perfil",
+                "foto_perfil_huella",
+                usuario.foto_perfil.name,
+            )
+
+
+# Creación masiva: POST /<recurso>/masivo/ con una lista de objetos
+class CreacionMasivaMixin:
+    @action(detail=False, methods=["post"], url_path="masivo")
+    def masivo(self, request):
+        """
+        Valida todos los elementos antes de escribir y los inserta (con sus
+        ubicaciones) en una sola transacción. Devuelve solo los ids creados.
+        """
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        objetos = serializer.instance
+        return Response(
+            {"creados": len(objetos), "ids": [objeto.id for objeto in objetos]},
+            status=status.HTTP_201_CREATED,
+        )
 
 
 # Vista para el modelo ActividadeAgenda
-class ActividadAgendaViewSet(viewsets.ModelViewSet):
+class ActividadAgendaViewSet(CreacionMasivaMixin, viewsets.ModelViewSet):
     queryset = ActividadeAgenda.objects.all()
     serializer_class = ActividadAgendaSerializer
     lookup_field = "id"  # Usamos UUID en la URL
+    presupuesto_consultas = {"list": 2, "retrieve": 2, "itinerario": 2}
+
+    def get_queryset(self):
+        """
+        Filtros opcionales por rango: ?usuario=<uuid>&desde=AAAA-MM-DD&hasta=AAAA-MM-DD
+        (usa el índice compuesto id_usuario + fecha_activiad).
+        """
+        queryset = super().get_queryset().prefetch_related("ubicacion")
+        params = self.request.query_params
+        usuario = params.get("usuario")
+        if usuario:
+            queryset = queryset.filter(id_usuario=usuario)
+
+        for parametro, lookup in (("desde", "gte"), ("hasta", "lte")):
+            valor = params.get(parametro)
+            if not valor:
+                continue
+            try:
+                fecha = parse_date(valor)
+            except ValueError:
+                fecha = None
+            if fecha is None:
+                raise ValidationError(
+                    {parametro: "Formato de fecha inválido (AAAA-MM-DD)."}
+                )
+            queryset = queryset.filter(**{f"fecha_activiad__{lookup}": fecha})
+
+        if usuario or params.get("desde") or params.get("hasta"):
+            queryset = queryset.order_by("fecha_activiad")
+        return queryset
+
+    @action(detail=False, methods=["get"], url_path="itinerario")
+    def itinerario(self, request):
+        """
+        Orden de visita de las actividades de un día que minimiza la distancia:
+        GET /actividades/itinerario/?usuario=<uuid>&fecha=AAAA-MM-DD[&lat=&lon=]
+        Si se envían lat/lon, el recorrido empieza en ese punto.
+        """
+        usuario = normalizar_usuario(request.query_params.get("usuario"))
+        try:
+            fecha = parse_date(request.query_params.get("fecha") or "")
+        except ValueError:
+            fecha = None
+        if not usuario or fecha is None:
+            return Response(
+                {"error": "Debe enviar 'usuario' y 'fecha' (AAAA-MM-DD)."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        inicio = None
+        try:
+            if request.query_params.get("lat") and request.query_params.get("lon"):
+                inicio = (
+                    float(request.query_params["lat"]),
+                    float(request.query_params["lon"]),
+                )
+        except ValueError:
+            return Response(
+                {"error": "Coordenadas de inicio inválidas."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        actividades = ActividadeAgenda.objects.filter(
+            id_usuario=usuario, fecha_activiad=fecha
+        ).prefetch_related("ubicacion")
+        paradas, sin_ubicacion = [], []
+        for actividad in actividades:
+            ubicaciones = list(actividad.ubicacion.all())
+            if ubicaciones:
+                paradas.append((actividad, ubicaciones[0]))
+            else:
+                sin_ubicacion.append(actividad)
+
+        latitudes = [float(u.latitud) for _, u in paradas]
+        longitudes = [float(u.longitud) for _, u in paradas]
+        if inicio:
+            latitudes.insert(0, inicio[0])
+            longitudes.insert(0, inicio[1])
+
+        inicio_calculo = time.perf_counter()
+        distancias = matriz_haversine(latitudes, longitudes)
+        orden, total, metodo = optimizar_ruta(distancias, inicio=0 if inicio else None)
+        tiempo_ms = (time.perf_counter() - inicio_calculo) * 1000
+
+        recorrido, anterior = [], None
+        for indice in orden:
+            if inicio and indice == 0:
+                anterior = indice
+                continue
+            actividad, _ = paradas[indice - 1 if inicio else indice]
+            data = self.get_serializer(actividad).data
+            data["distancia_desde_anterior_km"] = (
+                round(float(distancias[anterior, indice]), 3)
+                if anterior is not None
+                else 0.0
+            )
+            recorrido.append(data)
+            anterior = indice
+
+        return Response(
+            {
+                "fecha": fecha,
+                "recorrido": recorrido,
+                "distancia_total_km": round(total, 3),
+                "metodo": metodo,
+                "tiempo_calculo_ms": round(tiempo_ms, 2),
+                "sin_ubicacion": self.get_serializer(sin_ubicacion, many=True).data,
+            }
+        )
 
     def perform_destroy(self, instance):
         # Eliminar todas las ubicaciones asociadas
@@ -93,10 +286,24 @@ class ActividadAgendaViewSet(viewsets.ModelViewSet):
 
 
 # Vista para el modelo Publicacion
-class PublicacionViewSet(viewsets.ModelViewSet):
+class PublicacionViewSet(
+    CondicionalMixin,
+    CachePublicacionesMixin,
+    CreacionMasivaMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Publicacion.objects.all()
     serializer_class = PublicacionSerializer
     lookup_field = "id"
+    # Máximo de consultas SQL por acción con la cache vacía (ver api.presupuesto);
+    # para_ti incluye construir el timeline en la primera visita
+    presupuesto_consultas = {
+        "list": 9,
+        "retrieve": 8,
+        "para_ti": 21,
+        "cercanas": 8,
+        "en_tendencia": 6,
+    }
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -104,13 +311,24 @@ class PublicacionViewSet(viewsets.ModelViewSet):
         context["usuario_id"] = usuario_id  # Guardamos el usuario actual
         return context
 
+    def perform_create(self, serializer):
+        # También la usa /masivo/, donde se guarda una lista de publicaciones
+        creadas = serializer.save()
+        if not isinstance(creadas, list):
+            creadas = [creadas]
+        # Fan-out a los timelines en segundo plano
+        encolar_al_confirmar(distribuir_publicaciones, [p.id for p in creadas])
+
     def perform_destroy(self, instance):
-        # Borrar todas las ubicaciones asociadas al eliminar la publicación
-        instance.ubicacion.all().delete()
-        instance.delete()
+        # Borrado lógico; ubicaciones, likes, imágenes, etc. se purgan después
+        marcar_publicacion(instance.id)
 
     def get_queryset(self):
         queryset = super().get_queryset()
+        # La privacidad limita lo que se lee; editar o borrar no depende de
+        # ?usuario_id= (como en el resto de recursos)
+        if self.request.method in SAFE_METHODS:
+            queryset = queryset.filter(self._filtro_visibles())
         id_usuario = self.request.query_params.get("id_usuario")
 
         if id_usuario:
@@ -118,6 +336,142 @@ class PublicacionViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    def _filtro_visibles(self):
+        # Privado/amigos según quien consulta (?usuario_id=); se calcula una
+        # vez por petición aunque get_queryset se llame varias veces
+        if not hasattr(self, "_visibles"):
+            self._visibles = filtro_visibles(self._usuario_id())
+        return self._visibles
+
+    @action(detail=False, methods=["get"], url_path="para-ti")
+    def para_ti(self, request):
+        """
+        Feed personalizado precalculado (ver api.timeline).
+        GET /publicaciones/para-ti/?usuario_id=<uuid>&limite=20&antes=<cursor>
+        """
+        usuario_id = request.query_params.get("usuario_id")
+        try:
+            usuario = Usuario.objects.get(id=usuario_id)
+        except (Usuario.DoesNotExist, ValueError, DjangoValidationError):
+            return Response(
+                {"error": "Usuario no encontrado."}, status=status.HTTP_404_NOT_FOUND
+            )
+        try:
+            limite = min(max(int(request.query_params.get("limite", 20)), 1), 100)
+            antes = request.query_params.get("antes")
+            antes = leer_cursor(antes) if antes else None
+        except ValueError:
+            raise ValidationError(
+                {"error": "limite debe ser numérico y antes un cursor de 'siguiente'."}
+            )
+
+        filas = leer_timeline(usuario, limite, antes)
+        if not filas and antes is None and not timeline_construido(usuario.id):
+            # Usuario sin timeline todavía (nuevo o previo a los timelines); uno
+            # ya construido que quedó vacío no se reconstruye en cada visita
+            if not EntradaTimeline.objects.filter(usuario=usuario).exists():
+                construir_timeline(usuario)
+                filas = leer_timeline(usuario, limite, antes)
+
+        fragmentos = cache_publicaciones.obtener_fragmentos(
+            [(pub_id, version) for pub_id, version, _ in filas], self._serializar_ids
+        )
+        return Response(
+            {
+                "resultados": cache_publicaciones.aplicar_ya_dio_like(
+                    fragmentos, usuario.id
+                ),
+                "siguiente": (
+                    cursor_timeline(filas[-1]) if len(filas) == limite else None
+                ),
+            }
+        )
+
+    @action(detail=False, methods=["get"], url_path="cercanas")
+    def cercanas(self, request):
+        """
+        Publicaciones visibles con alguna ubicación dentro del radio, ordenadas
+        por distancia. Filtra por el rectángulo del radio (índice de latitud y
+        longitud) y calcula la distancia exacta solo de esas filas.
+        GET /publicaciones/cercanas/?lat=<lat>&lon=<lon>&radio_km=10&limite=20
+        """
+        params = request.query_params
+        try:
+            lat, lon = float(params["lat"]), float(params["lon"])
+            radio = min(max(float(params.get("radio_km", 10)), 0.1), 100)
+            limite = min(max(int(params.get("limite", 20)), 1), 100)
+        except (KeyError, ValueError):
+            raise ValidationError(
+                {"error": "lat y lon son obligatorios; radio_km y limite numéricos."}
+            )
+
+        rango = rectangulo(lat, lon, radio)
+        filas = list(
+            self.get_queryset()
+            .filter(
+                ubicacion__latitud__range=rango["latitud__range"],
+                ubicacion__longitud__range=rango["longitud__range"],
+            )
+            .values_list("id", "version", "ubicacion__latitud", "ubicacion__longitud")
+        )
+        cercanas = {}
+        if filas:
+            ids, versiones, lats, lons = zip(*filas)
+            distancias = distancias_km(lat, lon, lats, lons)
+            # Con varias ubicaciones cuenta la más cercana
+            for pub_id, version, distancia in zip(ids, versiones, distancias):
+                distancia = float(distancia)
+                if distancia > radio:
+                    continue
+                if pub_id not in cercanas or distancia < cercanas[pub_id][1]:
+                    cercanas[pub_id] = (version, distancia)
+        orden = sorted(cercanas.items(), key=lambda item: item[1][1])[:limite]
+
+        fragmentos = cache_publicaciones.obtener_fragmentos(
+            [(pub_id, version) for pub_id, (version, _) in orden],
+            self._serializar_ids,
+        )
+        resultados = cache_publicaciones.aplicar_ya_dio_like(
+            fragmentos, self._usuario_id()
+        )
+        distancia_por_id = {str(pub_id): d for pub_id, (_, d) in orden}
+        for data in resultados:
+            data["distancia_km"] = round(distancia_por_id[str(data["id"])], 3)
+        return Response({"resultados": resultados})
+
+    @action(detail=False, methods=["get"], url_path="tendencias")
+    def en_tendencia(self, request):
+        """
+        Publicaciones públicas vigentes con más actividad reciente (likes,
+        comentarios e inscripciones con decaimiento, ver api.tendencias).
+        GET /publicaciones/tendencias/?limite=20&region=<geohash>
+        GET /publicaciones/tendencias/?lat=<lat>&lon=<lon>
+        """
+        params = request.query_params
+        try:
+            limite = min(max(int(params.get("limite", 20)), 1), 100)
+            region = params.get("region")
+            if not region and params.get("lat") and params.get("lon"):
+                region = tendencias.geohash(float(params["lat"]), float(params["lon"]))
+        except ValueError:
+            raise ValidationError({"error": "limite, lat y lon deben ser numéricos."})
+        if region and not tendencias.es_geohash(region):
+            raise ValidationError({"error": "region debe ser un geohash."})
+
+        filas = tendencias.mas_tendencia(limite, region)
+        puntajes = {str(pub_id): puntaje for pub_id, _, puntaje in filas}
+        fragmentos = cache_publicaciones.obtener_fragmentos(
+            [(pub_id, version) for pub_id, version, _ in filas], self._serializar_ids
+        )
+        resultados = cache_publicaciones.aplicar_ya_dio_like(
+            fragmentos, self._usuario_id()
+        )
+        for data in resultados:
+            data["tendencia"] = round(
+                tendencias.puntaje_actual(puntajes[str(data["id"])]), 3
+            )
+        return Response({"region": region, "resultados": resultados})
+
 
 # Vista para el modelo UbicacionEvento
 class UbicacionEventoViewSet(
@@ -139,10 +493,37 @@ class UbicacionEventoViewSet(
     queryset = UbicacionEvento.objects.all()
     serializer_class = UbicacionEventoSerializer
     lookup_field = "id"
+    presupuesto_consultas = {"list": 1, "retrieve": 1}
+
+    def _marcar_modificado(self, instance):
+        # Las ubicaciones forman parte de la representación de la publicación
+        # y determinan su región de tendencias
+        modelo = instance.content_type.model_class()
+        if modelo is Publicacion:
+            Publicacion.marcar_modificada(
+                instance.object_id,
+                region=tendencias.region_publicacion(instance.object_id),
+            )
+        elif modelo is ActividadeAgenda:
+            # ETag y Last-Modified del calendario, y sincronización
+            ActividadeAgenda.objects.filter(id=instance.object_id).update(
+                fecha_actualizacion=timezone.now()
+            )
+
+    def perform_update(self, serializer):
+        instance = serializer.save()
+        self._marcar_modificado(instance)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        self._marcar_modificado(instance)
 
 
 # Vista para Login
 class LoginView(APIView):
+    presupuesto_consultas = {"post": 1}
+    costo_limite = {"post": 5}
+
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -172,17 +553,63 @@ class LoginView(APIView):
                 "apellido": usuario.apellido,
                 "email": usuario.email,
                 "foto_perfil": usuario.foto_perfil.url if usuario.foto_perfil else None,
+                "foto_perfil_variantes": urls_variantes(usuario.foto_perfil_huella),
                 "mensaje": "Inicio de sesión exitoso.",
             },
             status=status.HTTP_200_OK,
         )
 
 
+# Vista de sincronización incremental para clientes offline
+class SincronizacionView(APIView):
+    """
+    Devuelve los cambios por recurso desde un cursor:
+    GET /sync/?usuario_id=<uuid>&cursor=<iso8601>&recursos=publicaciones,actividades
+    Sin cursor devuelve todo (primera sincronización). La respuesta incluye el
+    cursor que el cliente debe enviar en la siguiente llamada.
+    """
+
+    presupuesto_consultas = {"get": 17}
+
+    def get(self, request):
+        usuario_id = normalizar_usuario(request.query_params.get("usuario_id"))
+        if not usuario_id or not Usuario.objects.filter(id=usuario_id).exists():
+            return Response(
+                {"error": "Usuario no encontrado."}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            try:
+                cursor = parse_datetime(cursor.replace(" ", "+"))
+            except ValueError:  # formato válido pero fecha imposible
+                cursor = None
+            if cursor is None:
+                return Response(
+                    {"error": "Cursor inválido."}, status=status.HTTP_400_BAD_REQUEST
+                )
+
+        recursos = request.query_params.get("recursos")
+        if recursos:
+            recursos = [r.strip() for r in recursos.split(",") if r.strip()]
+            desconocidos = set(recursos) - set(RECURSOS)
+            if desconocidos:
+                return Response(
+                    {
+                        "error": f"Recursos desconocidos: {', '.join(sorted(desconocidos))}"
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        return Response(cambios_desde(usuario_id, cursor or None, recursos))
+
+
 # Vista de inscripciones
 class InscripcionViewSet(viewsets.ModelViewSet):
     queryset = Inscripciones.objects.all()
     serializer_class = InscripcionSerializer
     lookup_field = "id"
+    presupuesto_consultas = {"list": 1, "retrieve": 1}
 
     def create(self, request, *args, **kwargs):
         """
@@ -202,7 +629,12 @@ class InscripcionViewSet(viewsets.ModelViewSet):
             )
 
         # Crear inscripción normalmente
-        return super().create(request, *args, **kwargs)
+        response = super().create(request, *args, **kwargs)
+        Publicacion.objects.filter(id=id_publicacion).update(
+            tendencia=tendencias.sumar(tendencias.PESO_INSCRIPCION)
+        )
+        notificar_actividad(id_publicacion, "inscripcion", response.data)
+        return response
 
     def partial_update(self, request, *args, **kwargs):
         """
@@ -220,14 +652,27 @@ class InscripcionViewSet(viewsets.ModelViewSet):
         instance.estado_asistencia = estado
         instance.save()
         serializer = self.get_serializer(instance)
+        notificar_actividad(instance.id_publicacion_id, "inscripcion", serializer.data)
         return Response(serializer.data)
 
+    def perform_destroy(self, instance):
+        id_publicacion = instance.id_publicacion_id
+        instance.delete()
+        Publicacion.objects.filter(id=id_publicacion).update(
+            tendencia=tendencias.restar(
+                tendencias.PESO_INSCRIPCION, instance.fecha_creacion
+            )
+        )
+        notificar_actividad(id_publicacion)
+
 
 # Vista para likes en publicaciones
 class LikePublicacionViewSet(viewsets.ModelViewSet):
     queryset = LikePublicacion.objects.all()
     serializer_class = LikePublicacionSerializer
     lookup_field = "id"
+    presupuesto_consultas = {"list": 1, "retrieve": 1, "create": 6}
+    costo_limite = {"create": 1, "destroy": 1}
 
     def create(self, request, *args, **kwargs):
         """Un usuario solo puede dar like una vez por publicación."""
@@ -245,28 +690,54 @@ class LikePublicacionViewSet(viewsets.ModelViewSet):
         # Registrar like
         response = super().create(request, *args, **kwargs)
 
-        # Incrementar contador de likes en Publicacion
-        Publicacion.objects.filter(id=id_publicacion).update(
-            me_gusta=models.F("me_gusta") + 1
+        # Incrementar contador de likes en Publicacion (agrupable, ver api.escrituras)
+        escrituras.incrementar(
+            Publicacion,
+            id_publicacion,
+            despues=_tras_contadores(id_publicacion),
+            me_gusta=1,
+            tendencia=tendencias.PESO_LIKE,
         )
+        notificar_actividad(id_publicacion, "like", response.data)
         return response
 
+    def perform_update(self, serializer):
+        instance = serializer.save()
+        Publicacion.marcar_modificada(instance.id_publicacion_id)
+
     def destroy(self, request, *args, **kwargs):
         """Al eliminar un like, restar 1 al contador."""
         instance = self.get_object()
         id_publicacion = instance.id_publicacion.id
         response = super().destroy(request, *args, **kwargs)
-        Publicacion.objects.filter(id=id_publicacion).update(
-            me_gusta=models.F("me_gusta") - 1
+        escrituras.incrementar(
+            Publicacion,
+            id_publicacion,
+            despues=_tras_contadores(id_publicacion),
+            me_gusta=-1,
+            tendencia=-tendencias.peso_vigente(
+                tendencias.PESO_LIKE, instance.fecha_like
+            ),
         )
         return response
 
 
+def _tras_contadores(publicacion_id):
+    # Una vez aplicados los contadores: popularidad en los timelines y aviso
+    # de los contadores nuevos a los suscriptores de la publicación
+    return [
+        (actualizar_popularidad, publicacion_id),
+        (notificar_actividad, publicacion_id),
+    ]
+
+
 # Vista para comentarios en publicaciones
 class ComentarioPublicacionViewSet(viewsets.ModelViewSet):
     queryset = ComentarioPublicacion.objects.all()
     serializer_class = ComentarioPublicacionSerializer
     lookup_field = "id"
+    presupuesto_consultas = {"list": 1, "retrieve": 1, "create": 4}
+    costo_limite = {"create": 2, "destroy": 1}
 
     def create(self, request, *args, **kwargs):
         """Registrar un comentario y aumentar contador."""
@@ -275,11 +746,23 @@ class ComentarioPublicacionViewSet(viewsets.ModelViewSet):
         response = super().create(request, *args, **kwargs)
 
         # Incrementar contador de comentarios
-        Publicacion.objects.filter(id=id_publicacion).update(
-            comentarios=models.F("comentarios") + 1
+        escrituras.incrementar(
+            Publicacion,
+            id_publicacion,
+            despues=_tras_contadores(id_publicacion),
+            comentarios=1,
+            tendencia=tendencias.PESO_COMENTARIO,
+        )
+        # El comentario completo también va a quien mira la publicación
+        notificar_actividad(
+            id_publicacion, "comentario", response.data, en_publicacion=True
         )
         return response
 
+    def perform_update(self, serializer):
+        instance = serializer.save()
+        Publicacion.marcar_modificada(instance.id_publicacion_id)
+
     def destroy(self, request, *args, **kwargs):
         """Eliminar comentario y restar contador."""
         instance = self.get_object()
@@ -287,14 +770,172 @@ class ComentarioPublicacionViewSet(viewsets.ModelViewSet):
 
         response = super().destroy(request, *args, **kwargs)
 
-        Publicacion.objects.filter(id=id_publicacion).update(
-            comentarios=models.F("comentarios") - 1
+        escrituras.incrementar(
+            Publicacion,
+            id_publicacion,
+            despues=_tras_contadores(id_publicacion),
+            comentarios=-1,
+            tendencia=-tendencias.peso_vigente(
+                tendencias.PESO_COMENTARIO, instance.fecha_comentario
+            ),
         )
         return response
 
 
+# Vista para seguir usuarios
+class SeguimientoViewSet(
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.CreateModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Endpoint de Seguimientos:
+    - Listar (filtrar con ?seguidor=<id> o ?seguido=<id>)
+    - Seguir a un usuario / dejar de seguirlo
+    - Amigos (seguimiento mutuo) de un usuario: /seguimientos/amigos/?usuario=<id>
+    """
+
+    queryset = Seguimiento.objects.all()
+    serializer_class = SeguimientoSerializer
+    lookup_field = "id"
+    presupuesto_consultas = {"list": 1, "amigos": 2, "create": 7}
+    costo_limite = {"create": 1, "destroy": 1}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        for campo in ("seguidor", "seguido"):
+            valor = self.request.query_params.get(campo)
+            if valor:
+                queryset = queryset.filter(**{campo: valor})
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        """Un usuario solo puede seguir una vez a otro."""
+        if Seguimiento.objects.filter(
+            seguidor=request.data.get("seguidor"), seguido=request.data.get("seguido")
+        ).exists():
+            return Response(
+                {"detail": "El usuario ya sigue a este usuario."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return super().create(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        seguimiento = serializer.save()
+        escrituras.incrementar(Usuario, seguimiento.seguido_id, num_seguidores=1)
+        encolar_al_confirmar(
+            agregar_de_autor, seguimiento.seguidor_id, seguimiento.seguido_id
+        )
+        if Seguimiento.objects.filter(
+            seguidor=seguimiento.seguido_id, seguido=seguimiento.seguidor_id
+        ).exists():
+            # Ahora son amigos: cada uno ve las publicaciones "AMI" del otro
+            encolar_al_confirmar(
+                agregar_de_autor, seguimiento.seguido_id, seguimiento.seguidor_id
+            )
+
+    def perform_destroy(self, instance):
+        seguidor_id, seguido_id = instance.seguidor_id, instance.seguido_id
+        instance.delete()
+        escrituras.incrementar(Usuario, seguido_id, num_seguidores=-1)
+        encolar_al_confirmar(quitar_de_autor, seguidor_id, seguido_id)
+
+    @action(detail=False, methods=["get"], url_path="amigos")
+    def amigos(self, request):
+        usuario_id = request.query_params.get("usuario")
+        if not Usuario.objects.filter(id=normalizar_usuario(usuario_id)).exists():
+            return Response(
+                {"error": "Usuario no encontrado."}, status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(
+            {"usuario": usuario_id, "amigos": sorted(map(str, amigos_de(usuario_id)))}
+        )
+
+
+# Vista para las imágenes de las publicaciones
+class ImagenPublicacionViewSet(
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.CreateModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Endpoint de Imágenes:
+    - POST multipart con `publicacion` y uno o varios archivos en `imagenes`
+    - Para archivos grandes o redes inestables usar /subidas/ (reanudable)
+    - Las variantes WebP se generan en segundo plano
+    """
+
+    queryset = ImagenPublicacion.objects.select_related("publicacion")
+    serializer_class = ImagenPublicacionSerializer
+    lookup_field = "id"
+    presupuesto_consultas = {"list": 1, "retrieve": 1}
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Cada archivo se escribe a disco por bloques a medida que llega,
+        # sin importar su tamaño (nunca completo en memoria)
+        request.upload_handlers = [TemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        publicacion = self.request.query_params.get("publicacion")
+        if publicacion:
+            queryset = queryset.filter(publicacion=publicacion)
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        maximo_archivos = getattr(settings, "SUBIDAS_MAX_ARCHIVOS", 10)
+        maximo_tamano = getattr(settings, "SUBIDAS_TAMANO_MAXIMO", 100 * 1024 * 1024)
+        # Rechazar antes de leer el cuerpo si no puede caber
+        if int(request.META.get("CONTENT_LENGTH") or 0) > (
+            maximo_archivos * maximo_tamano
+        ):
+            raise ValidationError({"imagenes": "La petición es demasiado grande."})
+
+        archivos = request.FILES.getlist("imagenes") or request.FILES.getlist("imagen")
+        if not archivos:
+            raise ValidationError({"imagenes": "Se requiere al menos un archivo."})
+        if len(archivos) > maximo_archivos:
+            raise ValidationError(
+                {"imagenes": f"Máximo {maximo_archivos} archivos por petición."}
+            )
+        if any(archivo.size > maximo_tamano for archivo in archivos):
+            raise ValidationError(
+                {
+                    "imagenes": f"Cada archivo debe pesar como máximo {maximo_tamano} bytes."
+                }
+            )
+
+        publicacion = request.data.get("publicacion")
+        serializer = self.get_serializer(
+            data=[{"publicacion": publicacion, "imagen": a} for a in archivos],
+            many=True,
+        )
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            imagenes = serializer.save()
+            Publicacion.marcar_modificada(imagenes[0].publicacion_id)
+            for imagen in imagenes:
+                encolar_al_confirmar(
+                    procesar_imagen_publicacion, imagen.pk, imagen.imagen.name
+                )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def perform_destroy(self, instance):
+        # El archivo se borra en la señal post_delete (también en cascada)
+        publicacion_id = instance.publicacion_id
+        instance.delete()
+        Publicacion.marcar_modificada(publicacion_id)
+
+
 # Vista para el chatbot
 ## ENDPOINT DE LA CONVERSACION
+# Cada mensaje es una llamada a Gemini y dos inserciones
+@costo_limite(10)
 @api_view(["POST"])
 def chatbot_view(request):
     """
@@ -311,9 +952,9 @@ def chatbot_view(request):
     except Usuario.DoesNotExist:
         return Response({"error": "Usuario no encontrado."}, status=404)
 
-    # Guardar mensaje del usuario
-    Conversacion.objects.create(
-        usuario=usuario, remitente="usuario", mensaje=mensaje_usuario
+    # Guardar mensaje del usuario (agrupable, ver api.escrituras)
+    escrituras.insertar(
+        Conversacion(usuario=usuario, remitente="usuario", mensaje=mensaje_usuario)
     )
 
     # Obtener historial (últimos 10 mensajes)
@@ -366,16 +1007,19 @@ def chatbot_view(request):
     }
 
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
+        with medir("http"):
+            response = requests.post(url, headers=headers, json=payload, timeout=15)
         data = response.json()
-        print("🔹 Respuesta de Gemini:", data)
+        logger.debug("Respuesta de Gemini: %s", data)
         respuesta_bot = data["candidates"][0]["content"]["parts"][0]["text"]
-    except Exception as e:
-        print("❌ Error al procesar Gemini:", e)
+    except Exception:
+        logger.exception("Error al procesar la respuesta de Gemini")
         respuesta_bot = "Lo siento, hubo un error al procesar tu mensaje."
 
     # Guardar respuesta del bot
-    Conversacion.objects.create(usuario=usuario, remitente="bot", mensaje=respuesta_bot)
+    escrituras.insertar(
+        Conversacion(usuario=usuario, remitente="bot", mensaje=respuesta_bot)
+    )
 
     return Response({"respuesta": respuesta_bot})
 
@@ -384,7 +1028,8 @@ def chatbot_view(request):
 def obtener_direccion(lat, lon):
     geolocator = Nominatim(user_agent="geoplanner")
     try:
-        location = geolocator.reverse(f"{lat}, {lon}", language="es", timeout=10)
+        with medir("http"):
+            location = geolocator.reverse(f"{lat}, {lon}", language="es", timeout=10)
         if location and location.address:
             partes = location.address.split(",")
             if len(partes) >= 3:
@@ -397,6 +1042,7 @@ def obtener_direccion(lat, lon):
         return f"{lat}, {lon}"
 
 
+@presupuesto_consultas(8)
 @api_view(["GET"])
 def estadisticas_admin(request):
     ## Endpoint combinado para el dashboard de administradores
@@ -428,18 +1074,20 @@ def estadisticas_admin(request):
         for i in inscripciones_por_categoria
     }
 
-    # Imprimir para ver los datos de inscripciones por categoria
-    print(inscripciones_categoria_dict)
+    logger.debug("Inscripciones por categoría: %s", inscripciones_categoria_dict)
 
     # @ Eventos por estado (vigente, finalizado, cancelado)
     estados = Publicacion.objects.values("estado").annotate(total=Count("id"))
     estados_dict = {e["estado"]: e["total"] for e in estados}
 
-    # @ Usuarios registrados por mes
+    # @ Usuarios registrados por mes (de cualquier año)
     usuarios_por_mes = [0] * 12
-    for u in Usuario.objects.all():
-        mes = u.fecha_registro.month - 1
-        usuarios_por_mes[mes] += 1
+    for fila in (
+        Usuario.objects.annotate(mes=ExtractMonth("fecha_registro"))
+        .values("mes")
+        .annotate(total=Count("id"))
+    ):
+        usuarios_por_mes[fila["mes"] - 1] = fila["total"]
 
     # @ Ubicaciones mas usadas
     ubicaciones = UbicacionEvento.objects.values("latitud", "longitud").annotate(
@@ -450,12 +1098,7 @@ def estadisticas_admin(request):
         direccion = obtener_direccion(u["latitud"], u["longitud"])
         ubicaciones_dict[direccion] = u["total"]
 
-    ## Crecimiento de usuarios (usuarios por mes)
-    usuarios_por_mes = [0] * 12
-    for u in Usuario.objects.all():
-        mes = u.fecha_registro.month - 1
-        usuarios_por_mes[mes] += 1
-
+    ## Crecimiento de usuarios (usuarios por mes, calculado arriba)
     meses = np.array(range(1, 13)).reshape(-1, 1)
     modelo_usuarios = LinearRegression()
     modelo_usuarios.fit(meses, usuarios_por_mes)
@@ -467,11 +1110,14 @@ def estadisticas_admin(request):
     eventos_vs_usuarios = {"usuarios": total_usuarios, "eventos": total_eventos}
 
     ## Relación entre “me gusta” y número de inscripciones
-    likes = list(Publicacion.objects.values_list("me_gusta", flat=True))
-    inscripciones = [
-        Inscripciones.objects.filter(id_publicacion=p).count()
-        for p in Publicacion.objects.all()
-    ]
+    # Una sola consulta agrupada en lugar de un COUNT por publicación
+    filas = list(
+        Publicacion.objects.annotate(total_inscripciones=Count("inscripciones"))
+        .order_by()
+        .values_list("me_gusta", "total_inscripciones")
+    )
+    likes = [me_gusta for me_gusta, _ in filas]
+    inscripciones = [total for _, total in filas]
 
     if likes and inscripciones:
         modelo_likes = LinearRegression()
@@ -504,6 +1150,7 @@ def estadisticas_admin(request):
                 "inscripciones": inscripciones,
                 "prediccion": predicciones_likes,
             },
+            "cache_publicaciones": cache_publicaciones.estadisticas(),
         }
     )
 
@@ -0,0 +1,97 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+
+from .models import Seguimiento
+
+# Dos usuarios son amigos si se siguen mutuamente. El conjunto de amigos de
+# cada usuario se guarda en cache y se reescribe al confirmar cada cambio de
+# Seguimiento (ver signals.py), así que normalmente filtrar no consulta nada.
+
+
+def _cache():
+    return caches[getattr(settings, "AMIGOS_CACHE_ALIAS", "default")]
+
+
+def clave_amigos(usuario_id):
+    return f"amigos:{usuario_id}"
+
+
+def normalizar_usuario(usuario_id):
+    """UUID del usuario o None si no viene o no es válido (visitante anónimo)."""
+    if not usuario_id:
+        return None
+    try:
+        return uuid.UUID(str(usuario_id))
+    except ValueError:
+        return None
+
+
+def consulta_amigos(usuario_id):
+    """Semi-join sobre la tabla de seguimientos: a quién sigo y me sigue."""
+    return Seguimiento.objects.filter(
+        seguidor=usuario_id,
+        seguido__in=Seguimiento.objects.filter(seguido=usuario_id).values(
+            "seguidor_id"
+        ),
+    ).values_list("seguido_id", flat=True)
+
+
+def amigos_de(usuario_id):
+    """Ids de los amigos del usuario: cache o, si falta, una consulta."""
+    usuario_id = normalizar_usuario(usuario_id)
+    if usuario_id is None:
+        return frozenset()
+    amigos = _cache().get(clave_amigos(usuario_id))
+    if amigos is None:
+        amigos = guardar_amigos(usuario_id)
+    return amigos
+
+
+def guardar_amigos(usuario_id):
+    amigos = frozenset(consulta_amigos(usuario_id))
+    _cache().set(
+        clave_amigos(usuario_id),
+        amigos,
+        timeout=getattr(settings, "AMIGOS_CACHE_TIMEOUT", 24 * 3600),
+    )
+    return amigos
+
+
+def actualizar_amigos(*usuario_ids):
+    """Escritura directa tras confirmar un seguimiento nuevo o eliminado."""
+    for usuario_id in usuario_ids:
+        guardar_amigos(usuario_id)
+
+
+def invalidar_amigos(usuario_ids):
+    """Para cambios que no pasan por las señales (purga de usuarios)."""
+    _cache().delete_many([clave_amigos(usuario_id) for usuario_id in usuario_ids])
+
+
+def filtro_visibles(usuario_id, prefijo=""):
+    """
+    Q de las publicaciones que puede ver `usuario_id`: públicas, propias y las
+    de sus amigos con privacidad "AMI". `prefijo` permite aplicarlo desde otra
+    tabla (por ejemplo "publicacion__" en el timeline).
+
+    Los ids de amigos se incrustan en la consulta; con demasiados amigos se usa
+    el semi-join directamente para no generar un IN enorme.
+    """
+    usuario_id = normalizar_usuario(usuario_id)
+    publicas = Q(**{f"{prefijo}privacidad": "PUB"})
+    if usuario_id is None:
+        return publicas
+
+    amigos = amigos_de(usuario_id)
+    if len(amigos) > getattr(settings, "AMIGOS_MAX_LISTA", 500):
+        amigos = consulta_amigos(usuario_id)
+    if not amigos:
+        return publicas | Q(**{f"{prefijo}id_usuario": usuario_id})
+    return (
+        publicas
+        | Q(**{f"{prefijo}id_usuario": usuario_id})
+        | Q(**{f"{prefijo}privacidad": "AMI", f"{prefijo}id_usuario__in": amigos})
+    )
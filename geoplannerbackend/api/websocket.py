@@ -0,0 +1,149 @@
+import asyncio
+import json
+import uuid
+from urllib.parse import parse_qs
+
+from django.conf import settings
+
+from .notificaciones import (
+    Suscripcion,
+    canal_publicacion,
+    canal_usuario,
+    obtener_backend,
+    serializar_evento,
+)
+
+RUTA_NOTIFICACIONES = "/ws/notificaciones/"
+
+# Parámetro (query string o mensaje del cliente) -> constructor del canal
+TIPOS_CANAL = {"publicacion": canal_publicacion, "usuario": canal_usuario}
+
+
+def _canales(parametros):
+    """Convierte {"publicacion": [...], "usuario": [...]} en nombres de canal."""
+    canales = set()
+    for tipo, construir in TIPOS_CANAL.items():
+        valores = parametros.get(tipo) or []
+        if isinstance(valores, str):
+            valores = [valores]
+        for valor in valores:
+            try:
+                canales.add(construir(uuid.UUID(str(valor))))
+            except ValueError:
+                continue
+    return canales
+
+
+class ConexionNotificaciones:
+    """
+    Una conexión WebSocket de /ws/notificaciones/?publicacion=<id>&usuario=<id>.
+
+    El cliente puede cambiar sus suscripciones enviando mensajes JSON:
+        {"accion": "suscribir", "publicacion": ["<id>", ...]}
+        {"accion": "desuscribir", "usuario": "<id>"}
+        {"accion": "ping"}
+    y recibe eventos {"tipo", "canal", "datos", "fecha"}. Si se pierden eventos
+    por no consumir a tiempo recibe {"tipo": "desincronizado"} y debe
+    recuperar el estado con /sync/.
+    """
+
+    def __init__(self, scope, receive, send):
+        self.scope = scope
+        self.receive = receive
+        self.send = send
+        self.backend = obtener_backend()
+        self.canales = set()
+        self.max_canales = getattr(settings, "NOTIFICACIONES_MAX_CANALES", 50)
+
+    async def __call__(self):
+        mensaje = await self.receive()
+        if mensaje["type"] != "websocket.connect":
+            return
+        parametros = parse_qs(self.scope.get("query_string", b"").decode())
+        iniciales = _canales(parametros)
+        if len(iniciales) > self.max_canales:
+            await self.send({"type": "websocket.close", "code": 1008})
+            return
+
+        await self.send({"type": "websocket.accept"})
+        self.suscripcion = Suscripcion(asyncio.get_running_loop())
+        self._suscribir(iniciales)
+        lector = asyncio.ensure_future(self._leer())
+        escritor = asyncio.ensure_future(self._escribir())
+        try:
+            _, pendientes = await asyncio.wait(
+                {lector, escritor}, return_when=asyncio.FIRST_COMPLETED
+            )
+            for tarea in pendientes:
+                tarea.cancel()
+        finally:
+            for canal in list(self.canales):
+                self.backend.desuscribir(canal, self.suscripcion)
+            self.suscripcion.cerrar()
+
+    def _suscribir(self, canales):
+        canales = set(list(canales)[: max(0, self.max_canales - len(self.canales))])
+        for canal in canales - self.canales:
+            self.backend.suscribir(canal, self.suscripcion)
+        self.canales |= canales
+
+    def _desuscribir(self, canales):
+        for canal in canales & self.canales:
+            self.backend.desuscribir(canal, self.suscripcion)
+        self.canales -= canales
+
+    def _responder(self, tipo, datos=None):
+        # Las respuestas pasan por la misma cola que los eventos
+        self.suscripcion.entregar({"tipo": tipo, "canal": None, "datos": datos})
+
+    async def _leer(self):
+        while True:
+            mensaje = await self.receive()
+            if mensaje["type"] == "websocket.disconnect":
+                return
+            if mensaje["type"] != "websocket.receive":
+                continue
+            try:
+                contenido = json.loads(
+                    mensaje.get("text") or mensaje.get("bytes") or ""
+                )
+                accion = contenido.get("accion")
+            except (ValueError, AttributeError):
+                self._responder("error", {"detalle": "Mensaje JSON inválido."})
+                continue
+            if accion == "ping":
+                self._responder("pong")
+            elif accion in ("suscribir", "desuscribir"):
+                canales = _canales(contenido)
+                if accion == "suscribir":
+                    self._suscribir(canales)
+                else:
+                    self._desuscribir(canales)
+                self._responder("suscripciones", {"canales": sorted(self.canales)})
+            else:
+                self._responder("error", {"detalle": f"Acción desconocida: {accion}"})
+
+    async def _escribir(self):
+        while True:
+            evento = await self.suscripcion.siguiente()
+            if self.suscripcion.perdidos:
+                perdidos, self.suscripcion.perdidos = self.suscripcion.perdidos, 0
+                await self._enviar(
+                    {"tipo": "desincronizado", "datos": {"perdidos": perdidos}}
+                )
+            # send() espera a que el servidor acepte los datos: si el cliente es
+            # lento la cola se llena y se aplica el descarte de Suscripcion
+            await self._enviar(evento)
+
+    async def _enviar(self, evento):
+        await self.send({"type": "websocket.send", "text": serializar_evento(evento)})
+
+
+async def aplicacion_websocket(scope, receive, send):
+    """Aplicación ASGI para las conexiones WebSocket (ver geoplannerbackend/asgi.py)."""
+    if scope["path"] == RUTA_NOTIFICACIONES:
+        await ConexionNotificaciones(scope, receive, send)()
+        return
+    # Ruta desconocida: rechazar el handshake
+    await receive()
+    await send({"type": "websocket.close", "code": 1000})
@@ -3,6 +3,10 @@ ASGI config for geoplannerbackend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Las conexiones WebSocket (/ws/notificaciones/) las atiende api.websocket; el
+resto de peticiones HTTP van a Django. Requiere un servidor ASGI con soporte
+de WebSocket, por ejemplo: uvicorn geoplannerbackend.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
@@ -13,4 +17,21 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "geoplannerbackend.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Se importa después de inicializar Django (usa settings y modelos)
+from api.eventos import iniciar_planificador  # noqa: E402
+from api.idempotencia import iniciar_limpieza_periodica  # noqa: E402
+from api.purga import iniciar_purga_periodica  # noqa: E402
+from api.websocket import aplicacion_websocket  # noqa: E402
+
+# Tareas periódicas del proceso servidor (no corren en comandos de gestión)
+iniciar_planificador()
+iniciar_purga_periodica()
+iniciar_limpieza_periodica()
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        return await aplicacion_websocket(scope, receive, send)
+    return await django_application(scope, receive, send)
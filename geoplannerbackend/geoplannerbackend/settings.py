@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
 from pathlib import Path
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -43,7 +44,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero para medir también el resto de middlewares (ver api.metricas)
+    "api.metricas.InstrumentacionMiddleware",
+    "api.presupuesto.PresupuestoConsultasMiddleware",
+    "api.routers.LecturaMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "api.middleware.CompresionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -51,6 +57,9 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # Último: guarda la respuesta sin comprimir y los reintentos pasan por
+    # CORS y compresión como cualquier otra
+    "api.idempotencia.IdempotenciaMiddleware",
 ]
 
 ROOT_URLCONF = "geoplannerbackend.urls"
@@ -77,13 +86,93 @@ WSGI_APPLICATION = "geoplannerbackend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Perfil de SQLite para producción, aplicado al abrir cada conexión:
+# - WAL: los lectores no bloquean al escritor ni al revés
+# - synchronous=NORMAL: en WAL solo los checkpoints hacen fsync completo
+# - mmap y cache de páginas más grandes para las lecturas
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",  # 256 MB
+    "PRAGMA cache_size=-65536",  # 64 MB por conexión
+    "PRAGMA temp_store=MEMORY",
+)
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+        # Conexión persistente: se reutiliza entre peticiones del mismo hilo
+        # durante CONN_MAX_AGE segundos y se comprueba antes de reutilizarla
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            # busy_timeout: esperar al otro escritor en lugar de fallar con
+            # "database is locked"
+            "timeout": 20,
+            # atomic() toma el lock de escritura al empezar (BEGIN IMMEDIATE):
+            # una transacción que lee y luego escribe no puede quedar sin
+            # poder promover su lock
+            "transaction_mode": "IMMEDIATE",
+            "init_command": ";".join(SQLITE_PRAGMAS),
+        },
+    },
+    # Réplica para las lecturas de peticiones GET (ver api.routers). Por
+    # defecto es el mismo archivo con conexiones de solo lectura, que no
+    # compiten con los escritores. Alternativas:
+    # - otra copia de SQLite: "NAME": BASE_DIR / "replica.sqlite3",
+    #   actualizada con `manage.py actualizar_replica` (o litestream)
+    # - PostgreSQL local: "ENGINE": "django.db.backends.postgresql",
+    #   "NAME": "geoplanner", "HOST": "localhost", "USER": ..., sin OPTIONS
+    "lectura": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.sqlite3",
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "timeout": 20,
+            "init_command": ";".join(SQLITE_PRAGMAS + ("PRAGMA query_only=ON",)),
+        },
+        "TEST": {"MIRROR": "default"},
+    },
+}
+
+DATABASE_ROUTERS = ["api.routers.LecturaRouter"]
+
+# Tras escribir, el cliente lee de "default" durante estos segundos
+# (read-your-writes con una réplica que va con retraso); 0 lo desactiva
+LECTURA_STICKY_SEGUNDOS = 5
+LECTURA_CACHE_ALIAS = "default"
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Para compartir la cache entre procesos se puede usar FileBasedCache:
+# "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+# "LOCATION": BASE_DIR / "cache",
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "geoplanner",
+    },
+    "publicaciones": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "publicaciones",
+        "TIMEOUT": 60 * 60 * 24,
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    },
 }
 
+# Alias de cache para las representaciones serializadas de Publicacion
+PUBLICACIONES_CACHE_ALIAS = "publicaciones"
+
+# Conjuntos de amigos por usuario (api.visibilidad), reescritos al seguir o
+# dejar de seguir
+AMIGOS_CACHE_ALIAS = "default"
+AMIGOS_CACHE_TIMEOUT = 60 * 60 * 24
+AMIGOS_MAX_LISTA = 500  # con más amigos el filtro usa un semi-join en SQL
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -129,4 +218,130 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Entrega de /media/ (api.media.servir_media):
+# - "django": FileResponse (sendfile vía wsgi.file_wrapper si el servidor lo soporta)
+# - "x-accel-redirect": nginx sirve el archivo desde una location `internal`
+#   con alias a MEDIA_ROOT, p. ej. location /media-interna/ { internal; alias ...; }
+# - "x-sendfile": Apache (mod_xsendfile) o lighttpd
+MEDIA_ENVIO = "django"
+MEDIA_X_ACCEL_PREFIJO = "/media-interna/"
+# Validez de las URLs firmadas de publicaciones privadas; debe superar el
+# TIMEOUT de la cache "publicaciones", que guarda las URLs ya firmadas
+MEDIA_FIRMA_DURACION = 7 * 24 * 3600
+
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
+
+# Django REST Framework
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.OrjsonRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_THROTTLE_CLASSES": ["api.limites.CubetaThrottle"],
+}
+
+# Límite de peticiones (api.limites): cubetas de tokens por IP y por usuario,
+# (capacidad, tokens por segundo). Cada vista declara su costo en tokens;
+# las que no lo declaran no se limitan. Con varios procesos, la cache
+# LIMITES_CACHE_ALIAS debe ser compartida (Redis, Memcached o DatabaseCache);
+# con LocMemCache cada proceso lleva sus propias cubetas.
+LIMITES_ACTIVOS = True
+LIMITES_CACHE_ALIAS = "default"
+LIMITES_CUBETAS = {
+    "ip": (120, 2.0),
+    "usuario": (40, 0.5),
+}
+LIMITES_COSTO_POR_DEFECTO = 0
+
+# Endpoint /batch/ (api.batch.BatchView)
+BATCH_MAX_SUBPETICIONES = 20
+BATCH_MAX_HILOS = 4
+
+# Tareas en segundo plano (api.tareas): procesamiento de imágenes, etc.
+TAREAS_MAX_HILOS = 2
+TAREAS_SINCRONAS = False
+
+# Cola de escrituras agrupadas (api.escrituras): contadores de likes,
+# comentarios y seguidores y los mensajes del chatbot se aplican juntos en
+# una transacción cada ESCRITURAS_INTERVALO_MS (o al juntar el máximo)
+ESCRITURAS_AGRUPADAS = False
+ESCRITURAS_INTERVALO_MS = 20
+ESCRITURAS_MAXIMO_LOTE = 500
+
+# Subidas de imágenes de publicaciones (/imagenes/ y /subidas/)
+SUBIDAS_DIRECTORIO = BASE_DIR / "subidas_temporales"
+SUBIDAS_TAMANO_MAXIMO = 100 * 1024 * 1024  # bytes por archivo
+SUBIDAS_TAMANO_FRAGMENTO = 8 * 1024 * 1024  # bytes por fragmento reanudable
+SUBIDAS_MAX_ARCHIVOS = 10
+SUBIDAS_EXPIRACION = 24 * 3600  # segundos sin actividad antes de descartarla
+
+# Notificaciones en tiempo real por WebSocket (api.notificaciones, api.websocket)
+NOTIFICACIONES_BACKEND = "api.notificaciones.BackendMemoria"
+NOTIFICACIONES_MAX_PENDIENTES = 100  # eventos en cola por conexión
+NOTIFICACIONES_VENTANA_MS = 250  # agrupación de actualizaciones de contadores
+NOTIFICACIONES_MAX_CANALES = 50  # suscripciones por conexión
+
+# Feed personalizado precalculado (api.timeline)
+TIMELINE_MAX_ENTRADAS = 500  # entradas guardadas por usuario
+TIMELINE_MARGEN_RECORTE = 50  # se recorta al superar máximo + margen
+TIMELINE_UMBRAL_FANOUT = 5000  # seguidores a partir de los que se mezcla al leer
+TIMELINE_RADIO_KM = 25
+TIMELINE_MAX_CERCANOS = 2000
+TIMELINE_VENTANA_DIAS = 30
+# Cache donde se recuerda qué timelines ya se construyeron (para-ti no
+# reconstruye los vacíos)
+TIMELINE_CACHE_ALIAS = "default"
+
+# Tendencias con decaimiento (api.tendencias, /publicaciones/tendencias/)
+TENDENCIAS_VIDA_MEDIA_HORAS = 24  # una interacción pesa la mitad tras este tiempo
+TENDENCIAS_PRECISION_GEOHASH = 5  # celdas de ~5 km para ?region= y ?lat=&lon=
+
+# Paso de eventos vencidos a "FIN" dentro del servidor (api.eventos); también
+# puede ejecutarse con `manage.py finalizar_eventos` desde cron
+FINALIZAR_EVENTOS_INTERVALO = 300  # segundos; 0 lo desactiva
+
+# Purga de usuarios y publicaciones con borrado lógico (api.purga). Cada borrado
+# encola su purga; este intervalo reintenta las que hayan quedado pendientes
+PURGA_INTERVALO = 3600  # segundos; 0 lo desactiva
+
+# Cabecera Idempotency-Key en los POST (api.idempotencia): respuestas
+# guardadas por usuario y clave para repetirlas en los reintentos
+IDEMPOTENCIA_TTL = 60 * 60 * 24  # segundos
+# Máximo que un duplicado espera a la petición original; pasado ese tiempo
+# sin respuesta, la reserva se da por abandonada
+IDEMPOTENCIA_ESPERA = 30
+IDEMPOTENCIA_LIMPIEZA_INTERVALO = 3600  # segundos; 0 lo desactiva
+
+# Instrumentación por petición (api.metricas): cabecera Server-Timing, una
+# línea JSON por petición en el logger "api.metricas" (nivel DEBUG, ver
+# LOGGING) y /metricas/ en formato
+# Prometheus, accesible para staff del admin o con este token (vacío = solo staff)
+METRICAS_SERVER_TIMING = True
+METRICAS_TOKEN = ""
+
+# Presupuesto de consultas por endpoint (api.presupuesto): en desarrollo "log"
+# avisa y "error" falla la petición que se pasa del máximo de su vista o que
+# repite una misma consulta más de CONSULTAS_REPETICIONES_MAX veces (N+1)
+CONSULTAS_PRESUPUESTO_MODO = "log" if DEBUG else ""
+CONSULTAS_REPETICIONES_MAX = 3
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"consola": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "api": {"handlers": ["consola"], "level": "WARNING"},
+        # "DEBUG" para registrar una línea JSON por petición (api.metricas)
+        "api.metricas": {"level": "WARNING"},
+    },
+}
+
+# Máximo de elementos por petición en los endpoints /masivo/
+CREACION_MASIVA_MAX = 5000
+
+# Compresión de respuestas (api.middleware.CompresionMiddleware): zstd y br
+# requieren los paquetes zstandard y Brotli (requirements.txt); sin ellos
+# solo se ofrece gzip
+COMPRESION_TAMANO_MINIMO = 1024  # bytes
+COMPRESION_NIVELES = {"gzip": 6, "br": 4, "zstd": 3}
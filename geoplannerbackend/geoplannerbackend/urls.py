@@ -18,12 +18,15 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from api.media import servir_media
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include("api.urls")),
+    # Archivos subidos (Range, cache y URLs firmadas; ver api.media)
+    path(
+        settings.MEDIA_URL.lstrip("/") + "<path:ruta>",
+        servir_media,
+        name="media",
+    ),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
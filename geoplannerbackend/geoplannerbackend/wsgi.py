@@ -14,3 +14,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "geoplannerbackend.settings")
 
 application = get_wsgi_application()
+
+# Tareas periódicas del proceso servidor (no corren en comandos de gestión)
+from api.eventos import iniciar_planificador  # noqa: E402
+from api.idempotencia import iniciar_limpieza_periodica  # noqa: E402
+from api.purga import iniciar_purga_periodica  # noqa: E402
+
+iniciar_planificador()
+iniciar_purga_periodica()
+iniciar_limpieza_periodica()